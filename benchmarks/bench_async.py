@@ -0,0 +1,110 @@
+"""
+Mede a latência das rotas leves (/areas, /metadata) enquanto várias análises
+pesadas (/comprehensive-analysis) são requisitadas simultaneamente, comparando
+o modo síncrono (cada requisição ocupa um de N workers) com o modo ASGI
+(src/asgi.py). A aplicação é chamada em processo, sem servidor HTTP.
+
+Uso: python benchmarks/bench_async.py [--courses N] [--workers W] [--heavy-clients C] [--seconds S]
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+from synthetic import AREAS, make_analyzer
+import src.routes.enade as enade
+from src.asgi import AsyncServer
+from src.main import app as flask_app
+
+FAST_PATHS = ['/api/enade/areas', '/api/enade/metadata']
+
+
+class SyncServer(AsyncServer):
+    """Equivalente aos workers síncronos: toda requisição ocupa um dos `max_workers`"""
+
+    async def __call__(self, scope, receive, send):
+        body = await self._read_body(receive)
+        environ = self._environ(scope, body)
+        status, headers, chunks = await asyncio.get_running_loop().run_in_executor(
+            self._get_executor(), self._call_wsgi, environ
+        )
+        await self._send(send, status, headers, chunks)
+
+
+async def request(server, path: str, query: str = '') -> int:
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode('latin-1'),
+             'headers': [], 'server': ('localhost', 5000), 'client': ('127.0.0.1', 0)}
+    status = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await server(scope, receive, send)
+    return status['code']
+
+
+async def heavy_client(server, stop: float, counts: dict, offset: int):
+    i = offset
+    while time.perf_counter() < stop:
+        code = await request(server, '/api/enade/comprehensive-analysis', urlencode({'area': AREAS[i % len(AREAS)]}))
+        counts[code] = counts.get(code, 0) + 1
+        if code == 503:
+            # O cliente respeita o Retry-After (encurtado para o benchmark)
+            await asyncio.sleep(0.05)
+        i += 1
+
+
+async def fast_client(server, stop: float, latencies: list):
+    i = 0
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        await request(server, FAST_PATHS[i % len(FAST_PATHS)])
+        latencies.append(time.perf_counter() - start)
+        i += 1
+        await asyncio.sleep(0.01)
+
+
+async def scenario(server, heavy_clients: int, seconds: float):
+    stop = time.perf_counter() + seconds
+    latencies, counts = [], {}
+    tasks = [heavy_client(server, stop, counts, i) for i in range(heavy_clients)]
+    tasks.append(fast_client(server, stop, latencies))
+    await asyncio.gather(*tasks)
+    return np.array(latencies) * 1000, counts
+
+
+def report(name: str, latencies: np.ndarray, counts: dict):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    heavy = ', '.join(f'{code}: {n}' for code, n in sorted(counts.items())) or '-'
+    print(f'{name:<34} {len(latencies):>6} {p50:>9.2f} {p99:>9.2f} {latencies.max():>9.2f}   {heavy}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--courses', type=int, default=9106)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--heavy-clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    enade._analyzer = make_analyzer(args.courses)
+    # Sem o cache de resultados, cada análise é de fato recalculada
+    enade.result_cache.enabled = False
+
+    print(f'{"cenário":<34} {"rápidas":>6} {"p50 (ms)":>9} {"p99 (ms)":>9} {"máx (ms)":>9}   respostas das análises')
+    for name, server in [('síncrono', SyncServer(flask_app, max_workers=args.workers)),
+                         ('asgi', AsyncServer(flask_app, max_workers=args.workers))]:
+        report(f'{name} (ocioso)', *asyncio.run(scenario(server, 0, args.seconds / 2)))
+        report(f'{name} ({args.heavy_clients} análises simultâneas)',
+               *asyncio.run(scenario(server, args.heavy_clients, args.seconds)))
+        server._get_executor().shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    main()
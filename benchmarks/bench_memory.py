@@ -0,0 +1,320 @@
+"""
+Mede a memória (pico e retida) do carregamento da planilha, de cada método do
+ENADEAnalyzer e da geração dos dados web em vários tamanhos de dados sintéticos,
+com rastreamento de alocações (tracemalloc) e amostragem do RSS do processo.
+Cada cenário roda em um processo próprio, para que os picos não se misturem.
+
+Compara os resultados com um orçamento (benchmarks/memory_budget.json) e
+termina com código 1 se algum cenário o ultrapassar.
+
+Uso: python benchmarks/bench_memory.py [--sizes 2000 9106] [--scenarios ...]
+                                       [--top N] [--depth D] [--budget ARQUIVO | --no-check]
+                                       [--write-budget ARQUIVO --headroom 1.25]
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from synthetic import make_analyzer, make_enade_dataframe
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'memory_budget.json')
+AREA = 'DIREITO'
+MIB = 2 ** 20
+
+
+def load_excel(context):
+    from src.enade_analyzer import ENADEAnalyzer
+    return ENADEAnalyzer(context['excel_path'])
+
+
+def generate_web_data(context):
+    # generate_web_data.py é um script (importa enade_analyzer pelo diretório src)
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    from generate_web_data import build_institution_data
+    return build_institution_data(context['analyzer'])
+
+
+# cenário -> (função, mantém o resultado ao medir a memória retida)
+SCENARIOS = {
+    'load_excel': (load_excel, True),
+    'compare_with_levels': (lambda c: c['analyzer'].compare_with_levels(AREA), False),
+    'generate_detailed_report': (lambda c: c['analyzer'].generate_detailed_report(AREA), False),
+    'find_extremes': (lambda c: c['analyzer'].find_extremes(c['analyzer'].df), False),
+    'analyze_unifor_questions': (lambda c: c['analyzer'].analyze_unifor_questions(AREA), False),
+    'get_question_comparison': (lambda c: c['analyzer'].get_question_comparison('Q58', AREA), False),
+    'get_top_institutions_by_question': (lambda c: c['analyzer'].get_top_institutions_by_question('Q58', AREA), False),
+    'get_similar_institutions': (lambda c: c['analyzer'].get_similar_institutions(AREA), False),
+    'compare_with_specific_institutions': (
+        lambda c: c['analyzer'].compare_with_specific_institutions(c['analyzer'].get_similar_institutions(AREA, 5), AREA),
+        False),
+    'identify_improvement_priorities': (lambda c: c['analyzer'].identify_improvement_priorities(AREA), False),
+    'get_leaderboard_page': (lambda c: c['analyzer'].get_leaderboard_page('NOC', AREA), False),
+    'simulate_improvements': (lambda c: c['analyzer'].simulate_improvements({'Q58': 0.3}, AREA), False),
+    'generate_web_data': (generate_web_data, False),
+}
+
+
+def current_rss() -> int:
+    """RSS atual do processo em bytes (Linux); 0 se indisponível"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return 0
+
+
+class RSSSampler(threading.Thread):
+    """Amostra o RSS do processo a cada `interval` segundos e guarda o máximo"""
+
+    def __init__(self, interval: float = 0.002):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._finish = threading.Event()
+
+    def run(self):
+        while not self._finish.is_set():
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    def stop(self) -> int:
+        self._finish.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak
+
+
+class PeakSnapshots(threading.Thread):
+    """
+    Guarda um snapshot do tracemalloc sempre que a memória rastreada cresce 25%
+    além do último snapshot; o último deles aproxima os locais de alocação no pico
+    """
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.snapshot = None
+        self._level = tracemalloc.get_traced_memory()[0]
+        self._finish = threading.Event()
+
+    def run(self):
+        while not self._finish.is_set():
+            traced = tracemalloc.get_traced_memory()[0]
+            if traced > self._level * 1.25:
+                self.snapshot = tracemalloc.take_snapshot()
+                self._level = traced
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._finish.set()
+        self.join()
+
+
+def prepare(name: str, size: int, excel_path: str) -> dict:
+    """Dados do cenário, preparados fora da medição (inclusive os imports tardios)"""
+    if name == 'load_excel':
+        import openpyxl  # noqa: F401
+        import pandas.io.excel._openpyxl  # noqa: F401
+        return {'excel_path': excel_path}
+    if name == 'generate_web_data':
+        if SRC_DIR not in sys.path:
+            sys.path.insert(0, SRC_DIR)
+        import generate_web_data  # noqa: F401
+    return {'analyzer': make_analyzer(size)}
+
+
+def measure_rss(name: str, size: int, excel_path: str, results):
+    """Pico de RSS do cenário, sem o custo do tracemalloc"""
+    context = prepare(name, size, excel_path)
+    func, keep = SCENARIOS[name]
+    gc.collect()
+
+    rss_before = current_rss()
+    sampler = RSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    result = func(context)
+    elapsed = time.perf_counter() - start
+    rss_peak = sampler.stop()
+
+    if not keep:
+        del result
+    gc.collect()
+    results.put({
+        'rss_before_mib': rss_before / MIB,
+        'rss_peak_mib': rss_peak / MIB,
+        'rss_retained_mib': (current_rss() - rss_before) / MIB,
+        'seconds': elapsed
+    })
+
+
+def measure_allocations(name: str, size: int, excel_path: str, top: int, depth: int, results):
+    """Pico e memória retida rastreados pelo tracemalloc, com os maiores locais de alocação"""
+    context = prepare(name, size, excel_path)
+    func, keep = SCENARIOS[name]
+    gc.collect()
+
+    # O rastreamento começa imediatamente antes do cenário: tudo o que aparece
+    # nos snapshots foi alocado por ele
+    tracemalloc.start(depth)
+    watcher = PeakSnapshots()
+    watcher.start()
+
+    result = func(context)
+
+    watcher.stop()
+    peak = tracemalloc.get_traced_memory()[1]
+    snapshot = watcher.snapshot or tracemalloc.take_snapshot()
+    if not keep:
+        del result
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    results.put({
+        'traced_peak_mib': peak / MIB,
+        'traced_retained_mib': retained / MIB,
+        'top_sites': allocation_sites(snapshot.statistics('traceback'), top)
+    })
+
+
+def allocation_sites(stats, top: int) -> list:
+    """
+    Agrupa as alocações pela linha do projeto que as originou (a chamada mais
+    recente dentro do repositório), indicando também onde o bloco foi alocado
+    """
+    ignored = (tracemalloc.__file__, threading.__file__)
+    sites = {}
+    for stat in stats:
+        frames = list(stat.traceback)
+        if frames[-1].filename in ignored:
+            continue
+        origin = next((f for f in reversed(frames) if f.filename.startswith(ROOT_DIR)), None)
+        allocated = f'{frames[-1].filename}:{frames[-1].lineno}'
+        if origin is None:
+            key = (allocated, None)
+        else:
+            key = (f'{os.path.relpath(origin.filename, ROOT_DIR)}:{origin.lineno}',
+                   allocated if origin is not frames[-1] else None)
+        size, count = sites.get(key, (0, 0))
+        sites[key] = (size + stat.size, count + stat.count)
+
+    ranked = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return [
+        {'site': origin, 'allocated_at': allocated, 'size_mib': size / MIB, 'count': count}
+        for (origin, allocated), (size, count) in ranked
+    ]
+
+
+def _child(target, args, results):
+    try:
+        target(*args, results)
+    except Exception as e:
+        results.put({'error': f'{type(e).__name__}: {e}'})
+
+
+def run_isolated(target, *args) -> dict:
+    """Executa a medição em um processo novo e devolve o resultado"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_child, args=(target, args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    if 'error' in result:
+        raise RuntimeError(f'{target.__name__}{args}: {result["error"]}')
+    return result
+
+
+def write_excel(size: int, directory: str) -> str:
+    path = os.path.join(directory, f'enade_{size}.xlsx')
+    make_enade_dataframe(size).to_excel(path, index=False)
+    return path
+
+
+def check_budget(measurements: dict, budget: dict) -> list:
+    """Lista os cenários acima do orçamento ({tamanho: {cenário: {métrica: MiB}}})"""
+    failures = []
+    for size, scenarios in measurements.items():
+        for name, measured in scenarios.items():
+            limits = budget.get(str(size), {}).get(name, {})
+            for metric, limit in limits.items():
+                if measured[metric] > limit:
+                    failures.append(f'{name} ({size} cursos): {metric} = {measured[metric]:.1f} MiB > {limit:.1f} MiB')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 9106])
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--top', type=int, default=5, help='locais de alocação exibidos por cenário')
+    parser.add_argument('--depth', type=int, default=1,
+                        help='quadros guardados por alocação; com mais quadros, as alocações feitas dentro '
+                             'do pandas/NumPy são atribuídas à linha do projeto que as causou (bem mais lento)')
+    parser.add_argument('--budget', default=DEFAULT_BUDGET)
+    parser.add_argument('--no-check', action='store_true', help='não compara com o orçamento')
+    parser.add_argument('--write-budget', help='grava as medições (com folga) como novo orçamento')
+    parser.add_argument('--headroom', type=float, default=1.25)
+    args = parser.parse_args()
+
+    measurements = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            excel_path = write_excel(size, tmp) if 'load_excel' in args.scenarios else None
+            measurements[size] = {}
+
+            print(f'\n== {size} cursos ==')
+            print(f'{"cenário":<36}{"pico rastr.":>12}{"retido":>10}{"RSS pico":>11}{"RSS retido":>12}{"tempo":>9}')
+            for name in args.scenarios:
+                rss = run_isolated(measure_rss, name, size, excel_path)
+                traced = run_isolated(measure_allocations, name, size, excel_path, args.top, args.depth)
+                measurements[size][name] = {**rss, **traced}
+
+                print(f'{name:<36}{traced["traced_peak_mib"]:>10.1f}Mi{traced["traced_retained_mib"]:>8.1f}Mi'
+                      f'{rss["rss_peak_mib"]:>9.1f}Mi{rss["rss_retained_mib"]:>10.1f}Mi{rss["seconds"]:>8.2f}s')
+                for site in traced['top_sites']:
+                    allocated = f' (alocado em {site["allocated_at"]})' if site['allocated_at'] else ''
+                    print(f'    {site["size_mib"]:>8.2f} MiB  {site["count"]:>8}  {site["site"]}{allocated}')
+
+    if args.write_budget:
+        budget = {
+            str(size): {
+                name: {metric: round(measured[metric] * args.headroom + 1, 1)
+                       for metric in ['traced_peak_mib', 'rss_peak_mib']}
+                for name, measured in scenarios.items()
+            }
+            for size, scenarios in measurements.items()
+        }
+        with open(args.write_budget, 'w', encoding='utf-8') as f:
+            json.dump(budget, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'\nOrçamento gravado em {args.write_budget}')
+        return
+
+    if args.no_check or not os.path.exists(args.budget):
+        return
+
+    with open(args.budget, 'r', encoding='utf-8') as f:
+        failures = check_budget(measurements, json.load(f))
+    if failures:
+        print('\nOrçamento de memória excedido:')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print(f'\nDentro do orçamento ({args.budget})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Compara a serialização padrão (jsonify) com a camada src.serialization para os
+payloads grandes do blueprint do ENADE.
+
+Uso: python benchmarks/bench_serialization.py [--courses N] [--repeat R]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from flask import Flask, jsonify
+
+from synthetic import make_analyzer
+from src.serialization import dumps, json_response
+
+
+def comprehensive_payload(analyzer, area):
+    """Monta o mesmo payload da rota /comprehensive-analysis"""
+    similar_institutions = analyzer.get_similar_institutions(area, 5)
+    return {
+        'unifor_analysis': analyzer.analyze_unifor_questions(area),
+        'improvement_priorities': analyzer.identify_improvement_priorities(area),
+        'similar_institutions': similar_institutions,
+        'institutional_comparison': analyzer.compare_with_specific_institutions(similar_institutions, area),
+        'metadata': {'area': area, 'analysis_type': 'comprehensive'}
+    }
+
+
+def courses_payload(analyzer):
+    """Monta um payload no formato de /unifor-courses para todos os cursos"""
+    df = analyzer.df
+    courses = []
+    for _, course in df.iterrows():
+        courses.append({
+            'codigo': course['CO_CURSO'],
+            'area': course['Área de Avaliação'],
+            'participantes': course['Nº  de Concluintes Participantes'],
+            'percentual_participacao': course['Percentual Participantes'],
+            'media_geral': course['Média'],
+            'scores': {
+                'NOC': course[analyzer.noc_questions].mean(),
+                'NFC': course[analyzer.nfc_questions].mean(),
+                'NAC': course[analyzer.nac_questions].mean()
+            },
+            'questions': {q: course[q] for q in analyzer.all_questions}
+        })
+    return courses
+
+
+def naive_default(value):
+    """Conversão usual via hook default do json (NaN permanece como NaN, JSON inválido)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(type(value).__name__)
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(name, payload, app, repeat):
+    print(f'\n== {name} ==')
+    with app.app_context():
+        try:
+            elapsed = best_of(lambda: jsonify(payload), repeat)
+            body = jsonify(payload).get_data()
+            valid = 'NaN' not in body.decode('utf-8')
+            print(f'jsonify                 {elapsed * 1000:9.2f} ms  {len(body):>10} bytes  json válido: {valid}')
+        except TypeError as e:
+            print(f'jsonify                 falhou: {e}')
+
+        elapsed = best_of(lambda: json.dumps(payload, default=naive_default), repeat)
+        size = len(json.dumps(payload, default=naive_default).encode('utf-8'))
+        print(f'json.dumps + default    {elapsed * 1000:9.2f} ms  {size:>10} bytes  json válido: False')
+
+        elapsed = best_of(lambda: json_response(payload), repeat)
+        body = json_response(payload).get_data()
+        json.loads(body)
+        print(f'json_response           {elapsed * 1000:9.2f} ms  {len(body):>10} bytes  json válido: True')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--courses', type=int, default=9106)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    analyzer = make_analyzer(args.courses)
+    app = Flask(__name__)
+
+    run('/comprehensive-analysis', comprehensive_payload(analyzer, 'DIREITO'), app, args.repeat)
+    run('/unifor-courses (todos os cursos)', courses_payload(analyzer), app, args.repeat)
+
+    web_data_path = os.path.join(os.path.dirname(__file__), '..', 'src', 'web_data.json')
+    with open(web_data_path, 'r', encoding='utf-8') as f:
+        web_data = json.load(f)
+    run('/unifor-courses (web_data.json)', web_data['unifor_courses'], app, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
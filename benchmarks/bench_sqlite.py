@@ -0,0 +1,69 @@
+"""
+Compara o ENADEAnalyzer em modo DataFrame com o modo SQLite (src.sqlite_store)
+nas consultas filtradas usadas pelas rotas.
+
+Uso: python benchmarks/bench_sqlite.py [--sizes 9106 50000] [--repeat R]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import make_analyzer
+from src.enade_analyzer import ENADEAnalyzer
+
+AREA = 'DIREITO'
+
+QUERIES = {
+    'compare_with_levels': lambda a: a.compare_with_levels(AREA),
+    'compare_with_levels (geral)': lambda a: a.compare_with_levels(),
+    'get_question_comparison': lambda a: a.get_question_comparison('Q58', AREA),
+    'get_top_institutions_by_question': lambda a: a.get_top_institutions_by_question('Q58', AREA, 10),
+    'get_similar_institutions': lambda a: a.get_similar_institutions(AREA, 5),
+    'analyze_unifor_questions': lambda a: a.analyze_unifor_questions(AREA),
+    'identify_improvement_priorities': lambda a: a.identify_improvement_priorities(AREA),
+}
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[9106, 50000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        frame_analyzer = make_analyzer(size)
+        frame_memory = frame_analyzer.df.memory_usage(deep=True).sum()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'enade.db')
+            start = time.perf_counter()
+            frame_analyzer.export_sqlite(db_path)
+            export_time = time.perf_counter() - start
+            sqlite_analyzer = ENADEAnalyzer.from_sqlite(db_path)
+
+            print(f'\n== {size} cursos ==')
+            print(f'DataFrame em memória: {frame_memory / 2**20:.1f} MiB | '
+                  f'banco SQLite: {os.path.getsize(db_path) / 2**20:.1f} MiB '
+                  f'(exportado em {export_time:.2f} s)')
+            print(f'{"consulta":<36}{"DataFrame":>12}{"SQLite":>12}')
+            for name, query in QUERIES.items():
+                query(frame_analyzer)
+                frame_time = best_of(lambda: query(frame_analyzer), args.repeat)
+                sqlite_time = best_of(lambda: query(sqlite_analyzer), args.repeat)
+                print(f'{name:<36}{frame_time * 1000:>10.2f}ms{sqlite_time * 1000:>10.2f}ms')
+
+            sqlite_analyzer.store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Teste de concorrência do snapshot imutável do ENADEAnalyzer: várias threads
+requisitam ao mesmo tempo todas as rotas do blueprint do ENADE (com o cache de
+resultados desativado, para que as análises sejam de fato recalculadas), enquanto
+outra thread publica periodicamente novos snapshots dos mesmos dados, com os
+caches vazios. Cada resposta deve ser idêntica (status e corpo) à obtida em uma
+execução com uma única thread. Termina com código 1 se alguma resposta divergir
+ou se alguma rota do blueprint não estiver coberta.
+
+Uso: python benchmarks/stress_threads.py [--courses N] [--threads T] [--rounds R] [--swaps S]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic import AREAS, UNIFOR, make_enade_dataframe, write_student_microdata
+import src.routes.enade as enade
+from src.enade_analyzer import ENADEAnalyzer
+from src.main import app
+from src.student_sketches import build_student_sketches
+
+# Rotas que alteram o estado ou apenas expõem contadores (não determinísticas)
+EXCLUDED_RULES = {'/api/enade/dataset/updates', '/api/enade/dataset/reload', '/api/enade/cache-stats',
+                  '/api/enade/indicators/<name>'}
+
+# Indicador personalizado registrado em cada snapshot (entra nas comparações e rankings)
+INDICATORS = {'PONDERADO': {'weights': {'Q27': 2.0, 'Q58': 1.0, 'Q67': 0.5}}}
+
+
+def build_requests(analyzer: ENADEAnalyzer) -> list:
+    """(regra, método, caminho, query, corpo JSON) cobrindo todas as rotas do ENADE"""
+    similar = analyzer.get_similar_institutions(AREAS[0], 3)
+    requests = []
+
+    def add(rule, query=None, path=None, method='GET', body=None):
+        requests.append((rule, method, path or rule, tuple(sorted((query or {}).items())), body))
+
+    for rule in ['/api/enade/metadata', '/api/enade/institutions', '/api/enade/unifor-courses',
+                 '/api/enade/areas', '/api/enade/dashboard-data', '/api/enade/indicators']:
+        add(rule)
+    add('/api/enade/jobs/<job_id>', path='/api/enade/jobs/inexistente')
+
+    for area in [None] + AREAS[:6] + ['AREA INEXISTENTE']:
+        query = {'area': area} if area else {}
+        add('/api/enade/comparisons', query)
+        add('/api/enade/extremes', query)
+        add('/api/enade/course-detail', query)
+        add('/api/enade/unifor-analysis', query)
+        add('/api/enade/improvement-priorities', query)
+        add('/api/enade/similar-institutions', dict(query, limit='5'))
+        add('/api/enade/institutional-comparison', query)
+        add('/api/enade/institutional-comparison', dict(query, institutions=','.join(similar)))
+        add('/api/enade/question-analysis', dict(query, question='Q58'))
+        add('/api/enade/student-distribution', dict(query, question='Q27', uf='CE', score='4.5'))
+        add('/api/enade/histograms', query)
+        add('/api/enade/histograms', dict(query, metrics='Q27,NOC', bins='7'))
+        add('/api/enade/outliers', dict(query, uf='CE', threshold='2.5'))
+        add('/api/enade/question-correlations', dict(query, question='Q58', limit='8'))
+        add('/api/enade/simulation', dict(query, deltas='Q58:0.3,Q27:-0.1'))
+        add('/api/enade/simulation', method='POST', body=dict(query, deltas={'Q67': 0.5}))
+        add('/api/enade/comprehensive-analysis', query)
+        add('/api/enade/leaderboard', dict(query, metric='NOC', limit='15'))
+        add('/api/enade/leaderboard', dict(query, metric='Q27', institution=UNIFOR))
+        add('/api/enade/leaderboard', dict(query, metric='PONDERADO', limit='10'))
+
+    add('/api/enade/improvement-priorities/all')
+    add('/api/enade/improvement-priorities/all', {'institution': similar[0]})
+    add('/api/enade/student-distribution', {'question': 'Q99'})
+    return requests
+
+
+def uncovered_rules(requests: list) -> list:
+    rules = {rule.rule for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/enade/')}
+    return sorted(rules - EXCLUDED_RULES - {request[0] for request in requests})
+
+
+def call(client, request) -> tuple:
+    _, method, path, query, body = request
+    if method == 'POST':
+        response = client.post(path, query_string=dict(query), json=body)
+    else:
+        response = client.get(path, query_string=dict(query))
+    return response.status_code, response.get_data()
+
+
+def make_snapshot(df, sketches) -> ENADEAnalyzer:
+    analyzer = ENADEAnalyzer.from_dataframe(df)
+    analyzer.attach_student_sketches(sketches)
+    analyzer.register_indicators(INDICATORS)
+    return analyzer.freeze()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--courses', type=int, default=9106)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--swaps', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = make_enade_dataframe(args.courses)
+    with tempfile.TemporaryDirectory() as directory:
+        microdata = os.path.join(directory, 'microdados.csv')
+        write_student_microdata(df, microdata, students_per_course=5)
+        sketches = build_student_sketches([microdata], [c for c in df.columns if c.startswith('Q')])
+
+    enade.result_cache.enabled = False
+    enade.swap_analyzer(make_snapshot(df, sketches))
+    requests = build_requests(enade.get_analyzer())
+    missing = uncovered_rules(requests)
+    if missing:
+        print('Rotas sem cobertura no teste:', ', '.join(missing))
+        sys.exit(1)
+
+    # Referência: uma única thread, sobre um snapshot recém-criado
+    start = time.perf_counter()
+    client = app.test_client()
+    expected = [call(client, request) for request in requests]
+    single = time.perf_counter() - start
+    statuses = sorted({status for status, _ in expected})
+    print(f'{len(requests)} requisições distintas em {len({request[0] for request in requests})} rotas '
+          f'(status {statuses}); uma thread: {single:.2f} s')
+
+    mismatches, completed = [], [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def worker(seed: int):
+        client = app.test_client()
+        order = list(range(len(requests))) * args.rounds
+        random.Random(seed).shuffle(order)
+        for i in order:
+            result = call(client, requests[i])
+            with lock:
+                completed[0] += 1
+                if result != expected[i]:
+                    mismatches.append((requests[i], expected[i][0], result[0]))
+
+    def swapper():
+        # Novos snapshots (caches vazios) publicados enquanto as threads leem
+        for _ in range(args.swaps):
+            if done.wait(single / 2):
+                return
+            enade.swap_analyzer(make_snapshot(df, sketches))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.threads)]
+    swap_thread = threading.Thread(target=swapper)
+    for thread in threads + [swap_thread]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    swap_thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f'{args.threads} threads: {completed[0]} requisições em {elapsed:.2f} s, '
+          f'{len(mismatches)} divergências')
+    for (_, method, path, query, _), expected_status, status in mismatches[:20]:
+        print(f'  {method} {path} {dict(query)}: esperado {expected_status}, obtido {status}')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Gera planilhas sintéticas com a mesma estrutura do ResumoQuestionário.xlsx,
+usadas pelos benchmarks quando a planilha real não está disponível
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.enade_analyzer import ENADEAnalyzer
+
+AREAS = [
+    'ADMINISTRAÇÃO', 'CIÊNCIAS CONTÁBEIS', 'CIÊNCIAS ECONÔMICAS', 'DIREITO', 'JORNALISMO',
+    'PSICOLOGIA', 'PUBLICIDADE E PROPAGANDA', 'RELAÇÕES INTERNACIONAIS', 'SERVIÇO SOCIAL',
+    'TECNOLOGIA EM DESIGN DE MODA', 'TECNOLOGIA EM GESTÃO FINANCEIRA', 'TECNOLOGIA EM MARKETING',
+    'TECNOLOGIA EM LOGÍSTICA', 'TEOLOGIA', 'TURISMO'
+]
+STATES = ['AL', 'BA', 'CE', 'MA', 'PB', 'PE', 'PI', 'RN', 'SE', 'SP', 'RJ', 'MG', 'RS', 'PR', 'AM', 'DF']
+CATEGORIES = [
+    'Privada com fins lucrativos', 'Privada sem fins lucrativos',
+    'Pública Federal', 'Pública Estadual', 'Pública Municipal'
+]
+QUESTIONS = [f'Q{i}' for i in range(27, 69)]
+UNIFOR = 'UNIVERSIDADE DE FORTALEZA'
+
+
+def make_enade_dataframe(n_courses: int = 9106, n_institutions: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    Cria um DataFrame sintético com as colunas da planilha do ENADE
+    """
+    rng = np.random.default_rng(seed)
+    institutions = np.array([f'INSTITUIÇÃO SINTÉTICA {i:05d}' for i in range(n_institutions)], dtype=object)
+
+    data = {
+        'CO_CURSO': np.arange(1, n_courses + 1) * 7 + 1000,
+        'Nome da IES': institutions[rng.integers(0, n_institutions, n_courses)],
+        'Área de Avaliação': np.array(AREAS, dtype=object)[rng.integers(0, len(AREAS), n_courses)],
+        'Organização Acadêmica': np.where(rng.random(n_courses) < 0.5, 'Universidade', 'Faculdade'),
+        'Categoria Administrativa': np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), n_courses)],
+        'Modalidade de Ensino': np.where(rng.random(n_courses) < 0.8, 'Educação Presencial', 'Educação a Distância'),
+        'Município do Curso': 'MUNICÍPIO',
+        'Sigla da UF': np.array(STATES, dtype=object)[rng.integers(0, len(STATES), n_courses)],
+        'Nº de Concluintes Inscritos': rng.integers(10, 400, n_courses),
+    }
+    data['Nº  de Concluintes Participantes'] = (data['Nº de Concluintes Inscritos'] * rng.uniform(0.5, 1.0, n_courses)).astype(int)
+    data['Percentual Participantes'] = data['Nº  de Concluintes Participantes'] / data['Nº de Concluintes Inscritos']
+
+    # Efeito da instituição + ruído por questão, com ~5% de respostas ausentes
+    institution_effect = rng.normal(0, 0.3, n_institutions)
+    base = 5.0 + institution_effect[rng.integers(0, n_institutions, n_courses)]
+    answers = base[:, None] + rng.normal(0, 0.35, (n_courses, len(QUESTIONS)))
+    answers = np.clip(answers, 1, 6)
+    answers[rng.random(answers.shape) < 0.05] = np.nan
+    for i, question in enumerate(QUESTIONS):
+        data[question] = answers[:, i]
+    data['Média'] = np.nanmean(answers, axis=1)
+
+    df = pd.DataFrame(data)
+
+    # Alguns cursos da UNIFOR no Ceará, um por área
+    unifor_rows = rng.choice(n_courses, size=min(10, n_courses), replace=False)
+    df.loc[unifor_rows, 'Nome da IES'] = UNIFOR
+    df.loc[unifor_rows, 'Sigla da UF'] = 'CE'
+    df.loc[unifor_rows, 'Área de Avaliação'] = AREAS[:len(unifor_rows)]
+
+    return df
+
+
+def make_analyzer(n_courses: int = 9106, n_institutions: int = 2000, seed: int = 0) -> ENADEAnalyzer:
+    """
+    Cria um ENADEAnalyzer sobre dados sintéticos
+    """
+    return ENADEAnalyzer.from_dataframe(make_enade_dataframe(n_courses, n_institutions, seed))
+
+
+def write_student_microdata(df: pd.DataFrame, path: str, students_per_course: int = 40, seed: int = 0) -> int:
+    """
+    Grava microdados sintéticos do questionário do estudante (CSV separado por ';',
+    colunas CO_CURSO e QE_I27..QE_I68), com respostas 1 a 6 próximas da média de cada
+    curso e algumas respostas 7/8 ("não sei"/"não se aplica") ou em branco
+    """
+    rng = np.random.default_rng(seed)
+    courses = np.repeat(df['CO_CURSO'].to_numpy(), students_per_course)
+    means = np.repeat(df[QUESTIONS].fillna(5.0).to_numpy(), students_per_course, axis=0)
+
+    answers = np.clip(np.rint(means + rng.normal(0, 1.0, means.shape)), 1, 6)
+    answers[rng.random(answers.shape) < 0.03] = 7
+    answers[rng.random(answers.shape) < 0.03] = 8
+    answers[rng.random(answers.shape) < 0.02] = np.nan
+
+    microdata = pd.DataFrame(answers, columns=[f'QE_I{q[1:]}' for q in QUESTIONS]).astype('Int64')
+    microdata.insert(0, 'CO_CURSO', courses)
+    microdata.to_csv(path, sep=';', index=False, encoding='latin-1')
+    return len(microdata)
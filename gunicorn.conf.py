@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MIB = 2 ** 20
+
+# Threads por worker (ENADE_THREADS > 1 usa o worker gthread): o analisador é um
+# snapshot imutável, lido pelas threads sem locks, e cada worker mantém uma única
+# cópia dos caches para todas elas
+threads = int(os.environ.get('ENADE_THREADS', 1))
+
+
+def on_starting(server):
+    """
+    O master carrega a planilha uma única vez e exporta os dados (matriz das
+    questões, colunas categóricas codificadas e rankings) para arquivos mapeados
+    em memória, que todos os workers anexam somente para leitura
+    """
+    # Sem dados compartilhados, as rotas de atualização recusam trocas que valeriam
+    # só para um dos workers
+    os.environ['ENADE_WORKERS'] = str(server.cfg.workers)
+    if os.environ.get('ENADE_SQLITE_PATH'):
+        return
+
+    from src.enade_analyzer import ENADEAnalyzer
+    from src.routes.enade import EXCEL_PATH
+
+    if not os.path.exists(EXCEL_PATH):
+        server.log.warning('Planilha não encontrada (%s); dados não compartilhados entre workers', EXCEL_PATH)
+        return
+
+    directory = os.environ.get('ENADE_SHARED_PATH') or os.path.join(tempfile.gettempdir(), 'enade_shared')
+    manifest = ENADEAnalyzer(EXCEL_PATH).export_shared(directory)
+    os.environ['ENADE_SHARED_PATH'] = directory
+
+    saved = manifest['private_copy_bytes'] * max(server.cfg.workers - 1, 0)
+    server.log.info(
+        'Dados compartilhados em %s: %.1f MiB mapeados; uma cópia privada custaria %.1f MiB por worker '
+        '(economia estimada de %.1f MiB com %d workers)',
+        directory, manifest['shared_bytes'] / MIB, manifest['private_copy_bytes'] / MIB,
+        saved / MIB, server.cfg.workers
+    )
+
+
+def post_fork(server, worker):
+    """
+    Cada worker anexa os dados compartilhados ao iniciar e informa a memória economizada
+    """
+    if not os.environ.get('ENADE_SHARED_PATH'):
+        return
+
+    from src.routes.enade import get_analyzer
+    from src.shared_data import memory_report
+
+    analyzer = get_analyzer()
+    report = memory_report(analyzer.shared_manifest, analyzer.df)
+    # USS medido: inclui o interpretador e as estruturas que cada worker ainda monta
+    # (índices por instituição, caches sob demanda), não apenas as cópias dos dados
+    uss = f"{report['uss_bytes'] / MIB:.1f} MiB" if 'uss_bytes' in report else 'indisponível'
+    server.log.info(
+        'Worker %s anexou os dados compartilhados: USS %s, %.1f MiB mapeados sem cópia '
+        '(%.1f MiB em categorias privadas)',
+        worker.pid, uss, report['saved_bytes'] / MIB, report['private_bytes'] / MIB
+    )
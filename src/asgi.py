@@ -0,0 +1,298 @@
+"""
+Modo de serviço assíncrono (ASGI) da aplicação Flask.
+
+As rotas leves, que apenas leem os dados pré-processados em JSON, são atendidas
+diretamente no event loop quando os dados de que precisam já estão em memória;
+as que ainda precisam ler um shard do disco ou comprimir um payload vão para um
+pool de threads, e os dados da instituição padrão são carregados na inicialização. As análises do ENADEAnalyzer rodam em um pool de
+threads limitado, com um limite de concorrência e uma fila curta por endpoint:
+quando ambos estão cheios, a requisição é recusada imediatamente com 503 e
+Retry-After (backpressure), em vez de ocupar o servidor. Assim, rotas como
+/areas e /metadata continuam rápidas mesmo com as análises saturadas.
+
+Não requer dependências além de um servidor ASGI, por exemplo:
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker --config gunicorn.conf.py src.asgi:app
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import parse_qsl
+
+from src.main import app as flask_app
+from src.routes.enade import fast_request_resident, warm_web_data
+from src.serialization import dumps
+
+PREFIX = '/api/enade'
+
+# Rotas respondidas a partir dos dados pré-processados, sem o analisador
+FAST_ENDPOINTS = {
+    'metadata', 'institutions', 'comparisons', 'unifor-courses', 'extremes',
+    'course-detail', 'areas', 'dashboard-data', 'cache-stats', 'jobs'
+}
+
+# Rotas que usam o analisador: (execuções simultâneas, requisições em espera)
+HEAVY_LIMITS = {
+    'comprehensive-analysis': (2, 4),
+    'improvement-priorities': (2, 8),
+    'unifor-analysis': (2, 8),
+    'similar-institutions': (2, 8),
+    'institutional-comparison': (2, 8),
+    'question-analysis': (4, 16),
+    'student-distribution': (4, 16),
+    'simulation': (4, 16),
+    'histograms': (4, 16),
+    'outliers': (2, 8),
+    'question-correlations': (4, 16),
+    'leaderboard': (4, 16)
+}
+DEFAULT_LIMIT = (4, 16)
+
+
+class EndpointLimiter:
+    """
+    Limita as execuções simultâneas de um endpoint e o número de requisições em
+    espera; além disso, novas requisições são recusadas
+    """
+
+    def __init__(self, concurrency: int, max_waiting: int):
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._semaphore = None
+
+    def try_enter(self) -> bool:
+        """Reserva uma vaga (execução ou espera); False se o endpoint estiver saturado"""
+        if self.running + self.waiting >= self.concurrency + self.max_waiting:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        return True
+
+    async def __aenter__(self):
+        # Criado no event loop do servidor
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.running -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'concurrency': self.concurrency,
+            'max_waiting': self.max_waiting,
+            'running': self.running,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'rejected': self.rejected
+        }
+
+
+class AsyncServer:
+    """
+    Aplicação ASGI que encaminha as requisições para a aplicação WSGI do Flask,
+    no event loop (rotas leves) ou no pool de threads (análises)
+    """
+
+    def __init__(self, wsgi_app, max_workers: int = 4, limits: Dict[str, Tuple[int, int]] = None,
+                 resident: Callable[[str, Dict[str, str]], bool] = None, warm_up: Callable[[], None] = None):
+        self.wsgi_app = wsgi_app
+        self.max_workers = max_workers
+        # resident(endpoint, args): se a rota leve pode ser respondida sem ler o disco
+        self.resident = resident
+        self.warm_up = warm_up
+        self.limiters = {
+            endpoint: EndpointLimiter(*limit)
+            for endpoint, limit in (HEAVY_LIMITS if limits is None else limits).items()
+        }
+        self.default_limit = DEFAULT_LIMIT
+        self.fast_requests = 0
+        self.cold_requests = 0
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Criado sob demanda, já dentro do worker (nunca no master antes do fork)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='enade-asgi')
+        return self._executor
+
+    @staticmethod
+    def endpoint(path: str) -> str:
+        """Nome do endpoint do blueprint do ENADE ('' para as demais rotas)"""
+        if not path.startswith(PREFIX + '/'):
+            return ''
+        parts = path[len(PREFIX) + 1:].split('/')
+        # /improvement-priorities/all tem o mesmo custo de /improvement-priorities
+        return parts[0]
+
+    def limiter(self, endpoint: str) -> EndpointLimiter:
+        if endpoint not in self.limiters:
+            self.limiters[endpoint] = EndpointLimiter(*self.default_limit)
+        return self.limiters[endpoint]
+
+    def stats(self) -> Dict:
+        return {
+            'max_workers': self.max_workers,
+            'fast_requests': self.fast_requests,
+            'cold_requests': self.cold_requests,
+            'endpoints': {name: limiter.stats() for name, limiter in sorted(self.limiters.items())}
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        path = scope['path']
+        if path == PREFIX + '/serving-stats':
+            await self._send(send, '200 OK', [('Content-Type', 'application/json')],
+                             [dumps(self.stats()).encode('utf-8')])
+            return
+
+        body = await self._read_body(receive)
+        environ = self._environ(scope, body)
+        endpoint = self.endpoint(path)
+
+        if endpoint in FAST_ENDPOINTS and self._is_resident(endpoint, scope):
+            self.fast_requests += 1
+            status, headers, chunks = self._call_wsgi(environ)
+        elif endpoint in FAST_ENDPOINTS:
+            # Shard ainda não lido ou payload ainda não comprimido: fora do event loop
+            self.cold_requests += 1
+            status, headers, chunks = await asyncio.get_running_loop().run_in_executor(
+                None, self._call_wsgi, environ
+            )
+        elif endpoint:
+            limiter = self.limiter(endpoint)
+            if not limiter.try_enter():
+                await self._send(send, '503 Service Unavailable',
+                                 [('Content-Type', 'application/json'), ('Retry-After', '1')],
+                                 [dumps({'error': 'Servidor ocupado; tente novamente em instantes'}).encode('utf-8')])
+                return
+            async with limiter:
+                status, headers, chunks = await asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(), self._call_wsgi, environ
+                )
+        else:
+            # Arquivos estáticos: leitura de disco fora do event loop
+            status, headers, chunks = await asyncio.get_running_loop().run_in_executor(
+                None, self._call_wsgi, environ
+            )
+
+        await self._send(send, status, headers, chunks)
+
+    def _is_resident(self, endpoint: str, scope) -> bool:
+        if self.resident is None:
+            return True
+        # Como em request.args.get: o primeiro valor de cada parâmetro
+        args = {}
+        query = scope.get('query_string', b'').decode('utf-8', 'replace')
+        for name, value in parse_qsl(query, keep_blank_values=True):
+            args.setdefault(name, value)
+        try:
+            return self.resident(endpoint, args)
+        except Exception:
+            return False
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.warm_up is not None:
+                    try:
+                        await asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+                    except Exception as e:
+                        print(f'Falha ao pré-carregar os dados web: {e}', file=sys.stderr)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    def _environ(scope, body: bytes) -> Dict:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI representa o caminho como bytes decodificados em latin-1
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def _call_wsgi(self, environ: Dict) -> Tuple[str, List[Tuple[str, str]], List[bytes]]:
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks = list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks
+
+    @staticmethod
+    async def _send(send, status: str, headers: List[Tuple[str, str]], chunks: List[bytes]):
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+
+app = AsyncServer(flask_app, max_workers=int(os.environ.get('ENADE_ASYNC_WORKERS', 4)),
+                  resident=fast_request_resident, warm_up=warm_web_data)
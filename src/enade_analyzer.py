@@ -1,7 +1,27 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
+import base64
+import copy
+import hashlib
 import json
+import warnings
+from collections import OrderedDict
+
+REGIONS = {
+    'NORTE': ['AC', 'AM', 'AP', 'PA', 'RO', 'RR', 'TO'],
+    'NORDESTE': ['AL', 'BA', 'CE', 'MA', 'PB', 'PE', 'PI', 'RN', 'SE'],
+    'CENTRO-OESTE': ['DF', 'GO', 'MS', 'MT'],
+    'SUDESTE': ['ES', 'MG', 'RJ', 'SP'],
+    'SUL': ['PR', 'RS', 'SC']
+}
+STATE_REGION = {uf: region for region, states in REGIONS.items() for uf in states}
+
+# Escala das respostas do questionário do estudante
+SCORE_RANGE = (1.0, 6.0)
+
+# Faixas padrão dos histogramas de scores (20 faixas de 0,25 ponto)
+HISTOGRAM_EDGES = np.linspace(SCORE_RANGE[0], SCORE_RANGE[1], 21)
 
 class ENADEAnalyzer:
     """
@@ -12,8 +32,143 @@ class ENADEAnalyzer:
         """
         Inicializa o analisador com os dados da planilha
         """
-        self.df = pd.read_excel(excel_path)
+        self.load_dataframe(pd.read_excel(excel_path))
+    
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'ENADEAnalyzer':
+        """
+        Cria o analisador a partir de um DataFrame já carregado (ex.: dados sintéticos)
+        """
+        analyzer = cls.__new__(cls)
+        analyzer.load_dataframe(df)
+        return analyzer
+    
+    @classmethod
+    def from_sqlite(cls, db_path: str) -> 'ENADEAnalyzer':
+        """
+        Cria o analisador sobre um banco SQLite gerado por export_sqlite, sem manter
+        o DataFrame completo em memória
+        """
+        from src.sqlite_store import SQLiteStore
+        
+        analyzer = cls.__new__(cls)
+        analyzer.df = None
+        analyzer.store = SQLiteStore(db_path)
+        analyzer.sketches = None
+        analyzer._dataset_hash = None
+        analyzer.dataset_version = 0
+        analyzer.frozen = False
+        analyzer.setup_dimensions()
+        analyzer.setup_indicators()
+        analyzer.setup_simulation()
+        return analyzer
+    
+    @classmethod
+    def from_shared(cls, directory: str) -> 'ENADEAnalyzer':
+        """
+        Cria o analisador anexando (somente leitura) um conjunto de dados exportado
+        por export_shared, mapeado em memória e compartilhado entre os workers
+        """
+        from src.shared_data import attach_shared_dataset, shared_generation
+        
+        # Lida antes do manifesto: uma exportação posterior é sempre detectada
+        generation = shared_generation(directory)
+        df, matrix, leaderboards, derived, manifest = attach_shared_dataset(directory)
+        analyzer = cls.__new__(cls)
+        analyzer.load_dataframe(df, question_matrix=matrix, derived=derived)
+        for metric, arrays in leaderboards.items():
+            analyzer._leaderboards[metric] = analyzer._leaderboard_views(arrays)
+        # Os z-scores exportados valem para o hash calculado pelo master
+        analyzer._dataset_hash = manifest['dataset_hash']
+        analyzer._robust_zscores = (manifest['dataset_hash'], {
+            'metrics': analyzer.histogram_metrics,
+            'z': derived['zscores_z'],
+            'medians': derived['zscores_medians'],
+            'mads': derived['zscores_mads']
+        })
+        analyzer.dataset_version = manifest.get('dataset_version', 0)
+        if manifest.get('indicators'):
+            analyzer.register_indicators(manifest['indicators'])
+        analyzer.shared_manifest = manifest
+        analyzer.shared_generation = generation
+        return analyzer
+    
+    def load_dataframe(self, df: pd.DataFrame, question_matrix: np.ndarray = None, derived: Dict = None):
+        """
+        Define os dados analisados e prepara as estruturas derivadas (ou usa as
+        já calculadas em `derived`, exportadas por export_shared)
+        """
+        derived = derived or {}
+        self._ensure_mutable()
+        self.df = df
+        self.store = None
+        self.sketches = None
+        self._dataset_hash = None
+        self.dataset_version = 0
+        self.frozen = False
         self.setup_dimensions()
+        self.setup_question_matrix(question_matrix, derived.get('score_matrix'))
+        self.setup_leaderboards()
+        self.setup_indicators()
+        self.setup_simulation()
+        self.setup_histograms(derived.get('histogram_edges'), derived.get('histogram_counts'))
+        self.setup_correlations({
+            name[len('correlations_'):]: array for name, array in derived.items() if name.startswith('correlations_')
+        } or None)
+    
+    def export_sqlite(self, db_path: str):
+        """
+        Grava os dados carregados em um banco SQLite indexado (área, UF, instituição
+        e categoria) com as tabelas de agregados por área materializadas
+        """
+        from src.sqlite_store import build_sqlite_store
+        
+        dimension_scores = {dim: self.get_metric_values(dim) for dim in ['NOC', 'NFC', 'NAC']}
+        build_sqlite_store(self.df, db_path, dimension_scores, self.all_questions)
+    
+    def export_shared(self, directory: str) -> Dict:
+        """
+        Exporta os dados e os rankings pré-computados para arquivos mapeáveis em
+        memória, a serem anexados pelos workers com from_shared
+        """
+        from src.shared_data import export_shared_dataset
+        
+        # Os rankings dos indicadores personalizados não são exportados (cada worker
+        # os calcula sob demanda); as definições vão no manifesto
+        metrics = [metric for metric in self.get_leaderboard_metrics() if metric not in self.indicators]
+        leaderboards = {metric: self.get_leaderboard(metric)['arrays'] for metric in metrics}
+        
+        # Estruturas derivadas, para que os workers não as recalculem em memória privada
+        robust = self.robust_zscores()
+        derived = {
+            'score_matrix': self.score_matrix,
+            'histogram_edges': self.histogram_edges,
+            'histogram_counts': self._histogram_counts(self.histogram_edges),
+            'zscores_z': robust['z'],
+            'zscores_medians': robust['medians'],
+            'zscores_mads': robust['mads']
+        }
+        derived.update({f'correlations_{name}': array for name, array in self._correlations.items()})
+        return export_shared_dataset(self.df, self.all_questions, leaderboards, directory,
+                                     derived=derived, dataset_hash=self.dataset_hash(),
+                                     dataset_version=self.dataset_version, indicators=self.indicators)
+        
+    def dataset_hash(self) -> str:
+        """
+        Hash do conjunto de dados carregado (calculado uma vez), usado para
+        identificar resultados persistidos que ainda valem para estes dados
+        """
+        if self._dataset_hash is None:
+            digest = hashlib.sha256()
+            if self.store is not None:
+                with open(self.store.db_path, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(block)
+            else:
+                digest.update(','.join(map(str, self.df.columns)).encode('utf-8'))
+                digest.update(pd.util.hash_pandas_object(self.df, index=False).to_numpy().tobytes())
+            self._dataset_hash = digest.hexdigest()
+        return self._dataset_hash
         
     def setup_dimensions(self):
         """
@@ -33,51 +188,291 @@ class ENADEAnalyzer:
         # Todas as questões
         self.all_questions = self.noc_questions + self.nfc_questions + self.nac_questions
         
+        # Tabelas de consulta: coluna de cada questão na matriz das questões, colunas
+        # de cada dimensão e dimensão de cada questão
+        self.dimension_names = ['NOC', 'NFC', 'NAC']
+        self.question_index = {question: i for i, question in enumerate(self.all_questions)}
+        self.dimension_positions = {
+            dim: np.array([self.question_index[q] for q in questions], dtype=np.intp)
+            for dim, questions in zip(self.dimension_names,
+                                      [self.noc_questions, self.nfc_questions, self.nac_questions])
+        }
+        self.question_dimensions = {
+            question: dim for dim in self.dimension_names for question in self.dimension_questions(dim)
+        }
+    
+    def dimension_questions(self, dimension: str) -> List[str]:
+        return {'NOC': self.noc_questions, 'NFC': self.nfc_questions, 'NAC': self.nac_questions}[dimension]
+    
+    def setup_question_matrix(self, question_matrix: np.ndarray = None, score_matrix: np.ndarray = None):
+        """
+        Matriz contígua (cursos, 32 questões) na ordem de all_questions e os scores
+        de cada curso nas dimensões e no geral (NOC, NFC, NAC, GERAL), sobre os quais
+        operam os métodos por questão e por dimensão
+        """
+        if question_matrix is None:
+            question_matrix = self.df[self.all_questions].to_numpy(dtype=float)
+        self.question_matrix = np.ascontiguousarray(question_matrix, dtype=float)
+        if score_matrix is None:
+            score_matrix = np.column_stack(
+                [self._row_means(self.question_matrix[:, self.dimension_positions[dim]]) for dim in self.dimension_names]
+                + [self.df['Média'].to_numpy(dtype=float)]
+            )
+        self.score_matrix = score_matrix
+        
+        # Posições (linhas da matriz) dos cursos de cada filtro usado nas comparações
+        self._uf_codes, self._uf_names = pd.factorize(self.df['Sigla da UF'])
+        self._private_rows = self.df['Categoria Administrativa'].str.contains('Privada', na=False).to_numpy()
+        self._name_matches = {}
+        self._positional_index = self.df.index.equals(pd.RangeIndex(len(self.df)))
+    
+    def _matching_rows(self, institution_contains: str) -> np.ndarray:
+        """
+        Máscara dos cursos cujo nome da IES contém o texto (sem diferenciar
+        maiúsculas). Memorizada por texto: use apenas com nomes fixos do código
+        (a UNIFOR), nunca com valores vindos da requisição (ver _institution_mask)
+        """
+        matches = self._name_matches.get(institution_contains)
+        if matches is None:
+            matches = self._publish(self._name_matches, institution_contains, self.df['Nome da IES'].str.contains(
+                institution_contains, case=False, na=False, regex=False).to_numpy())
+        return matches
+    
+    def has_area(self, course_area: str) -> bool:
+        """Se há cursos na área de avaliação"""
+        if self.store is not None:
+            return self.store.count(area=course_area) > 0
+        return course_area in self._area_names
+    
+    def has_institution(self, institution: str) -> bool:
+        """Se há cursos da instituição com exatamente esse nome"""
+        if self.store is not None:
+            return self.store.count(institution=institution) > 0
+        return institution in self._institution_rows
+    
+    def _institution_mask(self, institution: str) -> np.ndarray:
+        """
+        Máscara dos cursos de uma instituição pelo nome exato (a UNIFOR, pelo trecho
+        usado nas demais análises); KeyError se a instituição não existir
+        """
+        if institution == 'UNIVERSIDADE DE FORTALEZA':
+            return self._matching_rows(institution)
+        rows = self._institution_rows.get(institution)
+        if rows is None:
+            raise KeyError(f'Instituição não encontrada: {institution}')
+        mask = np.zeros(len(self.question_matrix), dtype=bool)
+        mask[rows] = True
+        return mask
+    
+    def _area_mask(self, course_area: str = None) -> np.ndarray:
+        """Máscara dos cursos de uma área (todos sem área; nenhum se a área não existir)"""
+        if not course_area:
+            return np.ones(len(self.question_matrix), dtype=bool)
+        if course_area not in self._area_names:
+            return np.zeros(len(self.question_matrix), dtype=bool)
+        return self._area_codes == self._area_names.get_loc(course_area)
+    
+    def _uf_mask(self, ufs: List[str]) -> np.ndarray:
+        codes = [self._uf_names.get_loc(uf) for uf in ufs if uf in self._uf_names]
+        return np.isin(self._uf_codes, codes)
+    
+    def _frame_rows(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Linhas da matriz correspondentes a um recorte de self.df, ou None se os
+        dados não vierem de self.df (ex.: modo SQLite)
+        """
+        if self.df is None or not data.columns.equals(self.df.columns):
+            return None
+        if self._positional_index:
+            return data.index.to_numpy()
+        rows = self.df.index.get_indexer(data.index)
+        return rows if not (rows < 0).any() else None
+    
+    @staticmethod
+    def _column_means(values: np.ndarray) -> np.ndarray:
+        """Média por coluna ignorando NaN (NaN para colunas sem valores)"""
+        counts = np.sum(~np.isnan(values), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, np.nansum(values, axis=0) / counts, np.nan)
+    
+    def _dimension_scores_at(self, rows: np.ndarray) -> Dict[str, float]:
+        """
+        Médias por dimensão, geral e de cada indicador registrado dos cursos nas
+        linhas dadas (máscara ou posições)
+        """
+        scores = dict(zip(self.dimension_names + ['GERAL'], self._column_means(self.score_matrix[rows])))
+        if self.indicator_names:
+            scores.update(zip(self.indicator_names, self._column_means(self.indicator_matrix[rows])))
+        return scores
+
+    def setup_indicators(self):
+        """
+        Prepara o registro de indicadores personalizados: combinações ponderadas
+        das questões, avaliadas para todos os cursos junto com as dimensões
+        """
+        self._ensure_mutable()
+        self.indicators = {}
+        self.indicator_names = []
+        self.indicator_weights = np.zeros((len(self.all_questions), 0))
+        self.indicator_matrix = np.zeros((len(self.question_matrix), 0)) if self.store is None else None
+
+    def _indicator_weights(self, name: str, weights) -> Dict[str, float]:
+        """Valida um indicador e normaliza os pesos em {questão: peso} (apenas os não nulos)"""
+        reserved = set(self.all_questions) | set(self.dimension_names) | {'GERAL'}
+        if self.df is not None:
+            reserved |= set(self.df.columns)
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError('O indicador precisa de um nome')
+        if name in reserved:
+            raise ValueError(f'Nome reservado para o indicador: {name}')
+
+        if isinstance(weights, dict):
+            unknown = [question for question in weights if question not in self.question_index]
+            if unknown:
+                raise KeyError(f'Questão não encontrada: {unknown[0]}')
+        else:
+            weights = list(weights)
+            if len(weights) != len(self.all_questions):
+                raise ValueError(f'O vetor de pesos deve ter {len(self.all_questions)} posições (uma por questão)')
+            weights = dict(zip(self.all_questions, weights))
+
+        try:
+            weights = {question: float(weight) for question, weight in weights.items()}
+        except (TypeError, ValueError):
+            raise ValueError(f'Pesos não numéricos no indicador {name}')
+        values = np.array(list(weights.values()))
+        if not np.isfinite(values).all() or (values < 0).any() or not (values > 0).any():
+            raise ValueError(f'Os pesos do indicador {name} devem ser finitos, não negativos e não todos nulos')
+        return {question: weights[question] for question in self.all_questions if weights.get(question)}
+
+    def register_indicators(self, indicators: Dict[str, Dict]):
+        """
+        Registra (ou substitui) indicadores {nome: {'weights': {questão: peso} ou
+        vetor na ordem de all_questions, 'description': ...}}. O score de um curso
+        é a média ponderada das questões que ele respondeu; todos os indicadores
+        são reavaliados de uma vez.
+        """
+        self._ensure_mutable()
+        definitions = dict(self.indicators)
+        for name, definition in indicators.items():
+            definitions[name] = {
+                'weights': self._indicator_weights(name, definition['weights']),
+                'description': definition.get('description') or ''
+            }
+
+        self.indicators = definitions
+        self.indicator_names = list(definitions)
+        self.indicator_weights = np.zeros((len(self.all_questions), len(definitions)))
+        for i, definition in enumerate(definitions.values()):
+            for question, weight in definition['weights'].items():
+                self.indicator_weights[self.question_index[question], i] = weight
+        if self.store is None:
+            self.indicator_matrix = self._indicator_scores(self.question_matrix)
+            for name in indicators:
+                self._leaderboards.pop(name, None)
+
+    def register_indicator(self, name: str, weights, description: str = ''):
+        """Registra um indicador (ver register_indicators)"""
+        self.register_indicators({name: {'weights': weights, 'description': description}})
+
+    def _indicator_scores(self, values: np.ndarray) -> np.ndarray:
+        """
+        Scores (cursos, indicadores) das linhas de `values`: somas ponderadas das
+        respostas e dos pesos das questões respondidas em um único produto matricial
+        """
+        present = ~np.isnan(values)
+        totals, weights = np.matmul(np.stack([np.where(present, values, 0.0), present.astype(float)]),
+                                    self.indicator_weights)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(weights > 0, totals / weights, np.nan)
+
+    def with_indicators(self, indicators: Dict[str, Dict]) -> 'ENADEAnalyzer':
+        """
+        Novo analisador (congelado, se este for) com `indicators` no lugar dos
+        indicadores atuais; os dados e os demais caches são compartilhados
+        """
+        analyzer = copy.copy(self)
+        analyzer.frozen = False
+        if self.store is None:
+            analyzer._leaderboards = {metric: board for metric, board in self._leaderboards.items()
+                                      if metric not in self.indicators}
+        analyzer.setup_indicators()
+        analyzer.register_indicators(indicators)
+        return analyzer.freeze() if self.frozen else analyzer
+
+    def get_indicators(self) -> List[Dict]:
+        """Indicadores registrados, com os pesos de cada questão e a dimensão dela"""
+        return [
+            {
+                'name': name,
+                'description': definition['description'],
+                'weights': definition['weights'],
+                'dimensions': sorted({self.question_dimensions[q] for q in definition['weights']})
+            }
+            for name, definition in self.indicators.items()
+        ]
+
+    def results_hash(self) -> str:
+        """
+        Identifica os resultados das análises: o hash dos dados, combinado com as
+        definições dos indicadores registrados (que entram nas comparações)
+        """
+        if not self.indicators:
+            return self.dataset_hash()
+        digest = hashlib.sha256(self.dataset_hash().encode('utf-8'))
+        digest.update(json.dumps(self.indicators, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+        
     def get_unifor_data(self) -> pd.DataFrame:
         """
         Filtra dados da Universidade de Fortaleza
         """
+        if self.store is not None:
+            return self.store.fetch_courses(institution_contains='UNIVERSIDADE DE FORTALEZA')
         return self.df[self.df['Nome da IES'].str.contains('UNIVERSIDADE DE FORTALEZA', case=False, na=False)]
     
     def get_state_data(self, state: str = 'CE') -> pd.DataFrame:
         """
         Filtra dados por estado
         """
+        if self.store is not None:
+            return self.store.fetch_courses(uf=state)
         return self.df[self.df['Sigla da UF'] == state]
     
     def get_region_data(self, region_states: List[str]) -> pd.DataFrame:
         """
         Filtra dados por região
         """
+        if self.store is not None:
+            return self.store.fetch_courses(ufs=region_states)
         return self.df[self.df['Sigla da UF'].isin(region_states)]
     
     def get_national_data(self) -> pd.DataFrame:
         """
         Retorna todos os dados nacionais
         """
+        if self.store is not None:
+            return self.store.fetch_courses()
         return self.df
     
     def calculate_dimension_scores(self, data: pd.DataFrame) -> Dict[str, float]:
         """
-        Calcula as médias por dimensão
+        Calcula as médias por dimensão, a média geral e as dos indicadores registrados
         """
-        scores = {}
-        
-        # Organização Didático-Pedagógica
-        noc_scores = data[self.noc_questions].mean(axis=1)
-        scores['NOC'] = noc_scores.mean()
-        
-        # Infraestrutura e Instalações Físicas
-        nfc_scores = data[self.nfc_questions].mean(axis=1)
-        scores['NFC'] = nfc_scores.mean()
-        
-        # Oportunidades de Ampliação da Formação
-        nac_scores = data[self.nac_questions].mean(axis=1)
-        scores['NAC'] = nac_scores.mean()
-        
-        # Média geral
-        scores['GERAL'] = data['Média'].mean()
-        
+        # Recortes de self.df usam os scores por curso pré-computados
+        rows = self._frame_rows(data)
+        if rows is not None:
+            return self._dimension_scores_at(rows)
+        
+        # Dados externos (ex.: lidos do SQLite): uma única conversão para matriz
+        matrix = data[self.all_questions].to_numpy(dtype=float)
+        row_scores = np.column_stack(
+            [self._row_means(matrix[:, self.dimension_positions[dim]]) for dim in self.dimension_names]
+            + [data['Média'].to_numpy(dtype=float)]
+        )
+        scores = dict(zip(self.dimension_names + ['GERAL'], self._column_means(row_scores)))
+        if self.indicator_names:
+            scores.update(zip(self.indicator_names, self._column_means(self._indicator_scores(matrix))))
         return scores
     
     def find_extremes(self, data: pd.DataFrame, n: int = 4) -> Dict[str, Dict[str, List[Tuple[str, float]]]]:
@@ -89,25 +484,29 @@ class ENADEAnalyzer:
             'maiores': {}
         }
         
-        for question in self.all_questions:
-            if question in data.columns:
-                # Ordenar por questão
-                sorted_data = data.sort_values(by=question, na_position='last')
-                
-                # N menores valores
-                menores = []
-                for _, row in sorted_data.head(n).iterrows():
-                    if pd.notna(row[question]):
-                        menores.append((row['Nome da IES'], row[question]))
-                
-                # N maiores valores
-                maiores = []
-                for _, row in sorted_data.tail(n).iterrows():
-                    if pd.notna(row[question]):
-                        maiores.append((row['Nome da IES'], row[question]))
-                
-                extremes['menores'][question] = menores
-                extremes['maiores'][question] = maiores[::-1]  # Reverter para ordem decrescente
+        rows = self._frame_rows(data)
+        if rows is not None:
+            matrix = self.question_matrix[rows]
+            questions = self.all_questions
+        else:
+            questions = [q for q in self.all_questions if q in data.columns]
+            matrix = data[questions].to_numpy(dtype=float)
+        names = data['Nome da IES'].to_numpy()
+        
+        # Todas as questões ordenadas de uma vez (NaN ao final de cada coluna)
+        order = np.argsort(matrix, axis=0, kind='stable')
+        for q, question in enumerate(questions):
+            column = matrix[:, q]
+            
+            # N menores valores
+            menores = [(names[r], float(column[r])) for r in order[:n, q] if not np.isnan(column[r])]
+            
+            # N maiores valores (os n últimos da ordenação, em ordem decrescente)
+            maiores = [(names[r], float(column[r])) for r in order[len(order) - n:, q][::-1]
+                       if not np.isnan(column[r])]
+            
+            extremes['menores'][question] = menores
+            extremes['maiores'][question] = maiores
         
         return extremes
     
@@ -115,32 +514,24 @@ class ENADEAnalyzer:
         """
         Compara Universidade de Fortaleza com diferentes níveis
         """
-        # Dados da Universidade de Fortaleza
-        unifor_data = self.get_unifor_data()
-        if course_area:
-            unifor_data = unifor_data[unifor_data['Área de Avaliação'] == course_area]
-        
-        # Dados do estado (Ceará)
-        state_data = self.get_state_data('CE')
-        if course_area:
-            state_data = state_data[state_data['Área de Avaliação'] == course_area]
-        
-        # Dados da região Nordeste
         nordeste_states = ['AL', 'BA', 'CE', 'MA', 'PB', 'PE', 'PI', 'RN', 'SE']
-        region_data = self.get_region_data(nordeste_states)
-        if course_area:
-            region_data = region_data[region_data['Área de Avaliação'] == course_area]
         
-        # Dados nacionais
-        national_data = self.get_national_data()
-        if course_area:
-            national_data = national_data[national_data['Área de Avaliação'] == course_area]
+        # No modo SQLite as médias vêm das tabelas de agregados materializadas
+        if self.store is not None:
+            return {
+                'UNIFOR': self.store.dimension_scores(course_area, institution_contains='UNIVERSIDADE DE FORTALEZA'),
+                'CEARA': self.store.dimension_scores(course_area, ufs=['CE']),
+                'NORDESTE': self.store.dimension_scores(course_area, ufs=nordeste_states),
+                'BRASIL': self.store.dimension_scores(course_area)
+            }
+        
+        in_area = self._area_mask(course_area)
         
         comparison = {
-            'UNIFOR': self.calculate_dimension_scores(unifor_data),
-            'CEARA': self.calculate_dimension_scores(state_data),
-            'NORDESTE': self.calculate_dimension_scores(region_data),
-            'BRASIL': self.calculate_dimension_scores(national_data)
+            'UNIFOR': self._dimension_scores_at(self._matching_rows('UNIVERSIDADE DE FORTALEZA') & in_area),
+            'CEARA': self._dimension_scores_at(self._uf_mask(['CE']) & in_area),
+            'NORDESTE': self._dimension_scores_at(self._uf_mask(nordeste_states) & in_area),
+            'BRASIL': self._dimension_scores_at(in_area)
         }
         
         return comparison
@@ -149,12 +540,16 @@ class ENADEAnalyzer:
         """
         Retorna lista de áreas de avaliação disponíveis
         """
+        if self.store is not None:
+            return self.store.distinct_areas()
         return sorted(self.df['Área de Avaliação'].unique())
     
     def get_unifor_courses(self) -> List[str]:
         """
         Retorna lista de cursos da Universidade de Fortaleza
         """
+        if self.store is not None:
+            return self.store.distinct_areas(institution_contains='UNIVERSIDADE DE FORTALEZA')
         unifor_data = self.get_unifor_data()
         return sorted(unifor_data['Área de Avaliação'].unique())
     
@@ -186,24 +581,28 @@ class ENADEAnalyzer:
         """
         Analisa especificamente as questões da UNIFOR para identificar pontos fortes e fracos
         """
-        unifor_data = self.get_unifor_data()
-        if course_area:
-            unifor_data = unifor_data[unifor_data['Área de Avaliação'] == course_area]
+        if self.store is not None:
+            unifor_data = self.get_unifor_data()
+            if course_area:
+                unifor_data = unifor_data[unifor_data['Área de Avaliação'] == course_area]
+            matrix = unifor_data[self.all_questions].to_numpy(dtype=float)
+        else:
+            matrix = self.question_matrix[self._matching_rows('UNIVERSIDADE DE FORTALEZA') & self._area_mask(course_area)]
         
-        if unifor_data.empty:
+        if not len(matrix):
             return {}
         
-        # Calcular médias por questão para a UNIFOR
+        # Médias por questão para a UNIFOR, todas as questões de uma vez
+        counts = np.sum(~np.isnan(matrix), axis=0)
+        scores = self._column_means(matrix)
         unifor_questions = {}
-        for question in self.all_questions:
-            if question in unifor_data.columns:
-                avg_score = unifor_data[question].mean()
-                if pd.notna(avg_score):
-                    unifor_questions[question] = {
-                        'score': avg_score,
-                        'dimension': self.get_question_dimension(question),
-                        'courses_count': unifor_data[question].notna().sum()
-                    }
+        for q in np.flatnonzero(counts > 0):
+            question = self.all_questions[q]
+            unifor_questions[question] = {
+                'score': scores[q],
+                'dimension': self.question_dimensions[question],
+                'courses_count': counts[q]
+            }
         
         # Ordenar questões por score
         sorted_questions = sorted(unifor_questions.items(), key=lambda x: x[1]['score'])
@@ -238,35 +637,43 @@ class ENADEAnalyzer:
         """
         Retorna a dimensão de uma questão específica
         """
-        if question in self.noc_questions:
-            return 'NOC'
-        elif question in self.nfc_questions:
-            return 'NFC'
-        elif question in self.nac_questions:
-            return 'NAC'
-        else:
-            return 'UNKNOWN'
+        return self.question_dimensions.get(question, 'UNKNOWN')
     
     def get_similar_institutions(self, course_area: str = None, limit: int = 10) -> List[str]:
         """
         Retorna lista de instituições similares para comparação
         """
-        data = self.df.copy()
-        if course_area:
-            data = data[data['Área de Avaliação'] == course_area]
+        if self.store is not None:
+            top_institutions = self.store.fetch_courses(['Nome da IES'], order_by='Média', limit=limit,
+                                                        area=course_area, category_contains='Privada',
+                                                        not_null='Média')
+            return top_institutions['Nome da IES'].unique().tolist()
         
-        # Filtrar por categoria administrativa similar (Privada)
-        private_institutions = data[data['Categoria Administrativa'].str.contains('Privada', na=False)]
+        # Cursos da área com categoria administrativa similar (Privada) e média geral
+        media = self.score_matrix[:, 3]
+        rows = np.flatnonzero(self._area_mask(course_area) & self._private_rows & ~np.isnan(media))
         
-        # Ordenar por média geral e pegar as top instituições
-        top_institutions = private_institutions.nlargest(limit, 'Média')
+        # Ordenar por média geral (empates na ordem original) e pegar as top instituições
+        top_rows = rows[np.argsort(-media[rows], kind='stable')[:max(limit, 0)]]
         
-        return top_institutions['Nome da IES'].unique().tolist()
+        return pd.unique(self.df['Nome da IES'].to_numpy()[top_rows]).tolist()
     
     def compare_with_specific_institutions(self, institutions: List[str], course_area: str = None) -> Dict:
         """
         Compara UNIFOR com instituições específicas
         """
+        if self.store is None:
+            in_area = self._area_mask(course_area)
+            comparison = {
+                'UNIFOR': self._dimension_scores_at(self._matching_rows('UNIVERSIDADE DE FORTALEZA') & in_area)
+            }
+            for institution in institutions:
+                rows = self._institution_rows.get(institution, np.array([], dtype=np.intp))
+                rows = rows[in_area[rows]]
+                if len(rows):
+                    comparison[institution] = self._dimension_scores_at(rows)
+            return comparison
+        
         unifor_data = self.get_unifor_data()
         if course_area:
             unifor_data = unifor_data[unifor_data['Área de Avaliação'] == course_area]
@@ -276,7 +683,7 @@ class ENADEAnalyzer:
         }
         
         for institution in institutions:
-            inst_data = self.df[self.df['Nome da IES'] == institution]
+            inst_data = self.store.fetch_courses(institution=institution, area=course_area)
             if course_area:
                 inst_data = inst_data[inst_data['Área de Avaliação'] == course_area]
             
@@ -289,34 +696,51 @@ class ENADEAnalyzer:
         """
         Compara uma questão específica entre UNIFOR e outras instituições
         """
-        data = self.df.copy()
-        if course_area:
-            data = data[data['Área de Avaliação'] == course_area]
+        if question not in self.question_index:
+            raise KeyError(f'Questão não encontrada: {question}')
+        
+        # Apenas a coluna da questão é necessária (no modo SQLite, só ela é lida)
+        if self.store is not None:
+            values = self.store.column_values(question, area=course_area).astype(float)
+            unifor_data = self.get_unifor_data()
+            if course_area:
+                unifor_data = unifor_data[unifor_data['Área de Avaliação'] == course_area]
+            unifor_values = unifor_data[question].to_numpy(dtype=float) if question in unifor_data.columns else None
+        else:
+            column = self.question_matrix[:, self.question_index[question]]
+            in_area = self._area_mask(course_area)
+            values = column[in_area]
+            unifor_values = column[self._matching_rows('UNIVERSIDADE DE FORTALEZA') & in_area]
         
         # Score da UNIFOR
-        unifor_data = self.get_unifor_data()
-        if course_area:
-            unifor_data = unifor_data[unifor_data['Área de Avaliação'] == course_area]
+        unifor_score = self._column_means(unifor_values[:, None])[0] if unifor_values is not None else None
         
-        unifor_score = unifor_data[question].mean() if question in unifor_data.columns else None
+        # Estatísticas gerais da questão (ignorando cursos sem resposta)
+        present = np.sort(values[~np.isnan(values)])
+        if len(present):
+            quartiles = np.quantile(present, [0.25, 0.50, 0.75])
+            national = [present.mean(), present.std(ddof=1) if len(present) > 1 else np.nan, present[0], present[-1]]
+        else:
+            quartiles = [np.nan] * 3
+            national = [np.nan] * 4
         
-        # Estatísticas gerais da questão
         question_stats = {
             'unifor_score': unifor_score,
-            'national_mean': data[question].mean(),
-            'national_std': data[question].std(),
-            'national_min': data[question].min(),
-            'national_max': data[question].max(),
-            'percentile_25': data[question].quantile(0.25),
-            'percentile_50': data[question].quantile(0.50),
-            'percentile_75': data[question].quantile(0.75),
+            'national_mean': national[0],
+            'national_std': national[1],
+            'national_min': national[2],
+            'national_max': national[3],
+            'percentile_25': quartiles[0],
+            'percentile_50': quartiles[1],
+            'percentile_75': quartiles[2],
             'dimension': self.get_question_dimension(question)
         }
         
         # Posição da UNIFOR no ranking
         if unifor_score:
-            better_count = (data[question] < unifor_score).sum()
-            total_count = data[question].notna().sum()
+            # Sem cursos da UNIFOR (score NaN) nenhum curso fica abaixo
+            better_count = np.searchsorted(present, unifor_score, side='left') if not np.isnan(unifor_score) else 0
+            total_count = len(present)
             percentile_rank = (better_count / total_count) * 100 if total_count > 0 else 0
             question_stats['unifor_percentile'] = percentile_rank
         
@@ -326,27 +750,44 @@ class ENADEAnalyzer:
         """
         Retorna as top instituições para uma questão específica
         """
-        data = self.df.copy()
-        if course_area:
-            data = data[data['Área de Avaliação'] == course_area]
-        
-        # Filtrar dados válidos para a questão
-        valid_data = data[data[question].notna()].copy()
-        
-        # Ordenar por score da questão
-        top_institutions = valid_data.nlargest(limit, question)
-        
-        result = []
-        for _, row in top_institutions.iterrows():
-            result.append({
-                'institution': row['Nome da IES'],
-                'score': row[question],
-                'state': row['Sigla da UF'],
-                'category': row['Categoria Administrativa'],
-                'participants': row['Nº  de Concluintes Participantes']
-            })
-        
-        return result
+        if question not in self.question_index:
+            raise KeyError(f'Questão não encontrada: {question}')
+        
+        if self.store is not None:
+            if limit <= 0:
+                return []
+            columns = ['Nome da IES', question, 'Sigla da UF', 'Categoria Administrativa',
+                       'Nº  de Concluintes Participantes']
+            top = self.store.fetch_courses(columns, order_by=question, limit=limit,
+                                           area=course_area, not_null=question)
+            return [
+                {
+                    'institution': institution,
+                    'score': score,
+                    'state': state,
+                    'category': category,
+                    'participants': participants
+                }
+                for institution, score, state, category, participants
+                in zip(*(top[c].tolist() for c in columns))
+            ]
+        
+        # O ranking completo já está ordenado: basta ler a primeira página
+        if limit <= 0 or (course_area and course_area not in self.get_leaderboard(question)['areas']):
+            return []
+        
+        page = self.get_leaderboard_page(question, course_area, limit)
+        
+        return [
+            {
+                'institution': item['institution'],
+                'score': item['score'],
+                'state': item['state'],
+                'category': item['category'],
+                'participants': item['participants']
+            }
+            for item in page['items']
+        ]
     
     def identify_improvement_priorities(self, course_area: str = None) -> Dict:
         """
@@ -394,6 +835,1448 @@ class ENADEAnalyzer:
             }
         }
 
+    def identify_improvement_priorities_by_area(self, institution: str = 'UNIVERSIDADE DE FORTALEZA') -> Dict[str, Dict]:
+        """
+        Identifica as prioridades de melhoria de todas as áreas de uma instituição de
+        uma só vez (o mesmo resultado de identify_improvement_priorities para cada área)
+        """
+        if self.store is not None:
+            if institution != 'UNIVERSIDADE DE FORTALEZA':
+                raise NotImplementedError('No modo SQLite apenas a UNIFOR é suportada')
+            return {area: self.identify_improvement_priorities(area) for area in self.get_unifor_courses()}
+
+        # Somas e contagens por (área, questão) em uma única passada agrupada
+        matrix = self.question_matrix
+        present = ~np.isnan(matrix)
+        filled = np.where(present, matrix, 0.0)
+        institution_rows = self._institution_mask(institution)
+
+        n_questions = len(self.all_questions)
+        shape = (len(self._area_names), n_questions)
+
+        def grouped(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            rows = rows & (self._area_codes >= 0)
+            cells = (self._area_codes[rows, None] * n_questions + np.arange(n_questions)).ravel()
+            sums = np.bincount(cells, weights=filled[rows].ravel(), minlength=shape[0] * n_questions)
+            counts = np.bincount(cells, weights=present[rows].ravel(), minlength=shape[0] * n_questions)
+            return sums.reshape(shape), counts.reshape(shape).astype(np.int64)
+
+        area_sums, area_counts = grouped(np.ones(len(matrix), dtype=bool))
+        institution_sums, institution_counts = grouped(institution_rows)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            national_means = area_sums / area_counts
+            scores = institution_sums / institution_counts
+
+        results = {}
+        top_rows = []
+        for code in sorted(np.unique(self._area_codes[institution_rows & (self._area_codes >= 0)]),
+                           key=lambda c: self._area_names[c]):
+            area = self._area_names[code]
+
+            # 5 piores questões da instituição na área (mesma ordem de analyze_unifor_questions)
+            available = np.flatnonzero(institution_counts[code] > 0)
+            worst = available[np.argsort(scores[code, available], kind='stable')[:5]]
+
+            priorities = []
+            for q in worst:
+                score, national_mean = scores[code, q], national_means[code, q]
+                if not score or not national_mean:
+                    continue
+
+                # Percentil e melhor curso lidos do ranking pré-ordenado da questão na área
+                board = self.get_leaderboard(self.all_questions[q])['areas'][area]
+                better_count = len(board['keys']) - np.searchsorted(board['keys'], -score, side='right')
+                top_score = -board['keys'][0]
+
+                gap_to_mean = national_mean - score
+                priority = {
+                    'question': self.all_questions[q],
+                    'dimension': self.question_dimensions[self.all_questions[q]],
+                    'unifor_score': score,
+                    'national_mean': national_mean,
+                    'percentile_rank': better_count / len(board['keys']) * 100,
+                    'gap_to_mean': gap_to_mean,
+                    'gap_to_top': top_score - score,
+                    'top_performer': None,
+                    'improvement_potential': gap_to_mean * 10
+                }
+                priorities.append(priority)
+                top_rows.append((priority, board['rows'][0], top_score))
+
+            priorities.sort(key=lambda x: x['improvement_potential'], reverse=True)
+            results[area] = {
+                'priorities': priorities,
+                'summary': {
+                    'total_questions_analyzed': len(priorities),
+                    'avg_gap_to_mean': sum(p['gap_to_mean'] for p in priorities) / len(priorities) if priorities else 0,
+                    'worst_dimension': max(priorities, key=lambda x: x['gap_to_mean'])['dimension'] if priorities else None
+                }
+            }
+
+        # Dados dos melhores cursos lidos de uma só vez
+        if top_rows:
+            columns = {
+                'institution': 'Nome da IES',
+                'state': 'Sigla da UF',
+                'category': 'Categoria Administrativa',
+                'participants': 'Nº  de Concluintes Participantes'
+            }
+            rows = [row for _, row, _ in top_rows]
+            values = {key: self.df[column].take(rows).tolist() for key, column in columns.items()}
+            for i, (priority, _, top_score) in enumerate(top_rows):
+                priority['top_performer'] = {
+                    'institution': values['institution'][i],
+                    'score': top_score,
+                    'state': values['state'][i],
+                    'category': values['category'][i],
+                    'participants': values['participants'][i]
+                }
+
+        return results
+
+    def setup_leaderboards(self):
+        """
+        Prepara o cache das ordenações pré-computadas usadas nos rankings
+        """
+        # métrica -> ordenação nacional e por área (construída sob demanda)
+        self._leaderboards = {}
+        self._institution_rows = self.df.groupby('Nome da IES', sort=False, observed=True).indices
+        self._area_codes, self._area_names = pd.factorize(self.df['Área de Avaliação'])
+
+    def get_leaderboard_metrics(self) -> List[str]:
+        """
+        Retorna as métricas que possuem ranking (questões, dimensões, média geral e indicadores)
+        """
+        return self.all_questions + ['NOC', 'NFC', 'NAC', 'GERAL'] + self.indicator_names
+
+    def get_metric_values(self, metric: str) -> np.ndarray:
+        """
+        Retorna o valor de uma métrica (questão, dimensão ou indicador) para cada curso
+        """
+        if metric in self.question_index:
+            return self.question_matrix[:, self.question_index[metric]]
+        if metric in self.dimension_positions:
+            return self.score_matrix[:, self.dimension_names.index(metric)]
+        if metric == 'GERAL':
+            return self.score_matrix[:, 3]
+        if metric in self.indicators:
+            return self.indicator_matrix[:, self.indicator_names.index(metric)]
+        if metric in self.df.columns:
+            return self.df[metric].to_numpy(dtype=float)
+
+        raise KeyError(f'Métrica desconhecida: {metric}')
+
+    def _build_leaderboard(self, metric: str) -> Dict[str, np.ndarray]:
+        """
+        Ordena uma única vez todos os cursos de uma métrica, no ranking nacional e por área.
+        A ordem é decrescente por score, com desempate pelo código do curso.
+        """
+        values = self.get_metric_values(metric)
+        ids = self.df['CO_CURSO'].to_numpy(dtype=np.int64)
+        area_codes = self._area_codes
+
+        valid = np.flatnonzero(~np.isnan(values))
+        keys = -values[valid]
+
+        # Ranking nacional
+        national_rows = valid[np.lexsort((ids[valid], keys))]
+        national_rank = np.full(len(values), -1, dtype=np.int64)
+        national_rank[national_rows] = np.arange(len(national_rows))
+
+        # Rankings por área: uma única ordenação agrupada pelo código da área
+        area_rows = valid[np.lexsort((ids[valid], keys, area_codes[valid]))]
+        sorted_codes = area_codes[area_rows]
+        area_bounds = np.searchsorted(sorted_codes, np.arange(len(self._area_names) + 1))
+        area_rank = np.full(len(values), -1, dtype=np.int64)
+        area_rank[area_rows] = np.arange(len(area_rows)) - area_bounds[sorted_codes]
+
+        return {
+            'national_rows': national_rows,
+            'national_keys': -values[national_rows],
+            'national_ids': ids[national_rows],
+            'national_rank': national_rank,
+            'area_rows': area_rows,
+            'area_keys': -values[area_rows],
+            'area_ids': ids[area_rows],
+            'area_bounds': area_bounds,
+            'area_rank': area_rank
+        }
+
+    def _leaderboard_views(self, arrays: Dict[str, np.ndarray]) -> Dict:
+        """
+        Organiza os arrays de um ranking em visões (sem cópia) por área
+        """
+        bounds = arrays['area_bounds']
+        areas = {}
+        for code, name in enumerate(self._area_names):
+            start, end = bounds[code], bounds[code + 1]
+            areas[name] = {
+                'rows': arrays['area_rows'][start:end],
+                'keys': arrays['area_keys'][start:end],
+                'ids': arrays['area_ids'][start:end]
+            }
+
+        return {
+            'national': {
+                'rows': arrays['national_rows'],
+                'keys': arrays['national_keys'],
+                'ids': arrays['national_ids']
+            },
+            'national_rank': arrays['national_rank'],
+            'areas': areas,
+            'area_rank': arrays['area_rank'],
+            'arrays': arrays
+        }
+
+    def get_leaderboard(self, metric: str) -> Dict:
+        """
+        Retorna (construindo sob demanda) a ordenação pré-computada de uma métrica
+        """
+        if self.store is not None:
+            raise NotImplementedError('O ranking completo requer os dados em memória (modo DataFrame)')
+        board = self._leaderboards.get(metric)
+        if board is None:
+            board = self._publish(self._leaderboards, metric, self._leaderboard_views(self._build_leaderboard(metric)))
+        return board
+
+    @staticmethod
+    def encode_leaderboard_cursor(score: float, course_id: int) -> str:
+        """
+        Codifica a chave (score, código do curso) em um cursor opaco
+        """
+        raw = f'{float(score)!r}|{int(course_id)}'.encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def decode_leaderboard_cursor(cursor: str) -> Tuple[float, int]:
+        """
+        Decodifica um cursor gerado por encode_leaderboard_cursor
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            score, course_id = raw.split('|')
+            return float(score), int(course_id)
+        except (ValueError, UnicodeError):
+            raise ValueError('Cursor inválido')
+
+    def _leaderboard_position(self, board: Dict, score: float, course_id: int, side: str) -> int:
+        """
+        Localiza uma chave no ranking por busca binária (sem reordenar nada)
+        """
+        key = -score
+        lo = int(np.searchsorted(board['keys'], key, side='left'))
+        hi = int(np.searchsorted(board['keys'], key, side='right'))
+        return lo + int(np.searchsorted(board['ids'][lo:hi], course_id, side=side))
+
+    def _leaderboard_items(self, board: Dict, start: int, end: int) -> List[Dict]:
+        """
+        Monta os itens de uma página do ranking a partir das posições pré-computadas
+        """
+        rows = board['rows'][start:end]
+        scores = (-board['keys'][start:end]).tolist()
+        course_ids = board['ids'][start:end].tolist()
+        institutions = self.df['Nome da IES'].take(rows).tolist()
+        areas = self.df['Área de Avaliação'].take(rows).tolist()
+        states = self.df['Sigla da UF'].take(rows).tolist()
+        categories = self.df['Categoria Administrativa'].take(rows).tolist()
+        participants = self.df['Nº  de Concluintes Participantes'].take(rows).tolist()
+
+        return [
+            {
+                'rank': start + i + 1,
+                'institution': institutions[i],
+                'course_code': course_ids[i],
+                'area': areas[i],
+                'score': scores[i],
+                'state': states[i],
+                'category': categories[i],
+                'participants': participants[i]
+            }
+            for i in range(len(rows))
+        ]
+
+    def get_leaderboard_page(self, metric: str, course_area: str = None, limit: int = 20,
+                             after: str = None, before: str = None,
+                             institution: str = None) -> Dict:
+        """
+        Retorna uma página do ranking completo de uma métrica, paginada por cursor
+        (after/before) ou posicionada na página de uma instituição
+        """
+        if limit <= 0:
+            raise ValueError('limit deve ser positivo')
+
+        leaderboard = self.get_leaderboard(metric)
+        if course_area:
+            if course_area not in leaderboard['areas']:
+                raise KeyError(f'Área não encontrada: {course_area}')
+            board = leaderboard['areas'][course_area]
+            ranks = leaderboard['area_rank']
+        else:
+            board = leaderboard['national']
+            ranks = leaderboard['national_rank']
+
+        total = len(board['rows'])
+        highlight = None
+
+        if institution:
+            rows = self._institution_rows.get(institution)
+            if rows is None:
+                raise KeyError(f'Instituição não encontrada: {institution}')
+            if course_area:
+                # Cursos sem área têm código -1 e não pertencem a nenhuma área
+                rows = rows[self._area_codes[rows] == self._area_names.get_loc(course_area)]
+            positions = ranks[rows]
+            positions = positions[positions >= 0]
+            if not len(positions):
+                raise KeyError(f'Instituição sem posição neste ranking: {institution}')
+            highlight = int(positions.min())
+            start = (highlight // limit) * limit
+            end = min(start + limit, total)
+        elif after:
+            score, course_id = self.decode_leaderboard_cursor(after)
+            start = self._leaderboard_position(board, score, course_id, 'right')
+            end = min(start + limit, total)
+        elif before:
+            score, course_id = self.decode_leaderboard_cursor(before)
+            end = self._leaderboard_position(board, score, course_id, 'left')
+            start = max(end - limit, 0)
+        else:
+            start, end = 0, min(limit, total)
+
+        def cursor_at(position: int) -> str:
+            return self.encode_leaderboard_cursor(-board['keys'][position], board['ids'][position])
+
+        return {
+            'metric': metric,
+            'area': course_area,
+            'total': total,
+            'limit': limit,
+            'items': self._leaderboard_items(board, start, end),
+            'next_cursor': cursor_at(end - 1) if start < end < total else None,
+            'prev_cursor': cursor_at(start) if 0 < start < end else None,
+            'highlight_rank': highlight + 1 if highlight is not None else None
+        }
+
+    def attach_student_sketches(self, sketches):
+        """
+        Associa as distribuições por estudante (StudentSketches) aos cursos da
+        planilha e as combina uma única vez por (área, UF); área, UF, região e
+        Brasil são somas dessas células
+        """
+        from src.student_sketches import N_BINS
+
+        self._ensure_mutable()
+        if self.store is not None:
+            courses = self.store.fetch_courses(['CO_CURSO', 'Área de Avaliação', 'Sigla da UF', 'Nome da IES'])
+        else:
+            courses = self.df[['CO_CURSO', 'Área de Avaliação', 'Sigla da UF', 'Nome da IES']]
+
+        rows = sketches.rows_for(courses['CO_CURSO'].to_numpy())
+        area_codes, areas = pd.factorize(courses['Área de Avaliação'].to_numpy())
+        uf_codes, ufs = pd.factorize(courses['Sigla da UF'].to_numpy())
+
+        covered = (rows >= 0) & (area_codes >= 0) & (uf_codes >= 0)
+        cells = np.zeros((len(areas) * len(ufs), len(sketches.questions), N_BINS), dtype=np.int64)
+        np.add.at(cells, area_codes[covered] * len(ufs) + uf_codes[covered], sketches.counts[rows[covered]])
+
+        self.sketches = sketches
+        self._sketch_courses = {
+            'rows': rows,
+            'institutions': courses['Nome da IES'].to_numpy(),
+            'areas': courses['Área de Avaliação'].to_numpy(),
+            'ufs': courses['Sigla da UF'].to_numpy()
+        }
+        self._sketch_cells = cells.reshape(len(areas), len(ufs), *cells.shape[1:])
+        self._sketch_area_index = {area: i for i, area in enumerate(areas)}
+        self._sketch_uf_index = {uf: i for i, uf in enumerate(ufs)}
+
+    def get_student_histogram(self, question: str, course_area: str = None, uf: str = None,
+                              region: str = None, institution: str = None) -> np.ndarray:
+        """
+        Histograma (contagens das respostas 1 a 6) dos estudantes que atendem aos filtros
+        """
+        if self.sketches is None:
+            raise RuntimeError('Distribuições por estudante não carregadas')
+
+        position = self.sketches.question_position(question)
+        if region and region not in REGIONS:
+            raise KeyError(f'Região não encontrada: {region}')
+
+        # Com filtro de instituição, somam-se apenas os cursos dela
+        if institution:
+            courses = self._sketch_courses
+            mask = courses['institutions'] == institution
+            if course_area:
+                mask &= courses['areas'] == course_area
+            if uf:
+                mask &= courses['ufs'] == uf
+            if region:
+                mask &= np.isin(courses['ufs'], REGIONS[region])
+            rows = courses['rows'][mask]
+            rows = rows[rows >= 0]
+            return self.sketches.counts[rows, position].sum(axis=0, dtype=np.int64)
+
+        cells = self._sketch_cells[:, :, position]
+        if course_area:
+            if course_area not in self._sketch_area_index:
+                return np.zeros(cells.shape[-1], dtype=np.int64)
+            cells = cells[[self._sketch_area_index[course_area]]]
+
+        ufs = [uf] if uf else REGIONS[region] if region else None
+        if ufs is not None:
+            cells = cells[:, [self._sketch_uf_index[s] for s in ufs if s in self._sketch_uf_index]]
+
+        return cells.sum(axis=(0, 1))
+
+    def get_student_distribution(self, question: str, course_area: str = None, uf: str = None,
+                                 region: str = None, institution: str = None, score: float = None) -> Dict:
+        """
+        Distribuição das respostas dos estudantes a uma questão (e, se `score` for
+        dado, o percentual de estudantes que responderam abaixo dele)
+        """
+        from src.student_sketches import SCALE, histogram_mean, histogram_percentile, histogram_quantiles
+
+        histogram = self.get_student_histogram(question, course_area, uf, region, institution)
+        percentile_25, percentile_50, percentile_75 = histogram_quantiles(histogram, [0.25, 0.50, 0.75])
+
+        distribution = {
+            'question': question,
+            'dimension': self.get_question_dimension(question),
+            'filters': {'area': course_area, 'uf': uf, 'region': region, 'institution': institution},
+            'students': int(histogram.sum()),
+            'histogram': {str(value): int(count) for value, count in zip(SCALE, histogram)},
+            'mean': histogram_mean(histogram),
+            'percentile_25': percentile_25,
+            'percentile_50': percentile_50,
+            'percentile_75': percentile_75
+        }
+        if score is not None:
+            distribution['score'] = score
+            distribution['percentile_rank'] = histogram_percentile(histogram, score)
+        return distribution
+
+    def setup_simulation(self):
+        """
+        Prepara os caches usados pelas simulações: agregados por área (compartilhados
+        entre instituições) e a linha de base de cada (instituição, área)
+        """
+        self._simulation_areas = {}
+        self._simulation_bases = {}
+
+    @staticmethod
+    def _row_means(values: np.ndarray) -> np.ndarray:
+        """Média por linha ignorando NaN (NaN para linhas sem valores)"""
+        counts = np.sum(~np.isnan(values), axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, np.nansum(values, axis=1) / counts, np.nan)
+
+    def _simulation_area(self, course_area: str = None) -> Dict:
+        """
+        Agregados de uma área (ou nacionais) usados pelas simulações: colunas das
+        questões ordenadas, somas e contagens por questão e somas dos scores por UF
+        """
+        if course_area in self._simulation_areas:
+            return self._simulation_areas[course_area]
+
+        matrix = self.question_matrix
+
+        if course_area:
+            if course_area not in self._area_names:
+                raise KeyError(f'Área não encontrada: {course_area}')
+            in_area = self._area_mask(course_area)
+        else:
+            in_area = np.ones(len(matrix), dtype=bool)
+
+        # Scores por curso nas dimensões e no geral (NOC, NFC, NAC, GERAL)
+        values = matrix[in_area]
+        row_scores = self.score_matrix[in_area]
+        uf_codes, ufs = pd.factorize(self.df['Sigla da UF'].to_numpy()[in_area])
+        present = ~np.isnan(row_scores)
+        uf_sums = np.zeros((len(ufs), 4))
+        uf_counts = np.zeros((len(ufs), 4), dtype=np.int64)
+        np.add.at(uf_sums, uf_codes, np.where(present, row_scores, 0.0))
+        np.add.at(uf_counts, uf_codes, present)
+
+        area = {
+            'in_area': in_area,
+            'sorted': np.sort(values, axis=0),  # NaN ao final de cada coluna
+            'counts': np.sum(~np.isnan(values), axis=0),
+            'sums': np.nansum(values, axis=0),
+            'uf_index': {uf: i for i, uf in enumerate(ufs)},
+            'uf_sums': uf_sums,
+            'uf_counts': uf_counts
+        }
+        return self._publish(self._simulation_areas, course_area, area)
+
+    def _simulation_base(self, institution: str, course_area: str = None) -> Dict:
+        """
+        Linha de base de uma instituição em uma área: seus cursos, a contribuição
+        deles para cada nível (instituição, UF, região e Brasil) e os resultados
+        sem alterações
+        """
+        if self.store is not None:
+            raise NotImplementedError('A simulação não está disponível no modo SQLite')
+
+        key = (institution, course_area)
+        if key in self._simulation_bases:
+            return self._simulation_bases[key]
+
+        all_rows = self._institution_rows.get(institution)
+        if all_rows is None:
+            raise KeyError(f'Instituição não encontrada: {institution}')
+        area = self._simulation_area(course_area)
+        rows = all_rows[area['in_area'][all_rows]]
+        if not len(rows):
+            raise KeyError(f'Instituição sem cursos nesta área: {institution}')
+
+        # UF da instituição: a que concentra mais cursos; região correspondente
+        course_ufs = self.df['Sigla da UF'].to_numpy()
+        states, counts = np.unique(course_ufs[all_rows].astype(str), return_counts=True)
+        uf = states[np.argmax(counts)]
+        region = STATE_REGION.get(uf)
+        level_ufs = {
+            'institution': [],
+            'state': [uf],
+            'region': REGIONS.get(region, [uf]),
+            'national': list(area['uf_index'])
+        }
+
+        matrix = self.question_matrix[rows]
+        row_ufs = course_ufs[rows]
+        question_columns = [c for c in self.df.columns if c.startswith('Q') and c[1:].isdigit()]
+
+        others = area['in_area'].copy()
+        others[rows] = False
+        with np.errstate(invalid='ignore'):
+            others_max = np.fmax.reduce(self.question_matrix[others], axis=0) if others.any() \
+                else np.full(len(self.all_questions), np.nan)
+
+        base = {
+            'institution': institution,
+            'area': course_area,
+            'uf': uf,
+            'region': region,
+            'rows': rows,
+            'matrix': matrix,
+            'media': self.df['Média'].to_numpy(dtype=float)[rows],
+            'answered': self.df[question_columns].iloc[rows].notna().sum(axis=1).to_numpy(),
+            'others_max': others_max,
+            'members': {level: np.isin(row_ufs, ufs) if level != 'institution' else np.ones(len(rows), dtype=bool)
+                        for level, ufs in level_ufs.items()},
+            'level_ufs': {level: [area['uf_index'][s] for s in ufs if s in area['uf_index']]
+                          for level, ufs in level_ufs.items()}
+        }
+
+        # Resultados sem alterações e contribuição atual da instituição em cada nível
+        row_scores = self._simulated_row_scores(base, matrix)
+        base['row_scores'] = row_scores
+        base['scores'], base['national_mean'], base['percentile'] = self._simulated_questions(
+            base, area, matrix, np.arange(len(self.all_questions)))
+        base['levels'] = self._simulated_levels(base, area, row_scores)
+
+        return self._publish(self._simulation_bases, key, base)
+
+    def _simulated_row_scores(self, base: Dict, matrix: np.ndarray, dimensions: List[str] = None,
+                              previous: np.ndarray = None) -> np.ndarray:
+        """
+        Scores (NOC, NFC, NAC, GERAL) dos cursos da instituição; apenas as
+        dimensões em `dimensions` são recalculadas a partir de `previous`
+        """
+        positions = self.dimension_positions
+        if previous is None:
+            row_scores = np.empty((len(matrix), 4))
+            dimensions = ['NOC', 'NFC', 'NAC']
+        else:
+            row_scores = previous.copy()
+
+        for i, dim in enumerate(['NOC', 'NFC', 'NAC']):
+            if dim in dimensions:
+                row_scores[:, i] = self._row_means(matrix[:, positions[dim]])
+
+        # A média geral do curso varia com a soma das alterações sobre as respostas do curso
+        shift = np.nansum(matrix - base['matrix'], axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            row_scores[:, 3] = base['media'] + np.where(base['answered'] > 0, shift / base['answered'], 0.0)
+        return row_scores
+
+    def _simulated_questions(self, base: Dict, area: Dict, matrix: np.ndarray,
+                             questions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score da instituição, média nacional e percentil nas questões dadas,
+        substituindo os valores originais dos seus cursos pelos de `matrix`
+        """
+        original = base['matrix'][:, questions]
+        values = matrix[:, questions]
+        present = ~np.isnan(values)
+        counts = present.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = np.where(counts > 0, np.nansum(values, axis=0) / counts, np.nan)
+            national_mean = (area['sums'][questions] - np.nansum(original, axis=0) + np.nansum(values, axis=0)) \
+                / area['counts'][questions]
+
+        percentile = np.full(len(questions), np.nan)
+        for i, q in enumerate(questions):
+            if np.isnan(scores[i]) or not scores[i]:
+                continue
+            column = area['sorted'][:area['counts'][q], q]
+            below = (np.searchsorted(column, scores[i], side='left')
+                     - np.sum(original[:, i] < scores[i]) + np.sum(values[:, i] < scores[i]))
+            percentile[i] = below / area['counts'][q] * 100
+        return scores, national_mean, percentile
+
+    def _simulated_levels(self, base: Dict, area: Dict, row_scores: np.ndarray) -> Dict[str, Dict[str, float]]:
+        """
+        Scores por dimensão em cada nível, trocando a contribuição original dos
+        cursos da instituição pela de `row_scores`
+        """
+        present = ~np.isnan(row_scores)
+        original = base.get('row_scores', row_scores)
+        original_present = ~np.isnan(original)
+
+        levels = {}
+        for level, members in base['members'].items():
+            if level == 'institution':
+                sums = np.zeros(4)
+                counts = np.zeros(4, dtype=np.int64)
+            else:
+                ufs = base['level_ufs'][level]
+                sums = area['uf_sums'][ufs].sum(axis=0) - np.where(original_present, original, 0.0)[members].sum(axis=0)
+                counts = area['uf_counts'][ufs].sum(axis=0) - original_present[members].sum(axis=0)
+            sums = sums + np.where(present, row_scores, 0.0)[members].sum(axis=0)
+            counts = counts + present[members].sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = np.where(counts > 0, sums / counts, np.nan)
+            levels[level] = dict(zip(['NOC', 'NFC', 'NAC', 'GERAL'], means.tolist()))
+        return levels
+
+    def _simulated_priorities(self, base: Dict, scores: np.ndarray, national_mean: np.ndarray,
+                              percentile: np.ndarray, top: np.ndarray) -> List[Dict]:
+        """
+        Prioridades de melhoria (mesmo critério de identify_improvement_priorities):
+        as 5 piores questões, ordenadas pelo gap em relação à média nacional
+        """
+        available = np.flatnonzero(~np.isnan(scores))
+        worst = available[np.argsort(scores[available], kind='stable')[:5]]
+
+        priorities = []
+        for q in worst:
+            if not scores[q] or not national_mean[q]:
+                continue
+            gap_to_mean = national_mean[q] - scores[q]
+            priorities.append({
+                'question': self.all_questions[q],
+                'dimension': self.question_dimensions[self.all_questions[q]],
+                'score': scores[q],
+                'national_mean': national_mean[q],
+                'percentile_rank': percentile[q],
+                'gap_to_mean': gap_to_mean,
+                'gap_to_top': top[q] - scores[q],
+                'improvement_potential': gap_to_mean * 10
+            })
+        priorities.sort(key=lambda x: x['improvement_potential'], reverse=True)
+        return priorities
+
+    def simulate_improvements(self, deltas: Dict[str, float], course_area: str = None,
+                              institution: str = 'UNIVERSIDADE DE FORTALEZA') -> Dict:
+        """
+        Simula alterações hipotéticas nas questões dos cursos de uma instituição
+        (ex.: {'Q58': 0.3}) e recalcula, a partir dos agregados em cache, apenas
+        as questões e dimensões afetadas: scores por nível, percentis e prioridades
+        """
+        for question in deltas:
+            if question not in self.all_questions:
+                raise KeyError(f'Questão não encontrada: {question}')
+
+        base = self._simulation_base(institution, course_area)
+        area = self._simulation_area(course_area)
+
+        changed = np.array(sorted(self.all_questions.index(q) for q, d in deltas.items() if d), dtype=np.int64)
+        delta = np.zeros(len(self.all_questions))
+        delta[changed] = [float(deltas[self.all_questions[q]]) for q in changed]
+
+        # Valores simulados, limitados à escala das respostas (ausentes continuam ausentes)
+        matrix = base['matrix'].copy()
+        matrix[:, changed] = np.clip(matrix[:, changed] + delta[changed], *SCORE_RANGE)
+
+        scores = base['scores'].copy()
+        national_mean = base['national_mean'].copy()
+        percentile = base['percentile'].copy()
+        levels = base['levels']
+        if len(changed):
+            scores[changed], national_mean[changed], percentile[changed] = self._simulated_questions(
+                base, area, matrix, changed)
+            dimensions = {self.question_dimensions[self.all_questions[q]] for q in changed}
+            row_scores = self._simulated_row_scores(base, matrix, dimensions, base['row_scores'])
+            levels = self._simulated_levels(base, area, row_scores)
+
+        top = np.fmax(base['others_max'], np.fmax.reduce(matrix, axis=0))
+
+        return {
+            'institution': institution,
+            'area': course_area,
+            'uf': base['uf'],
+            'region': base['region'],
+            'deltas': {self.all_questions[q]: delta[q] for q in changed},
+            'dimension_scores': {
+                level: {
+                    dim: {'baseline': base['levels'][level][dim], 'simulated': levels[level][dim]}
+                    for dim in ['NOC', 'NFC', 'NAC', 'GERAL']
+                }
+                for level in ['institution', 'state', 'region', 'national']
+            },
+            'questions': {
+                self.all_questions[q]: {
+                    'dimension': self.question_dimensions[self.all_questions[q]],
+                    'baseline_score': base['scores'][q],
+                    'score': scores[q],
+                    'national_mean': national_mean[q],
+                    'baseline_percentile_rank': base['percentile'][q],
+                    'percentile_rank': percentile[q]
+                }
+                for q in changed
+            },
+            'priorities': self._simulated_priorities(base, scores, national_mean, percentile, top)
+        }
+
+    def setup_histograms(self, edges: np.ndarray = None, counts: np.ndarray = None):
+        """
+        Pré-computa os histogramas de todas as questões e dimensões por área com as
+        faixas `edges` (padrão: HISTOGRAM_EDGES), ou usa as contagens já calculadas
+        `counts`; outras faixas são calculadas sob demanda
+        """
+        self._ensure_mutable()
+        self.histogram_metrics = self.all_questions + ['NOC', 'NFC', 'NAC', 'GERAL']
+        self.histogram_edges = self._validate_edges(HISTOGRAM_EDGES if edges is None else edges)
+        self._histograms = OrderedDict()
+        if counts is not None:
+            self._histograms[tuple(self.histogram_edges.tolist())] = counts
+        else:
+            self._histogram_counts(self.histogram_edges)
+
+    @staticmethod
+    def _validate_edges(edges) -> np.ndarray:
+        edges = np.asarray(edges, dtype=float)
+        if edges.ndim != 1 or len(edges) < 2 or np.isnan(edges).any() or np.any(np.diff(edges) <= 0):
+            raise ValueError('As faixas devem ter ao menos dois limites crescentes')
+        return edges
+
+    def _metric_matrix(self) -> np.ndarray:
+        """Matriz (cursos, métricas) com as 32 questões, as três dimensões e a média geral"""
+        return np.hstack([self.question_matrix, self.score_matrix])
+
+    @staticmethod
+    def _bin_counts(values: np.ndarray, area_codes: np.ndarray, edges: np.ndarray, n_areas: int) -> np.ndarray:
+        """Contagens (área, métrica, faixa) dos valores (cursos, métricas) em uma única bincount"""
+        n_metrics = values.shape[1]
+        n_bins = len(edges) - 1
+
+        # Faixa de cada valor (a última faixa inclui o limite superior, como em np.histogram)
+        bins = np.searchsorted(edges, values, side='right') - 1
+        bins[values == edges[-1]] = n_bins - 1
+        areas = np.broadcast_to(area_codes[:, None], values.shape)
+        valid = (bins >= 0) & (bins < n_bins) & (areas >= 0)
+
+        cells = (areas * n_metrics + np.arange(n_metrics)) * n_bins + bins
+        counts = np.bincount(cells[valid], minlength=n_areas * n_metrics * n_bins)
+        return counts.reshape(n_areas, n_metrics, n_bins)
+
+    def _histogram_counts(self, edges: np.ndarray) -> np.ndarray:
+        """
+        Contagens (área, métrica, faixa) calculadas em uma única passada; os
+        `max_cached` conjuntos de faixas mais recentes ficam em memória
+        """
+        key = tuple(edges.tolist())
+        counts = self._histograms.get(key)
+        if counts is not None:
+            try:
+                self._histograms.move_to_end(key)
+            except KeyError:
+                # Descartado por outra thread entre a leitura e a reordenação
+                pass
+            return counts
+
+        counts = self._publish(self._histograms, key, self._bin_counts(
+            self._metric_matrix(), self._area_codes, edges, len(self._area_names)))
+        while len(self._histograms) > 8:
+            try:
+                self._histograms.popitem(last=False)
+            except KeyError:
+                break
+        return counts
+
+    def get_histograms(self, course_area: str = None, institution: str = 'UNIVERSIDADE DE FORTALEZA',
+                       metrics: List[str] = None, edges: List[float] = None) -> Dict:
+        """
+        Histogramas dos scores dos cursos de uma área (ou de todo o país) por questão
+        e dimensão, indicando o score médio da instituição e a faixa em que ele cai
+        """
+        if self.store is not None:
+            raise NotImplementedError('Os histogramas requerem os dados em memória (modo DataFrame)')
+
+        edges = self.histogram_edges if edges is None else self._validate_edges(edges)
+        metrics = self.histogram_metrics if metrics is None else metrics
+        for metric in metrics:
+            if metric not in self.histogram_metrics:
+                raise KeyError(f'Métrica desconhecida: {metric}')
+
+        counts = self._histogram_counts(edges)
+        if course_area:
+            if course_area not in self._area_names:
+                raise KeyError(f'Área não encontrada: {course_area}')
+            counts = counts[self._area_names.get_loc(course_area)]
+        else:
+            counts = counts.sum(axis=0)
+
+        # Scores médios da instituição na área (mesmas médias de compare_with_levels)
+        rows = self._institution_rows.get(institution)
+        if rows is None:
+            raise KeyError(f'Instituição não encontrada: {institution}')
+        if course_area:
+            # Mesmo recorte de _area_mask: cursos sem área (código -1) ficam de fora
+            rows = rows[self._area_codes[rows] == self._area_names.get_loc(course_area)]
+        institution_values = np.hstack([self.question_matrix[rows], self.score_matrix[rows]])
+        with np.errstate(invalid='ignore'):
+            present = ~np.isnan(institution_values)
+            totals = np.where(present, institution_values, 0.0).sum(axis=0)
+            institution_scores = np.where(present.any(axis=0), totals / np.maximum(present.sum(axis=0), 1), np.nan)
+        institution_bins = np.searchsorted(edges, institution_scores, side='right') - 1
+        institution_bins[institution_scores == edges[-1]] = len(edges) - 2
+
+        histograms = {}
+        for metric in metrics:
+            m = self.histogram_metrics.index(metric)
+            score = institution_scores[m]
+            inside = not np.isnan(score) and 0 <= institution_bins[m] < len(edges) - 1
+            histograms[metric] = {
+                'counts': counts[m].tolist(),
+                'total': int(counts[m].sum()),
+                'institution_score': None if np.isnan(score) else float(score),
+                'institution_bin': int(institution_bins[m]) if inside else None
+            }
+
+        return {
+            'area': course_area,
+            'institution': institution,
+            'edges': edges.tolist(),
+            'histograms': histograms
+        }
+
+    def robust_zscores(self) -> Dict[str, np.ndarray]:
+        """
+        Z-scores robustos (escore z modificado, 0,6745 * (x - mediana) / MAD) de cada
+        curso em cada questão e dimensão, normalizados pela sua área de avaliação.
+        Calculado em uma única passada e mantido em cache por versão dos dados.
+        """
+        if self.store is not None:
+            raise NotImplementedError('Os z-scores requerem os dados em memória (modo DataFrame)')
+
+        version = self.dataset_hash()
+        cached = getattr(self, '_robust_zscores', None)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        values = self._metric_matrix()
+        medians, mads = self._robust_stats(values, self._area_codes, len(self._area_names))
+        z = self._robust_z(values, self._area_codes, medians, mads)
+
+        result = {'metrics': self.histogram_metrics, 'z': z, 'medians': medians, 'mads': mads}
+        if self.frozen:
+            self._read_only(result)
+        self._robust_zscores = (version, result)
+        return result
+
+    @staticmethod
+    def _robust_stats(values: np.ndarray, codes: np.ndarray, n_areas: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Medianas e MADs (áreas, métricas) de todas as áreas de uma vez"""
+        # Cursos agrupados por área em uma matriz (áreas, cursos da área, métricas)
+        # preenchida com NaN, para medianas e MADs de todas as áreas de uma vez
+        order = np.argsort(codes, kind='stable')
+        order = order[codes[order] >= 0]
+        sizes = np.bincount(codes[order], minlength=n_areas)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        slots = np.arange(len(order)) - starts[codes[order]]
+        grouped = np.full((n_areas, max(int(sizes.max(initial=0)), 1), values.shape[1]), np.nan)
+        grouped[codes[order], slots] = values[order]
+
+        with warnings.catch_warnings():
+            # Áreas sem respostas em uma questão resultam em NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            medians = np.nanmedian(grouped, axis=1)
+            mads = np.nanmedian(np.abs(grouped - medians[:, None, :]), axis=1)
+        return medians, mads
+
+    @staticmethod
+    def _robust_z(values: np.ndarray, codes: np.ndarray, medians: np.ndarray, mads: np.ndarray) -> np.ndarray:
+        z = np.full(values.shape, np.nan)
+        in_area = codes >= 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deviations = values[in_area] - medians[codes[in_area]]
+            scale = mads[codes[in_area]]
+            # Com MAD nulo (mais da metade dos cursos empatados) o escore fica indefinido
+            z[in_area] = np.where(scale > 0, 0.6745 * deviations / scale, np.nan)
+        return z
+
+    def get_outliers(self, institution: str = None, course_area: str = None, uf: str = None,
+                     threshold: float = 3.5, only_outliers: bool = True, limit: int = 100) -> Dict:
+        """
+        Cursos com z-scores robustos fora de ±threshold (3,5 segundo Iglewicz e
+        Hoaglin), filtráveis por instituição, área e UF, com os agregados por dimensão
+        """
+        if threshold <= 0:
+            raise ValueError('threshold deve ser positivo')
+
+        scores = self.robust_zscores()
+        metrics = scores['metrics']
+        z = scores['z']
+
+        mask = np.ones(len(self.df), dtype=bool)
+        if institution:
+            if institution not in self._institution_rows:
+                raise KeyError(f'Instituição não encontrada: {institution}')
+            mask[:] = False
+            mask[self._institution_rows[institution]] = True
+        if course_area:
+            if course_area not in self._area_names:
+                raise KeyError(f'Área não encontrada: {course_area}')
+            mask &= self._area_codes == self._area_names.get_loc(course_area)
+        if uf:
+            mask &= (self.df['Sigla da UF'] == uf).to_numpy()
+
+        rows = np.flatnonzero(mask)
+        with np.errstate(invalid='ignore'):
+            flagged = np.abs(z[rows]) > threshold
+        if only_outliers:
+            keep = flagged.any(axis=1)
+            rows, flagged = rows[keep], flagged[keep]
+
+        # Mais anômalos primeiro
+        extremity = np.nan_to_num(np.nanmax(np.abs(z[rows]), axis=1, initial=0.0), nan=0.0)
+        order = np.argsort(-extremity, kind='stable')[:limit]
+
+        positions = self.dimension_positions
+        question_count = len(self.all_questions)
+        columns = self.df[['CO_CURSO', 'Nome da IES', 'Área de Avaliação', 'Sigla da UF']].to_numpy()
+
+        def as_float(value):
+            return None if np.isnan(value) else round(float(value), 4)
+
+        courses = []
+        for i in order:
+            row = rows[i]
+            course_z = z[row]
+            course_flags = flagged[i]
+            courses.append({
+                'course': int(columns[row, 0]) if pd.notna(columns[row, 0]) else None,
+                'institution': columns[row, 1],
+                'area': columns[row, 2],
+                'uf': columns[row, 3],
+                'z_scores': {q: as_float(course_z[m]) for m, q in enumerate(self.all_questions)},
+                'dimensions': {
+                    dim: {
+                        'z_score': as_float(course_z[question_count + d]),
+                        'outlier': bool(course_flags[question_count + d]),
+                        'outlier_questions': [self.all_questions[p] for p in positions[dim] if course_flags[p]]
+                    }
+                    for d, dim in enumerate(['NOC', 'NFC', 'NAC'])
+                },
+                'geral': as_float(course_z[-1]),
+                'outliers': [metrics[m] for m in np.flatnonzero(course_flags)]
+            })
+
+        return {
+            'filters': {'institution': institution, 'area': course_area, 'uf': uf},
+            'threshold': threshold,
+            'total': int(len(rows)),
+            'outlier_counts': {metrics[m]: int(n) for m, n in enumerate(flagged.sum(axis=0)) if n},
+            'courses': courses
+        }
+
+    def setup_correlations(self, correlations: Dict[str, np.ndarray] = None):
+        """
+        Pré-computa, em uma passada, as matrizes de correlação e covariância entre
+        as questões em cada área e no Brasil (ver _question_correlations), ou usa
+        as já calculadas `correlations`
+        """
+        if correlations is None:
+            correlations = self._question_correlations(self.question_matrix, self._area_codes, len(self._area_names))
+        self._correlations = correlations
+
+    @staticmethod
+    def _pairwise_moments(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Contagens, covariâncias e correlações (questões x questões) com exclusão
+        dos ausentes par a par, como DataFrame.count/cov/corr, em produtos matriciais
+        """
+        present = ~np.isnan(values)
+        mask = present.astype(float)
+        # Centralizar não altera os momentos par a par e evita perda de precisão
+        x = np.where(present, values - np.nan_to_num(ENADEAnalyzer._column_means(values)), 0.0)
+
+        counts = mask.T @ mask
+        sums = x.T @ mask          # sums[i, j]: soma de i nos cursos com i e j presentes
+        squares = (x * x).T @ mask
+        with np.errstate(invalid='ignore', divide='ignore'):
+            products = x.T @ x - sums * sums.T / counts
+            variances = squares - sums * sums / counts
+            # Variância residual de arredondamento é tratada como nula (correlação indefinida)
+            variances[variances <= squares * 1e-12] = 0.0
+            covariance = products / (counts - 1)
+            correlation = np.clip(products / np.sqrt(variances * variances.T), -1.0, 1.0)
+        covariance[counts < 2] = np.nan
+        correlation[(counts < 2) | (variances == 0) | (variances.T == 0)] = np.nan
+        return counts.astype(np.int64), covariance, correlation
+
+    def _question_correlations(self, values: np.ndarray, area_codes: np.ndarray, n_areas: int,
+                               previous: Dict[str, np.ndarray] = None, areas: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """
+        Momentos par a par das questões para cada área (posição = código da área) e
+        para o Brasil (última posição), e a ordem das demais questões de cada uma
+        por correlação decrescente (ausentes ao final). Com `previous`, apenas as
+        áreas em `areas` e o Brasil são recalculados.
+        """
+        n_questions = values.shape[1]
+        shape = (n_areas + 1, n_questions, n_questions)
+        result = {
+            'counts': np.zeros(shape, dtype=np.int64),
+            'covariance': np.full(shape, np.nan),
+            'correlation': np.full(shape, np.nan)
+        }
+        if previous is None:
+            areas = np.arange(n_areas)
+        else:
+            kept = len(previous['correlation']) - 1
+            for name in result:
+                result[name][:kept] = previous[name][:kept]
+
+        # Uma ordenação pelos códigos das áreas; cada área é uma fatia contígua
+        order = np.argsort(area_codes, kind='stable')
+        bounds = np.searchsorted(area_codes[order], np.arange(n_areas + 1))
+        for code in list(areas) + [n_areas]:
+            rows = order[bounds[code]:bounds[code + 1]] if code < n_areas else slice(None)
+            result['counts'][code], result['covariance'][code], result['correlation'][code] = \
+                self._pairwise_moments(values[rows])
+
+        # Ranking das demais questões de cada (área, questão), excluindo a própria
+        keys = -result['correlation']
+        keys[:, np.arange(n_questions), np.arange(n_questions)] = np.nan
+        ranked = np.argsort(keys, axis=-1, kind='stable')
+        itself = ranked == np.arange(n_questions)[:, None]
+        result['order'] = ranked[~itself].reshape(n_areas + 1, n_questions, n_questions - 1)
+        result['ranked'] = np.sum(~np.isnan(keys), axis=-1)
+        return result
+
+    def get_correlated_questions(self, question: str, course_area: str = None, limit: int = 5) -> Dict:
+        """
+        Questões que mais variam junto com `question` entre os cursos de uma área
+        (ou do Brasil), pela correlação de Pearson pré-computada na carga
+        """
+        if self.store is not None:
+            raise NotImplementedError('As correlações requerem os dados em memória (modo DataFrame)')
+        if question not in self.question_index:
+            raise KeyError(f'Questão não encontrada: {question}')
+        if limit < 1:
+            raise ValueError('limit deve ser positivo')
+
+        correlations = self._correlations
+        if course_area:
+            if course_area not in self._area_names:
+                raise KeyError(f'Área não encontrada: {course_area}')
+            code = self._area_names.get_loc(course_area)
+        else:
+            code = len(correlations['correlation']) - 1
+
+        q = self.question_index[question]
+        others = correlations['order'][code, q, :min(limit, correlations['ranked'][code, q])]
+        return {
+            'question': question,
+            'dimension': self.question_dimensions[question],
+            'area': course_area,
+            'courses': int(correlations['counts'][code, q, q]),
+            'correlated': [
+                {
+                    'question': self.all_questions[j],
+                    'dimension': self.question_dimensions[self.all_questions[j]],
+                    'correlation': float(correlations['correlation'][code, q, j]),
+                    'covariance': float(correlations['covariance'][code, q, j]),
+                    'courses': int(correlations['counts'][code, q, j])
+                }
+                for j in others
+            ]
+        }
+
+    def _parse_update_values(self, record: Dict) -> Dict:
+        """Valida as colunas de um registro e converte os valores numéricos"""
+        unknown = [column for column in record if column not in self.df.columns]
+        if unknown:
+            raise ValueError(f'Colunas desconhecidas: {", ".join(map(str, unknown))}')
+        numeric = set(self.all_questions) | {'Média'}
+        values = {}
+        for column, value in record.items():
+            if column in numeric:
+                try:
+                    value = np.nan if value is None else float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f'Valor não numérico para {column}: {value!r}')
+            values[column] = value
+        return values
+
+    @staticmethod
+    def _insertion_points(keys: np.ndarray, ids: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                          new_keys: np.ndarray, new_ids: np.ndarray) -> np.ndarray:
+        """Posição de cada novo (score, código do curso) na fatia ordenada keys[start:end]"""
+        points = np.empty(len(new_keys), dtype=np.intp)
+        for i, (start, end, key, course) in enumerate(zip(starts, ends, new_keys, new_ids)):
+            lo = start + np.searchsorted(keys[start:end], key, side='left')
+            hi = start + np.searchsorted(keys[start:end], key, side='right')
+            points[i] = lo + np.searchsorted(ids[lo:hi], course)
+        return points
+
+    def _splice_leaderboard(self, arrays: Dict[str, np.ndarray], removed: np.ndarray, remap: np.ndarray,
+                            added: np.ndarray, values: np.ndarray, ids: np.ndarray,
+                            area_codes: np.ndarray, n_areas: int) -> Dict[str, np.ndarray]:
+        """
+        Atualiza um ranking já ordenado: retira as linhas removidas ou alteradas e
+        insere as novas versões nas suas posições, sem reordenar os demais cursos
+        """
+        new_values = values[added]
+        present = ~np.isnan(new_values)
+        added, new_keys = added[present], -new_values[present]
+        new_ids, new_codes = ids[added], area_codes[added]
+        spliced = {}
+
+        # Ranking nacional, ordenado por (score decrescente, código do curso)
+        keep = ~np.isin(arrays['national_rows'], removed)
+        rows, keys, course_ids = remap[arrays['national_rows'][keep]], arrays['national_keys'][keep], arrays['national_ids'][keep]
+        order = np.lexsort((new_ids, new_keys))
+        points = self._insertion_points(keys, course_ids, np.zeros(len(order), dtype=np.intp),
+                                        np.full(len(order), len(keys)), new_keys[order], new_ids[order])
+        spliced['national_rows'] = np.insert(rows, points, added[order])
+        spliced['national_keys'] = np.insert(keys, points, new_keys[order])
+        spliced['national_ids'] = np.insert(course_ids, points, new_ids[order])
+
+        # Rankings por área, ordenados por (área, score decrescente, código do curso)
+        keep = ~np.isin(arrays['area_rows'], removed)
+        rows, keys, course_ids = remap[arrays['area_rows'][keep]], arrays['area_keys'][keep], arrays['area_ids'][keep]
+        codes = area_codes[rows]
+        order = np.lexsort((new_ids, new_keys, new_codes))
+        points = self._insertion_points(keys, course_ids,
+                                        np.searchsorted(codes, new_codes[order], side='left'),
+                                        np.searchsorted(codes, new_codes[order], side='right'),
+                                        new_keys[order], new_ids[order])
+        spliced['area_rows'] = np.insert(rows, points, added[order])
+        spliced['area_keys'] = np.insert(keys, points, new_keys[order])
+        spliced['area_ids'] = np.insert(course_ids, points, new_ids[order])
+
+        sorted_codes = area_codes[spliced['area_rows']]
+        spliced['area_bounds'] = np.searchsorted(sorted_codes, np.arange(n_areas + 1))
+        spliced['national_rank'] = np.full(len(values), -1, dtype=np.int64)
+        spliced['national_rank'][spliced['national_rows']] = np.arange(len(spliced['national_rows']))
+        spliced['area_rank'] = np.full(len(values), -1, dtype=np.int64)
+        spliced['area_rank'][spliced['area_rows']] = \
+            np.arange(len(spliced['area_rows'])) - spliced['area_bounds'][sorted_codes]
+        return spliced
+
+    def apply_updates(self, inserts: List[Dict] = None, updates: List[Dict] = None,
+                      deletes: List[int] = None) -> Dict:
+        """
+        Aplica inserções, alterações e exclusões de cursos (identificados por CO_CURSO)
+        sem recarregar a planilha. Apenas as linhas e as áreas afetadas são
+        recalculadas nos índices, rankings, histogramas e z-scores; os caches que
+        dependem delas são descartados e a versão dos dados avança. Os arrays e o
+        DataFrame anteriores não são modificados.
+        """
+        self._ensure_mutable()
+        if self.store is not None:
+            raise NotImplementedError('As atualizações incrementais requerem os dados em memória (modo DataFrame)')
+
+        inserts, updates, deletes = list(inserts or []), list(updates or []), list(deletes or [])
+        df = self.df
+        course_index = pd.Index(df['CO_CURSO'].to_numpy(dtype=np.int64))
+        if not course_index.is_unique:
+            raise ValueError('Os dados carregados possuem CO_CURSO repetido')
+
+        def locate(codes: List, action: str) -> np.ndarray:
+            codes = np.array([int(code) for code in codes], dtype=np.int64)
+            rows = course_index.get_indexer(codes)
+            if (rows < 0).any():
+                raise KeyError(f'Curso não encontrado para {action}: {codes[rows < 0][0]}')
+            return rows
+
+        if any('CO_CURSO' not in record for record in updates + inserts):
+            raise ValueError('Cada alteração e inserção deve informar CO_CURSO')
+        update_rows = locate([record['CO_CURSO'] for record in updates], 'alteração')
+        delete_rows = np.unique(locate(deletes, 'exclusão'))
+        if len(np.unique(update_rows)) < len(update_rows) or np.isin(update_rows, delete_rows).any():
+            raise ValueError('Um curso só pode ser alterado ou excluído uma vez por atualização')
+        insert_codes = np.array([int(record['CO_CURSO']) for record in inserts], dtype=np.int64)
+        if len(np.unique(insert_codes)) < len(insert_codes) or \
+                (course_index.get_indexer(insert_codes) >= 0).any():
+            raise ValueError('CO_CURSO inserido já existe')
+        changes = [self._parse_update_values({k: v for k, v in record.items() if k != 'CO_CURSO'})
+                   for record in updates]
+        records = [self._parse_update_values(record) for record in inserts]
+
+        # Novo DataFrame (cópia na escrita): alterações, exclusões e inserções ao final
+        new_df = df.copy()
+        for row, change in zip(update_rows, changes):
+            for column, value in change.items():
+                if isinstance(new_df[column].dtype, pd.CategoricalDtype) and pd.notna(value) \
+                        and value not in new_df[column].cat.categories:
+                    new_df[column] = new_df[column].cat.add_categories([value])
+                new_df.iloc[row, new_df.columns.get_loc(column)] = value
+        new_df = new_df.drop(index=new_df.index[delete_rows])
+        if records:
+            inserted = pd.DataFrame(records, columns=df.columns)
+            new_df = pd.concat([new_df, inserted.astype({c: float for c in self.all_questions + ['Média']})],
+                               ignore_index=True)
+        else:
+            new_df = new_df.reset_index(drop=True)
+
+        # Posição nova de cada linha antiga (-1 se excluída) e linhas cuja versão mudou
+        n_old = len(df)
+        remap = np.arange(n_old) - np.searchsorted(delete_rows, np.arange(n_old))
+        remap[delete_rows] = -1
+        n_kept = n_old - len(delete_rows)
+        removed = np.union1d(update_rows, delete_rows)
+        added = np.concatenate([remap[update_rows], np.arange(n_kept, n_kept + len(records))]).astype(np.intp)
+        grow = len(records)
+
+        def resize(array: np.ndarray, fill) -> np.ndarray:
+            array = np.delete(array, delete_rows, axis=0)
+            padding = np.full((grow,) + array.shape[1:], fill, dtype=array.dtype)
+            return np.concatenate([array, padding])
+
+        old_metrics = np.hstack([self.question_matrix[removed], self.score_matrix[removed]])
+        old_area_codes = self._area_codes[removed]
+        old_institutions = set(df['Nome da IES'].take(removed).dropna())
+
+        # Matrizes e scores por curso: apenas as linhas novas são calculadas
+        changed = new_df.iloc[added]
+        question_matrix = resize(self.question_matrix, np.nan)
+        question_matrix[added] = changed[self.all_questions].to_numpy(dtype=float)
+        score_matrix = resize(self.score_matrix, np.nan)
+        score_matrix[added] = np.column_stack(
+            [self._row_means(question_matrix[added][:, self.dimension_positions[dim]]) for dim in self.dimension_names]
+            + [changed['Média'].to_numpy(dtype=float)]
+        )
+
+        # Códigos de área e UF: novas categorias entram ao final
+        def recode(codes: np.ndarray, names: pd.Index, values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+            new_names = pd.Index(pd.unique(values.dropna())).difference(names, sort=False)
+            names = names.append(new_names) if len(new_names) else names
+            codes = resize(codes, -1)
+            codes[added] = names.get_indexer(values.to_numpy())
+            return codes, names
+
+        area_codes, area_names = recode(self._area_codes, self._area_names, changed['Área de Avaliação'])
+        uf_codes, uf_names = recode(self._uf_codes, self._uf_names, changed['Sigla da UF'])
+        indicator_matrix = resize(self.indicator_matrix, np.nan)
+        indicator_matrix[added] = self._indicator_scores(question_matrix[added])
+        private_rows = resize(self._private_rows, False)
+        private_rows[added] = changed['Categoria Administrativa'].str.contains('Privada', na=False).to_numpy()
+        name_matches = {}
+        for pattern, matches in self._name_matches.items():
+            matches = resize(matches, False)
+            matches[added] = changed['Nome da IES'].str.contains(pattern, case=False, na=False, regex=False).to_numpy()
+            name_matches[pattern] = matches
+
+        affected_codes = np.unique(np.concatenate([old_area_codes, area_codes[added]]))
+        affected_codes = affected_codes[affected_codes >= 0]
+        affected_areas = set(area_names[affected_codes])
+        affected_institutions = old_institutions | set(changed['Nome da IES'].dropna())
+        n_areas = len(area_names)
+        new_metrics = np.hstack([question_matrix[added], score_matrix[added]])
+
+        # Rankings já construídos: atualizados por inserção ordenada (ou refeitos, se
+        # a atualização alcançar boa parte dos cursos)
+        ids = new_df['CO_CURSO'].to_numpy(dtype=np.int64)
+        metric_columns = {metric: i for i, metric in enumerate(self.histogram_metrics)}
+        full_metrics = np.hstack([question_matrix, score_matrix])
+        leaderboards = {}
+        for metric, board in self._leaderboards.items():
+            if metric in metric_columns:
+                values = full_metrics[:, metric_columns[metric]]
+            elif metric in self.indicators:
+                values = indicator_matrix[:, self.indicator_names.index(metric)]
+            else:
+                values = new_df[metric].to_numpy(dtype=float)
+            if len(removed) + len(added) > len(new_df) // 8:
+                leaderboards[metric] = None
+            else:
+                leaderboards[metric] = self._splice_leaderboard(board['arrays'], removed, remap, added,
+                                                                values, ids, area_codes, n_areas)
+
+        # Histogramas: as linhas antigas saem e as novas entram nas contagens
+        histograms = OrderedDict()
+        for key, counts in self._histograms.items():
+            edges = np.asarray(key)
+            padded = np.zeros((n_areas,) + counts.shape[1:], dtype=counts.dtype)
+            padded[:len(counts)] = counts
+            histograms[key] = (padded - self._bin_counts(old_metrics, old_area_codes, edges, n_areas)
+                               + self._bin_counts(new_metrics, area_codes[added], edges, n_areas))
+
+        # Correlações entre as questões: apenas as áreas afetadas e o Brasil
+        correlations = self._question_correlations(question_matrix, area_codes, n_areas,
+                                                   self._correlations, affected_codes)
+
+        # Z-scores robustos: medianas, MADs e escores refeitos apenas nas áreas afetadas
+        robust = None
+        cached = getattr(self, '_robust_zscores', None)
+        if cached is not None and cached[0] == self._dataset_hash:
+            previous = cached[1]
+            medians = np.full((n_areas, full_metrics.shape[1]), np.nan)
+            mads = np.full((n_areas, full_metrics.shape[1]), np.nan)
+            medians[:len(previous['medians'])] = previous['medians']
+            mads[:len(previous['mads'])] = previous['mads']
+            z = resize(previous['z'], np.nan)
+            z[added] = np.nan
+            in_affected = np.isin(area_codes, affected_codes)
+            local_codes = np.searchsorted(affected_codes, area_codes[in_affected])
+            area_medians, area_mads = self._robust_stats(full_metrics[in_affected], local_codes, len(affected_codes))
+            medians[affected_codes], mads[affected_codes] = area_medians, area_mads
+            z[in_affected] = self._robust_z(full_metrics[in_affected], local_codes, area_medians, area_mads)
+            robust = {'metrics': self.histogram_metrics, 'z': z, 'medians': medians, 'mads': mads}
+
+        # Simulações: descarta o que depende das áreas/instituições afetadas e
+        # reposiciona as demais linhas de base
+        simulation_areas = {}
+        for area, cache in self._simulation_areas.items():
+            if area and area not in affected_areas:
+                simulation_areas[area] = dict(cache, in_area=resize(cache['in_area'], False))
+        simulation_bases = {}
+        for (institution, area), base in self._simulation_bases.items():
+            if area and area not in affected_areas and institution not in affected_institutions:
+                simulation_bases[(institution, area)] = dict(base, rows=remap[base['rows']])
+
+        previous_hash = self.dataset_hash()
+        digest = hashlib.sha256(previous_hash.encode('utf-8'))
+        digest.update(json.dumps({'insert': inserts, 'update': updates, 'delete': [int(c) for c in deletes]},
+                                 sort_keys=True, default=str).encode('utf-8'))
+
+        # Troca do estado
+        self.df = new_df
+        self.question_matrix, self.score_matrix = question_matrix, score_matrix
+        self.indicator_matrix = indicator_matrix
+        self._area_codes, self._area_names = area_codes, area_names
+        self._uf_codes, self._uf_names = uf_codes, uf_names
+        self._private_rows, self._name_matches = private_rows, name_matches
+        self._positional_index = True
+        self._institution_rows = new_df.groupby('Nome da IES', sort=False, observed=True).indices
+        self._leaderboards = {
+            metric: self._leaderboard_views(arrays) for metric, arrays in leaderboards.items() if arrays is not None
+        }
+        self._histograms = histograms
+        self._correlations = correlations
+        self._simulation_areas, self._simulation_bases = simulation_areas, simulation_bases
+        self._dataset_hash = digest.hexdigest()
+        self.dataset_version += 1
+        if robust is not None:
+            self._robust_zscores = (self._dataset_hash, robust)
+        if self.sketches is not None:
+            self.attach_student_sketches(self.sketches)
+
+        return {
+            'version': self.dataset_version,
+            'dataset_hash': self._dataset_hash,
+            'previous_hash': previous_hash,
+            'inserted': len(records),
+            'updated': len(update_rows),
+            'deleted': len(delete_rows),
+            'courses': len(new_df),
+            'areas': sorted(affected_areas),
+            'institutions': sorted(affected_institutions)
+        }
+
+    def _ensure_mutable(self):
+        if getattr(self, 'frozen', False):
+            raise RuntimeError('O snapshot do analisador é imutável; use updated() para obter uma nova versão')
+
+    @staticmethod
+    def _read_only(value):
+        """Marca como somente leitura todos os arrays de `value` (dicionários, listas e tuplas)"""
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        elif isinstance(value, dict):
+            for item in value.values():
+                ENADEAnalyzer._read_only(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                ENADEAnalyzer._read_only(item)
+        return value
+
+    def _publish(self, cache: Dict, key, value):
+        """
+        Guarda em `cache` um resultado calculado sob demanda. setdefault é atômico:
+        se outra thread publicou a mesma chave antes, todas passam a usar o valor
+        dela. No snapshot imutável, os arrays publicados são somente leitura.
+        """
+        if self.frozen:
+            self._read_only(value)
+        return cache.setdefault(key, value)
+
+    def _read_only_frame(self) -> pd.DataFrame:
+        """
+        Mesmo DataFrame sobre arrays somente leitura: as questões são colunas da
+        matriz das questões e as demais colunas só são copiadas se ainda forem
+        graváveis (os dados compartilhados já são mapeados somente para leitura)
+        """
+        data = {}
+        for column in self.df.columns:
+            series = self.df[column]
+            if column in self.question_index and series.dtype == np.float64:
+                data[column] = self.question_matrix[:, self.question_index[column]]
+            elif isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy()
+                codes = self._read_only(codes.copy() if codes.flags.writeable else codes)
+                data[column] = pd.Categorical.from_codes(codes, dtype=series.dtype, validate=False)
+            elif isinstance(series.dtype, np.dtype):
+                values = series.to_numpy()
+                data[column] = self._read_only(values.copy() if values.flags.writeable else values)
+            else:
+                data[column] = series.array
+        return pd.DataFrame(data, index=self.df.index, copy=False)
+
+    def freeze(self) -> 'ENADEAnalyzer':
+        """
+        Torna o analisador um snapshot imutável, que pode ser lido por várias
+        threads sem locks: o DataFrame e todos os arrays passam a ser somente
+        leitura, os caches sob demanda são publicados atomicamente e as operações
+        que alterariam os dados são recusadas. Atualizações e recargas produzem um
+        novo snapshot (updated), que substitui este por inteiro.
+        """
+        if self.frozen:
+            return self
+
+        self.dataset_hash()
+        if self.store is None:
+            self.robust_zscores()
+            self._matching_rows('UNIVERSIDADE DE FORTALEZA')
+            self._read_only([
+                self.question_matrix, self.score_matrix, self.dimension_positions,
+                self.indicator_weights, self.indicator_matrix,
+                self._area_codes, self._uf_codes, self._private_rows, self._name_matches,
+                self._institution_rows, self._leaderboards, self._histograms, self._correlations,
+                self._simulation_areas, self._simulation_bases, self._robust_zscores
+            ])
+            self.df = self._read_only_frame()
+        if self.sketches is not None:
+            self._read_only([self.sketches.counts, self._sketch_courses, self._sketch_cells])
+
+        self.frozen = True
+        return self
+
+    def updated(self, inserts: List[Dict] = None, updates: List[Dict] = None,
+                deletes: List[int] = None) -> Tuple['ENADEAnalyzer', Dict]:
+        """
+        Aplica as atualizações (ver apply_updates) em um novo analisador, que
+        compartilha com este tudo o que não mudou, e o retorna com o resumo;
+        o novo analisador é congelado se este for. Este não é alterado.
+        """
+        analyzer = copy.copy(self)
+        analyzer.frozen = False
+        summary = analyzer.apply_updates(inserts, updates, deletes)
+        return (analyzer.freeze() if self.frozen else analyzer), summary
+
 if __name__ == "__main__":
     # Teste das novas funcionalidades
     analyzer = ENADEAnalyzer('/home/ubuntu/upload/ResumoQuestionário.xlsx')
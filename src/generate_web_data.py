@@ -1,110 +1,305 @@
+import hashlib
 import json
+import os
+import shutil
+import sys
+import unicodedata
+import uuid
 import pandas as pd
-from enade_analyzer import ENADEAnalyzer
+from enade_analyzer import ENADEAnalyzer, STATE_REGION
+from serialization import dumps
 
-def generate_web_data():
+DEFAULT_INSTITUTION = 'UNIVERSIDADE DE FORTALEZA'
+
+# Rótulos usados nas comparações (mantêm as chaves históricas da UNIFOR)
+INSTITUTION_LABELS = {
+    'UNIVERSIDADE DE FORTALEZA': 'UNIFOR'
+}
+
+STATE_NAMES = {
+    'AC': 'ACRE', 'AL': 'ALAGOAS', 'AM': 'AMAZONAS', 'AP': 'AMAPA', 'BA': 'BAHIA', 'CE': 'CEARA',
+    'DF': 'DISTRITO FEDERAL', 'ES': 'ESPIRITO SANTO', 'GO': 'GOIAS', 'MA': 'MARANHAO',
+    'MG': 'MINAS GERAIS', 'MS': 'MATO GROSSO DO SUL', 'MT': 'MATO GROSSO', 'PA': 'PARA',
+    'PB': 'PARAIBA', 'PE': 'PERNAMBUCO', 'PI': 'PIAUI', 'PR': 'PARANA', 'RJ': 'RIO DE JANEIRO',
+    'RN': 'RIO GRANDE DO NORTE', 'RO': 'RONDONIA', 'RR': 'RORAIMA', 'RS': 'RIO GRANDE DO SUL',
+    'SC': 'SANTA CATARINA', 'SE': 'SERGIPE', 'SP': 'SAO PAULO', 'TO': 'TOCANTINS'
+}
+
+DIMENSION_NAMES = {
+    'NOC': 'Organização Didático-Pedagógica',
+    'NFC': 'Infraestrutura e Instalações Físicas',
+    'NAC': 'Oportunidades de Ampliação da Formação'
+}
+
+SCORE_COLUMNS = ['NOC', 'NFC', 'NAC', 'GERAL']
+
+
+def shard_file_name(name: str) -> str:
+    """
+    Nome de arquivo estável e seguro para uma instituição ou área
+    """
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    slug = ''.join(c if c.isalnum() else '-' for c in ascii_name.lower()).strip('-')[:60]
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+    return f'{slug}-{digest}.json'
+
+
+def _scores_by(scores: pd.DataFrame, keys) -> dict:
+    """
+    Médias por dimensão agrupadas por `keys`, como dicionário {chave: {dimensão: média}}
+    """
+    return scores.groupby(keys, sort=False)[SCORE_COLUMNS].mean().to_dict('index')
+
+
+def build_institution_data(analyzer: ENADEAnalyzer) -> dict:
     """
-    Gera dados estruturados para a aplicação web
+    Calcula, em uma única passada agrupada, os dados web de todas as instituições:
+    comparações com UF/região/Brasil por área, cursos e registros de cada instituição,
+    e os extremos de cada área
     """
-    analyzer = ENADEAnalyzer('/home/ubuntu/upload/ResumoQuestionário.xlsx')
-    
-    # Dados básicos
-    web_data = {
+    df = analyzer.df
+
+    # Scores por curso calculados de forma vetorizada
+    scores = pd.DataFrame({
+        'ies': df['Nome da IES'].to_numpy(),
+        'area': df['Área de Avaliação'].to_numpy(),
+        'uf': df['Sigla da UF'].to_numpy(),
+        'NOC': analyzer.get_metric_values('NOC'),
+        'NFC': analyzer.get_metric_values('NFC'),
+        'NAC': analyzer.get_metric_values('NAC'),
+        'GERAL': df['Média'].to_numpy(dtype=float)
+    })
+    scores['region'] = scores['uf'].map(STATE_REGION)
+
+    institution_area = _scores_by(scores, ['ies', 'area'])
+    institution_all = _scores_by(scores, 'ies')
+    state_area = _scores_by(scores, ['uf', 'area'])
+    state_all = _scores_by(scores, 'uf')
+    region_area = _scores_by(scores, ['region', 'area'])
+    region_all = _scores_by(scores, 'region')
+    national_area = _scores_by(scores, 'area')
+    national_all = scores[SCORE_COLUMNS].mean().to_dict()
+
+    # UF de cada instituição: a que concentra mais cursos
+    state_counts = scores.groupby(['ies', 'uf'], sort=False).size().reset_index(name='n')
+    state_counts = state_counts.sort_values(['ies', 'n', 'uf'], ascending=[True, False, True])
+    institution_state = state_counts.drop_duplicates('ies').set_index('ies')['uf'].to_dict()
+
+    # Cursos (mesmo formato de unifor_courses) montados a partir dos arrays das colunas
+    questions = analyzer.question_matrix
+    course_columns = zip(
+        df['CO_CURSO'].tolist(),
+        df['Área de Avaliação'].tolist(),
+        df['Nº  de Concluintes Participantes'].tolist(),
+        df['Percentual Participantes'].tolist(),
+        df['Média'].tolist(),
+        scores['NOC'].tolist(),
+        scores['NFC'].tolist(),
+        scores['NAC'].tolist(),
+        questions.tolist()
+    )
+    courses = []
+    for codigo, area, participantes, percentual, media, noc, nfc, nac, answers in course_columns:
+        courses.append({
+            'codigo': codigo,
+            'area': area,
+            'participantes': participantes,
+            'percentual_participacao': percentual,
+            'media_geral': media,
+            'scores': {'NOC': noc, 'NFC': nfc, 'NAC': nac},
+            'questions': {q: v for q, v in zip(analyzer.all_questions, answers) if v == v}
+        })
+    records = df.to_dict('records')
+
+    institutions = {}
+    for name, rows in df.groupby('Nome da IES', sort=True, observed=True).indices.items():
+        # Instituições sem UF informada ficam sem os níveis estadual e regional
+        uf = institution_state.get(name)
+        region = STATE_REGION.get(uf)
+        levels = [
+            (INSTITUTION_LABELS.get(name, name), institution_all, institution_area, name),
+            (STATE_NAMES.get(uf, uf) or 'UF', state_all, state_area, uf),
+            (region or 'REGIAO', region_all, region_area, region),
+        ]
+
+        areas = sorted({courses[i]['area'] for i in rows})
+        comparisons = {'geral': {}}
+        for label, level_all, _, key in levels:
+            comparisons['geral'][label] = level_all.get(key, dict.fromkeys(SCORE_COLUMNS))
+        comparisons['geral']['BRASIL'] = national_all
+        for area in areas:
+            comparisons[area] = {}
+            for label, _, level_area, key in levels:
+                comparisons[area][label] = level_area.get((key, area), dict.fromkeys(SCORE_COLUMNS))
+            comparisons[area]['BRASIL'] = national_area[area]
+
+        institutions[name] = {
+            'institution': name,
+            'label': INSTITUTION_LABELS.get(name, name),
+            'uf': uf,
+            'region': region,
+            'areas': areas,
+            'total_courses': len(rows),
+            'comparisons': comparisons,
+            'courses': [courses[i] for i in rows],
+            'records': {area: [records[i] for i in rows if courses[i]['area'] == area] for area in areas}
+        }
+
+    # Extremos por área (compartilhados por todas as instituições)
+    area_data = {}
+    for area, rows in df.groupby('Área de Avaliação', sort=True, observed=True).indices.items():
+        area_data[area] = {
+            'area': area,
+            'total_courses': len(rows),
+            'extremes': analyzer.find_extremes(df.iloc[rows])
+        }
+
+    return {
         'metadata': {
-            'total_courses': len(analyzer.df),
-            'unifor_courses': len(analyzer.get_unifor_data()),
+            'total_courses': len(df),
+            'total_institutions': len(institutions),
             'course_areas': analyzer.get_course_areas(),
-            'unifor_areas': analyzer.get_unifor_courses(),
             'dimensions': {
-                'NOC': {
-                    'name': 'Organização Didático-Pedagógica',
-                    'questions': analyzer.noc_questions
-                },
-                'NFC': {
-                    'name': 'Infraestrutura e Instalações Físicas',
-                    'questions': analyzer.nfc_questions
-                },
-                'NAC': {
-                    'name': 'Oportunidades de Ampliação da Formação',
-                    'questions': analyzer.nac_questions
-                }
+                dim: {'name': DIMENSION_NAMES[dim], 'questions': questions_list}
+                for dim, questions_list in [('NOC', analyzer.noc_questions),
+                                            ('NFC', analyzer.nfc_questions),
+                                            ('NAC', analyzer.nac_questions)]
             }
         },
-        'comparisons': {},
-        'detailed_analysis': {}
+        'institutions': institutions,
+        'areas': area_data
     }
-    
-    # Comparação geral (todas as áreas)
-    web_data['comparisons']['geral'] = analyzer.compare_with_levels()
-    
-    # Comparações por área da UNIFOR
-    for area in analyzer.get_unifor_courses():
-        web_data['comparisons'][area] = analyzer.compare_with_levels(area)
-    
-    # Análise detalhada por área
-    for area in analyzer.get_unifor_courses():
-        web_data['detailed_analysis'][area] = {
-            'extremes': analyzer.find_extremes(
-                analyzer.df[analyzer.df['Área de Avaliação'] == area]
-            ),
-            'unifor_data': analyzer.get_unifor_data()[
-                analyzer.get_unifor_data()['Área de Avaliação'] == area
-            ].to_dict('records')
-        }
-    
-    # Dados da UNIFOR por curso
-    unifor_data = analyzer.get_unifor_data()
-    web_data['unifor_courses'] = []
-    
-    for _, course in unifor_data.iterrows():
-        course_data = {
-            'codigo': course['CO_CURSO'],
-            'area': course['Área de Avaliação'],
-            'participantes': course['Nº  de Concluintes Participantes'],
-            'percentual_participacao': course['Percentual Participantes'],
-            'media_geral': course['Média'],
-            'scores': {
-                'NOC': course[analyzer.noc_questions].mean(),
-                'NFC': course[analyzer.nfc_questions].mean(),
-                'NAC': course[analyzer.nac_questions].mean()
-            },
-            'questions': {}
-        }
-        
-        # Adicionar todas as questões
-        for question in analyzer.all_questions:
-            if pd.notna(course[question]):
-                course_data['questions'][question] = course[question]
-        
-        web_data['unifor_courses'].append(course_data)
-    
-    return web_data
+
+
+def generate_web_data(analyzer: ENADEAnalyzer = None, institution: str = DEFAULT_INSTITUTION):
+    """
+    Gera dados estruturados para a aplicação web (arquivo único de uma instituição)
+    """
+    if analyzer is None:
+        analyzer = ENADEAnalyzer('/home/ubuntu/upload/ResumoQuestionário.xlsx')
+
+    data = build_institution_data(analyzer)
+    shard = data['institutions'][institution]
+
+    return {
+        'metadata': {
+            **data['metadata'],
+            'unifor_courses': shard['total_courses'],
+            'unifor_areas': shard['areas']
+        },
+        'comparisons': shard['comparisons'],
+        'detailed_analysis': {
+            area: {
+                'extremes': data['areas'][area]['extremes'],
+                'unifor_data': shard['records'][area]
+            }
+            for area in shard['areas']
+        },
+        'unifor_courses': shard['courses']
+    }
+
+
+def _write_json(path: str, value):
+    """Grava em um arquivo temporário no mesmo diretório e o troca atomicamente pelo destino"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(dumps(value))
+    os.replace(tmp_path, path)
+
+
+def _manifest_generations(manifest: dict) -> set:
+    """
+    Diretórios de primeiro nível (generations/<id>, ou institutions e areas no
+    formato sem gerações) com os shards referenciados por um manifesto
+    """
+    generations = set()
+    for file_name in list(manifest['institutions'].values()) + list(manifest['areas'].values()):
+        parts = os.path.normpath(file_name).split(os.sep)
+        generations.add(os.path.join(*parts[:2]) if parts[0] == 'generations' else parts[0])
+    return generations
+
+
+def save_sharded_web_data(analyzer: ENADEAnalyzer, output_dir: str) -> dict:
+    """
+    Grava os dados de todas as instituições em shards (um arquivo por instituição
+    e por área) com um manifesto pequeno que os indexa.
+
+    Cada geração vai para um diretório novo (generations/<id>/) e o manifesto é
+    trocado atomicamente por último, de modo que quem lê os dados durante a
+    regeração nunca encontra shards incompletos. A geração anterior é mantida
+    para as leituras que ainda usam o manifesto antigo; as mais antigas são removidas.
+    """
+    data = build_institution_data(analyzer)
+
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    previous = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    generation = os.path.join('generations', f"{pd.Timestamp.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}")
+    os.makedirs(os.path.join(output_dir, generation, 'institutions'))
+    os.makedirs(os.path.join(output_dir, generation, 'areas'))
+
+    manifest = {
+        'format': 1,
+        'generated_at': pd.Timestamp.now().isoformat(),
+        'default_institution': DEFAULT_INSTITUTION,
+        'metadata': data['metadata'],
+        'institutions': {},
+        'areas': {}
+    }
+
+    for name, shard in data['institutions'].items():
+        file_name = os.path.join(generation, 'institutions', shard_file_name(name))
+        _write_json(os.path.join(output_dir, file_name), shard)
+        manifest['institutions'][name] = file_name
+
+    for area, shard in data['areas'].items():
+        file_name = os.path.join(generation, 'areas', shard_file_name(area))
+        _write_json(os.path.join(output_dir, file_name), shard)
+        manifest['areas'][area] = file_name
+
+    # O manifesto é trocado por último: ele só aponta para shards completos
+    _write_json(manifest_path, manifest)
+
+    # Remove as gerações que nem o manifesto novo nem o anterior referenciam
+    # (inclusive os diretórios institutions/ e areas/ do formato sem gerações)
+    keep = {generation} | (_manifest_generations(previous) if previous else set())
+    candidates = [os.path.join('generations', name) for name in os.listdir(os.path.join(output_dir, 'generations'))]
+    candidates += [name for name in ('institutions', 'areas') if os.path.isdir(os.path.join(output_dir, name))]
+    for directory in candidates:
+        if directory not in keep:
+            shutil.rmtree(os.path.join(output_dir, directory), ignore_errors=True)
+    return manifest
+
 
 def save_web_data():
     """
     Salva os dados para uso na aplicação web
     """
-    data = generate_web_data()
-    
-    # Salvar como JSON
-    with open('/home/ubuntu/web_data.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    print("Dados salvos em web_data.json")
-    print(f"Áreas da UNIFOR: {len(data['metadata']['unifor_areas'])}")
-    print(f"Cursos da UNIFOR: {len(data['unifor_courses'])}")
-    
+    excel_path = sys.argv[1] if len(sys.argv) > 1 else '/home/ubuntu/upload/ResumoQuestionário.xlsx'
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web_data')
+
+    analyzer = ENADEAnalyzer(excel_path)
+    manifest = save_sharded_web_data(analyzer, output_dir)
+
+    print(f"Dados salvos em {output_dir}")
+    print(f"Instituições: {len(manifest['institutions'])}")
+    print(f"Áreas: {len(manifest['areas'])}")
+
     # Mostrar exemplo de comparação
+    with open(os.path.join(output_dir, manifest['institutions'][DEFAULT_INSTITUTION]), 'r', encoding='utf-8') as f:
+        unifor = json.load(f)
     print("\n=== EXEMPLO DE COMPARAÇÃO (ADMINISTRAÇÃO) ===")
-    if 'ADMINISTRAÇÃO' in data['comparisons']:
-        admin_comp = data['comparisons']['ADMINISTRAÇÃO']
+    if 'ADMINISTRAÇÃO' in unifor['comparisons']:
+        admin_comp = unifor['comparisons']['ADMINISTRAÇÃO']
         for level, scores in admin_comp.items():
             print(f"{level}:")
             for dim, score in scores.items():
-                print(f"  {dim}: {score:.3f}")
-    
-    return data
+                print(f"  {dim}: {score:.3f}" if score is not None else f"  {dim}: -")
+
+    return manifest
 
 if __name__ == "__main__":
     save_web_data()
-
@@ -0,0 +1,130 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+
+
+class QueueFull(RuntimeError):
+    """Limite de jobs pendentes/em execução atingido; o cliente deve tentar mais tarde"""
+
+
+class JobQueue:
+    """
+    Fila local de análises em segundo plano. Jobs idênticos (mesmo tipo,
+    parâmetros e versão dos dados) ainda pendentes são unificados em um só; no máximo `max_pending`
+    jobs distintos ficam pendentes ou em execução, e apenas os `max_finished`
+    resultados mais recentes são mantidos.
+    """
+
+    def __init__(self, max_workers: int = 2, max_finished: int = 100, max_pending: int = 32):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self.max_pending = max_pending
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}  # chave do job -> id do job pendente/em execução
+        self._finished = OrderedDict()  # ids concluídos, do mais antigo ao mais recente
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Criado sob demanda, já dentro do worker (nunca no master antes do fork)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='enade-job')
+        return self._executor
+
+    @staticmethod
+    def job_key(kind: str, params: Dict, version: str = None) -> tuple:
+        return (kind, tuple(sorted(params.items())), version)
+
+    def submit(self, kind: str, params: Dict, func: Callable, *args, version: str = None) -> Dict:
+        """
+        Enfileira func(*args) e retorna o estado do job; se um job idêntico
+        (inclusive na versão dos dados, `version`) ainda estiver pendente, retorna
+        o job existente. Levanta QueueFull se já houver `max_pending` jobs
+        pendentes ou em execução.
+        """
+        key = self.job_key(kind, params, version)
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None:
+                job = self._jobs[active_id]
+                job['coalesced'] += 1
+                return self._snapshot(job)
+            
+            if len(self._active) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull('Fila de análises cheia; tente novamente em instantes')
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'kind': kind,
+                'params': params,
+                'status': PENDING,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'coalesced': 0,
+                'result': None,
+                'error': None
+            }
+            self._jobs[job['id']] = job
+            self._active[key] = job['id']
+            snapshot = self._snapshot(job)
+
+        self._get_executor().submit(self._run, job, key, func, args)
+        return snapshot
+
+    def _run(self, job: Dict, key: tuple, func: Callable, args: tuple):
+        with self._lock:
+            job['status'] = RUNNING
+            job['started_at'] = time.time()
+
+        try:
+            result = func(*args)
+            status, error = DONE, None
+        except Exception as e:
+            result, status, error = None, ERROR, str(e)
+
+        with self._lock:
+            job['result'] = result
+            job['error'] = error
+            job['status'] = status
+            job['finished_at'] = time.time()
+            self._active.pop(key, None)
+            self._finished[job['id']] = None
+
+            # Descarta os resultados mais antigos além do limite
+            while len(self._finished) > self.max_finished:
+                expired_id, _ = self._finished.popitem(last=False)
+                self._jobs.pop(expired_id, None)
+
+    @staticmethod
+    def _snapshot(job: Dict) -> Dict:
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Retorna o estado atual de um job, ou None se ele não existir (ou já expirou)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'active': len(self._active),
+                'max_pending': self.max_pending,
+                'rejected': self.rejected,
+                'finished': len(self._finished),
+                'max_finished': self.max_finished,
+                'max_workers': self.max_workers
+            }
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from src.models.user import db
+
+class CachedResult(db.Model):
+    """Resultado de uma análise, persistido entre reinicializações"""
+    __tablename__ = 'cached_result'
+    __table_args__ = (
+        db.UniqueConstraint('endpoint', 'params_key', 'dataset_hash', name='uq_cached_result_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    endpoint = db.Column(db.String(80), nullable=False)
+    params_key = db.Column(db.String(64), nullable=False)
+    dataset_hash = db.Column(db.String(64), nullable=False, index=True)
+    params = db.Column(db.Text, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CachedResult {self.endpoint} {self.params}>'
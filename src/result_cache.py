@@ -0,0 +1,233 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from src.models.result_cache import CachedResult
+from src.models.user import db
+from src.serialization import dumps
+
+
+class ResultCache:
+    """
+    Cache dos resultados das análises em dois níveis: um LRU em memória, local a
+    cada worker, e a tabela cached_result do banco do Flask-SQLAlchemy, que
+    sobrevive a reinícios e deploys. As chaves combinam endpoint, parâmetros e o
+    hash do conjunto de dados, e a gravação no banco é feita em segundo plano.
+    No banco ficam no máximo `max_rows` resultados (os mais antigos são
+    descartados), e retain() remove os de versões dos dados que não estão mais em uso.
+    """
+
+    # Gravações entre duas verificações do limite de linhas do banco
+    TRIM_INTERVAL = 64
+
+    def __init__(self, max_entries: int = 256, enabled: bool = True, max_rows: int = 10000):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.enabled = enabled
+        self._writes = 0
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._pending = set()
+        self._counts = {'memory_hits': 0, 'database_hits': 0, 'misses': 0}
+
+    def init_app(self, app):
+        """Usa o banco configurado em `app` (sem app, o cache fica apenas em memória)"""
+        self.app = app
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Criado sob demanda, já dentro do worker (nunca no master antes do fork)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='enade-cache')
+        return self._executor
+
+    @staticmethod
+    def params_key(params: Dict) -> tuple:
+        """Parâmetros normalizados (JSON com chaves ordenadas) e o seu hash"""
+        params_json = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return params_json, hashlib.sha256(params_json.encode('utf-8')).hexdigest()
+
+    def _remember(self, key: tuple, params: Dict, value: Any):
+        with self._lock:
+            self._memory[key] = (params, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _load(self, endpoint: str, params_key: str, dataset_hash: str) -> Optional[Any]:
+        try:
+            with self.app.app_context():
+                row = CachedResult.query.filter_by(
+                    endpoint=endpoint, params_key=params_key, dataset_hash=dataset_hash
+                ).first()
+                return json.loads(row.payload) if row is not None else None
+        except Exception:
+            # O banco é apenas uma otimização: na falha, a análise é recalculada
+            return None
+
+    def _persist(self, key: tuple, params_json: str, value: Any):
+        endpoint, params_key, dataset_hash = key
+        try:
+            with self.app.app_context():
+                try:
+                    db.session.add(CachedResult(
+                        endpoint=endpoint,
+                        params_key=params_key,
+                        dataset_hash=dataset_hash,
+                        params=params_json,
+                        payload=dumps(value)
+                    ))
+                    db.session.commit()
+                except IntegrityError:
+                    # Outro worker já gravou o mesmo resultado
+                    db.session.rollback()
+                except Exception:
+                    db.session.rollback()
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                self._writes += 1
+                trim = self._writes % self.TRIM_INTERVAL == 0
+        if trim:
+            self._trim()
+
+    def _trim(self):
+        """Descarta do banco os resultados mais antigos além de `max_rows`"""
+        try:
+            with self.app.app_context():
+                try:
+                    excess = CachedResult.query.count() - self.max_rows
+                    if excess > 0:
+                        oldest = db.session.query(CachedResult.id).order_by(CachedResult.id).limit(excess)
+                        CachedResult.query.filter(CachedResult.id.in_(oldest.scalar_subquery())).delete(
+                            synchronize_session=False)
+                        db.session.commit()
+                except Exception:
+                    db.session.rollback()
+        except Exception:
+            pass
+
+    def get_or_compute(self, endpoint: str, params: Dict, dataset_hash: str, func: Callable, *args,
+                       persist: bool = True) -> Any:
+        """
+        Retorna o resultado de func(*args) para (endpoint, params, dataset_hash):
+        da memória, do banco ou recalculado (e então gravado em segundo plano).
+        Com persist=False (parâmetros não validados), o banco não é consultado
+        nem alterado, e o resultado fica apenas no LRU em memória.
+        """
+        if not self.enabled:
+            return func(*args)
+
+        params_json, params_key = self.params_key(params)
+        key = (endpoint, params_key, dataset_hash)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counts['memory_hits'] += 1
+                return self._memory[key][1]
+
+        use_database = persist and self.app is not None
+        value = self._load(endpoint, params_key, dataset_hash) if use_database else None
+        if value is not None:
+            outcome = 'database_hits'
+        else:
+            value = func(*args)
+            outcome = 'misses'
+            if use_database:
+                with self._lock:
+                    schedule = key not in self._pending
+                    self._pending.add(key)
+                if schedule:
+                    self._get_executor().submit(self._persist, key, params_json, value)
+
+        self._remember(key, params, value)
+        with self._lock:
+            self._counts[outcome] += 1
+        return value
+
+    def carry_over(self, old_hash: str, new_hash: str, keep: Callable[[str, Dict], bool]):
+        """
+        Após uma atualização incremental dos dados, mantém válidos para `new_hash`
+        os resultados de `old_hash` para os quais keep(endpoint, params) é verdadeiro
+        (os que não dependem das linhas alteradas); os demais são recalculados
+        sob demanda. No banco, as cópias são gravadas em segundo plano.
+        """
+        with self._lock:
+            for (endpoint, params_key, dataset_hash), (params, value) in list(self._memory.items()):
+                if dataset_hash == old_hash and keep(endpoint, params):
+                    self._memory[(endpoint, params_key, new_hash)] = (params, value)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+        if self.app is not None:
+            self._get_executor().submit(self._copy_rows, old_hash, new_hash, keep)
+
+    def _copy_rows(self, old_hash: str, new_hash: str, keep: Callable[[str, Dict], bool]):
+        try:
+            with self.app.app_context():
+                try:
+                    for row in CachedResult.query.filter_by(dataset_hash=old_hash).all():
+                        if keep(row.endpoint, json.loads(row.params)):
+                            db.session.add(CachedResult(
+                                endpoint=row.endpoint,
+                                params_key=row.params_key,
+                                dataset_hash=new_hash,
+                                params=row.params,
+                                payload=row.payload
+                            ))
+                    db.session.commit()
+                except Exception:
+                    # Sem as cópias, os resultados apenas voltam a ser calculados
+                    db.session.rollback()
+        except Exception:
+            pass
+
+    def retain(self, dataset_hashes):
+        """
+        Mantém apenas os resultados das versões dos dados em `dataset_hashes`
+        (ex.: a atual e a anterior, cujas linhas ainda podem ser copiadas por
+        carry_over); os demais saem da memória e, em segundo plano, do banco
+        """
+        if not self.enabled:
+            return
+        dataset_hashes = set(dataset_hashes)
+        with self._lock:
+            for key in [key for key in self._memory if key[2] not in dataset_hashes]:
+                del self._memory[key]
+
+        if self.app is not None:
+            self._get_executor().submit(self._delete_stale, dataset_hashes)
+
+    def _delete_stale(self, dataset_hashes):
+        try:
+            with self.app.app_context():
+                try:
+                    CachedResult.query.filter(CachedResult.dataset_hash.notin_(dataset_hashes)).delete(
+                        synchronize_session=False)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+        except Exception:
+            pass
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'memory_entries': len(self._memory),
+                'max_entries': self.max_entries,
+                'max_rows': self.max_rows,
+                'pending_writes': len(self._pending),
+                **self._counts
+            }
@@ -1,163 +1,559 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, g, has_request_context, request, url_for
+import hmac
 import json
 import os
-from src.enade_analyzer import ENADEAnalyzer
+import threading
+import time
+from contextlib import nullcontext
+import numpy as np
+from src.enade_analyzer import ENADEAnalyzer, SCORE_RANGE
+from src.jobs import JobQueue, QueueFull
+from src.result_cache import ResultCache
+from src.serialization import json_response
+from src.shared_data import exclusive_lock, shared_generation
+from src.static_assets import CompressedPayloads
+from src.student_sketches import StudentSketches
+from src.web_data_store import WebDataStore
 
 enade_bp = Blueprint('enade', __name__)
 
-# Carregar dados pré-processados
-def load_web_data():
-    data_path = os.path.join(os.path.dirname(__file__), '..', 'web_data.json')
-    with open(data_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+# Dados pré-processados: shards por instituição/área (src/web_data/) ou o
+# web_data.json legado, lidos sob demanda
+web_data = WebDataStore(
+    shards_dir=os.path.join(os.path.dirname(__file__), '..', 'web_data'),
+    legacy_path=os.path.join(os.path.dirname(__file__), '..', 'web_data.json'),
+    cache_size=int(os.environ.get('ENADE_WEB_DATA_CACHE', 64))
+)
+
+# Payloads grandes (/unifor-courses, /dashboard-data) serializados e comprimidos uma vez
+compressed_payloads = CompressedPayloads(max_entries=int(os.environ.get('ENADE_WEB_DATA_CACHE', 64)))
+
+def get_requested_institution():
+    """Shard da instituição pedida em ?institution= (padrão: UNIFOR), ou None"""
+    return web_data.institution(request.args.get('institution'))
+
+EXCEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'ResumoQuestionário.xlsx')
+
+# Snapshot imutável do analisador (um por processo, preservando as ordenações
+# pré-computadas), lido sem locks pelas threads do worker e trocado por inteiro
+# nas recargas e atualizações
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+def load_analyzer(indicators=None):
+    """
+    Carrega um novo snapshot a partir da fonte de dados configurada, com os
+    indicadores de ENADE_INDICATORS_PATH e os de `indicators` ainda não definidos lá
+    """
+    # ENADE_SHARED_PATH aponta para os dados exportados pelo master do gunicorn
+    # (gunicorn.conf.py); ENADE_SQLITE_PATH para um banco gerado por export_sqlite
+    shared_path = os.environ.get('ENADE_SHARED_PATH')
+    sqlite_path = os.environ.get('ENADE_SQLITE_PATH')
+    if shared_path:
+        analyzer = ENADEAnalyzer.from_shared(shared_path)
+    elif sqlite_path:
+        analyzer = ENADEAnalyzer.from_sqlite(sqlite_path)
+    else:
+        analyzer = ENADEAnalyzer(EXCEL_PATH)
+    
+    # Distribuições por estudante geradas por src/student_sketches.py (opcional)
+    sketches_path = os.environ.get('ENADE_SKETCHES_PATH')
+    if sketches_path:
+        analyzer.attach_student_sketches(StudentSketches.load(sketches_path))
+    
+    # Indicadores personalizados: {"nome": {"weights": {"Q27": 2, ...}, "description": "..."}}
+    definitions = {}
+    indicators_path = os.environ.get('ENADE_INDICATORS_PATH')
+    if indicators_path:
+        with open(indicators_path, encoding='utf-8') as f:
+            definitions = json.load(f)
+    for name, definition in (indicators or {}).items():
+        definitions.setdefault(name, definition)
+    # Os dados compartilhados já trazem os indicadores publicados pela API, que
+    # prevalecem sobre os de ENADE_INDICATORS_PATH
+    definitions = {name: definition for name, definition in definitions.items()
+                   if name not in analyzer.indicators}
+    if definitions:
+        analyzer.register_indicators(definitions)
+    return analyzer.freeze()
+
+def swap_analyzer(analyzer):
+    """
+    Publica um novo snapshot; as requisições em andamento terminam com o anterior.
+    Os resultados em cache de outras versões dos dados são descartados (os do
+    snapshot anterior ficam até a próxima troca, para carry_over)
+    """
+    global _analyzer
+    previous = _analyzer
+    _analyzer = analyzer.freeze()
+    result_cache.retain({_analyzer.results_hash()} | ({previous.results_hash()} if previous is not None else set()))
+
+def shared_lock(shared_path):
+    """Lock entre os workers para publicar novos dados compartilhados (nenhum sem ENADE_SHARED_PATH)"""
+    return exclusive_lock(shared_path) if shared_path else nullcontext()
+
+def reattach_shared(shared_path):
+    """
+    Troca o snapshot pela versão publicada em `shared_path` (pelo master ou por
+    qualquer worker), com os indicadores publicados junto com ela e as
+    distribuições por estudante deste worker. Chamada com _analyzer_lock.
+    """
+    analyzer = ENADEAnalyzer.from_shared(shared_path)
+    if _analyzer is not None and _analyzer.sketches is not None:
+        analyzer.attach_student_sketches(_analyzer.sketches)
+    swap_analyzer(analyzer)
+
+def publish_analyzer(analyzer, shared_path):
+    """
+    Publica um novo snapshot. Em modo compartilhado, ele é reexportado (dados e
+    indicadores) e reanexado, e os demais workers passam a usá-lo. Chamada com
+    _analyzer_lock e shared_lock.
+    """
+    if shared_path:
+        analyzer.export_shared(shared_path)
+        reattach_shared(shared_path)
+    else:
+        swap_analyzer(analyzer)
+    return _analyzer
+
+def resync_shared(shared_path):
+    """Com _analyzer_lock: reanexa os dados compartilhados se outro worker os republicou"""
+    generation = shared_generation(shared_path)
+    if generation is not None and generation != _analyzer.shared_generation:
+        reattach_shared(shared_path)
+
+# Em modo compartilhado, cada worker verifica no máximo a cada segundo se outro
+# publicou novos dados (atualizações e recargas)
+SHARED_CHECK_INTERVAL = 1.0
+_shared_checked_at = 0.0
+
+def sync_shared_analyzer():
+    """
+    Reanexa os dados compartilhados se eles foram republicados. Não espera por
+    uma troca em andamento neste worker; se a nova versão ainda não puder ser
+    lida, o snapshot atual é mantido até a próxima verificação.
+    """
+    global _shared_checked_at
+    shared_path = os.environ.get('ENADE_SHARED_PATH')
+    now = time.monotonic()
+    if not shared_path or now - _shared_checked_at < SHARED_CHECK_INTERVAL:
+        return
+    _shared_checked_at = now
+    if shared_generation(shared_path) in (None, _analyzer.shared_generation):
+        return
+    if not _analyzer_lock.acquire(blocking=False):
+        return
+    try:
+        resync_shared(shared_path)
+    except (OSError, ValueError):
+        pass
+    finally:
+        _analyzer_lock.release()
+
+def reload_analyzer():
+    """
+    Recarrega os dados e troca o snapshot (as leituras continuam no atual enquanto
+    isso), mantendo os indicadores registrados pela API. Em modo compartilhado, a
+    planilha é relida e reexportada, e os demais workers passam a usá-la.
+    """
+    shared_path = os.environ.get('ENADE_SHARED_PATH')
+    with _analyzer_lock:
+        if shared_path:
+            with shared_lock(shared_path):
+                if os.path.exists(EXCEL_PATH):
+                    analyzer = ENADEAnalyzer(EXCEL_PATH)
+                    if _analyzer is not None and _analyzer.indicators:
+                        analyzer.register_indicators(_analyzer.indicators)
+                    analyzer.export_shared(shared_path)
+                reattach_shared(shared_path)
+        else:
+            swap_analyzer(load_analyzer(_analyzer.indicators if _analyzer is not None else None))
+    return _analyzer
+
+def single_worker_required():
+    """
+    Resposta 409 se houver vários workers sem dados compartilhados: a troca dos
+    dados ou dos indicadores valeria só para o worker que atendeu a requisição (ENADE_WORKERS é
+    definido pelo gunicorn.conf.py)
+    """
+    if os.environ.get('ENADE_SHARED_PATH') or int(os.environ.get('ENADE_WORKERS', 1)) <= 1:
+        return None
+    return json_response({
+        'error': 'Atualizações exigem ENADE_SHARED_PATH com vários workers (os demais não as veriam)'
+    }), 409
 
-# Inicializar analisador
 def get_analyzer():
-    excel_path = os.path.join(os.path.dirname(__file__), '..', 'ResumoQuestionário.xlsx')
-    return ENADEAnalyzer(excel_path)
+    """
+    Snapshot atual do analisador; dentro de uma requisição, sempre o mesmo até o
+    fim dela, mesmo que outro seja publicado nesse meio tempo
+    """
+    if has_request_context() and 'enade_analyzer' in g:
+        return g.enade_analyzer
+    
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                swap_analyzer(load_analyzer())
+    else:
+        sync_shared_analyzer()
+    analyzer = _analyzer
+    
+    if has_request_context():
+        g.enade_analyzer = analyzer
+    return analyzer
+
+# Fila de análises em segundo plano (modo assíncrono, ?async=1), local a cada worker
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('ENADE_JOB_WORKERS', 2)),
+    max_finished=int(os.environ.get('ENADE_JOB_RESULTS', 100)),
+    max_pending=int(os.environ.get('ENADE_JOB_PENDING', 32))
+)
+
+# Resultados das análises em cache (memória e banco do Flask-SQLAlchemy, ver src/main.py)
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('ENADE_RESULT_CACHE_SIZE', 256)),
+    enabled=os.environ.get('ENADE_RESULT_CACHE', '1').lower() not in ('0', 'false', 'nao'),
+    max_rows=int(os.environ.get('ENADE_RESULT_CACHE_ROWS', 10000))
+)
+
+def persistable(analyzer, params):
+    """
+    Se o resultado pode ser gravado no banco: áreas, questões, métricas e
+    instituições existem nos dados e não há faixas livres (edges); os demais
+    ficam apenas no LRU em memória
+    """
+    for name, value in params.items():
+        if value is None:
+            continue
+        if name == 'area' and not analyzer.has_area(value):
+            return False
+        if name == 'question' and value not in analyzer.all_questions:
+            return False
+        if name == 'metrics' and not set(value) <= set(analyzer.all_questions + ['NOC', 'NFC', 'NAC', 'GERAL']):
+            return False
+        if name == 'institution' and value != 'UNIVERSIDADE DE FORTALEZA' and not analyzer.has_institution(value):
+            return False
+        if name == 'institutions' and not all(analyzer.has_institution(i) for i in value):
+            return False
+        if name == 'edges':
+            return False
+    return True
+
+def cached_result(endpoint, params, func, *args):
+    """
+    Resultado de func(*args), reaproveitado do cache enquanto os dados e os
+    indicadores registrados forem os mesmos
+    """
+    return snapshot_result(get_analyzer(), endpoint, params, func, *args)
+
+def snapshot_result(analyzer, endpoint, params, func, *args):
+    """
+    cached_result com o snapshot explícito: nos jobs, que rodam fora da requisição,
+    o resultado fica associado ao snapshot usado para calculá-lo, mesmo que outro
+    tenha sido publicado desde o envio
+    """
+    return result_cache.get_or_compute(endpoint, params, analyzer.results_hash(), func, *args,
+                                       persist=persistable(analyzer, params))
+
+# Resultados que dependem apenas dos cursos da área pedida em params['area'] e que,
+# portanto, continuam válidos após atualizações que não tocam essa área
+AREA_SCOPED_ENDPOINTS = {
+    'unifor-analysis', 'improvement-priorities', 'similar-institutions',
+    'institutional-comparison', 'question-analysis', 'histograms', 'outliers'
+}
+
+def is_async_request():
+    return request.args.get('async', '').lower() in ('1', 'true', 'sim')
+
+def job_payload(job):
+    """Resumo de um job para o cliente (o resultado só é incluído quando concluído)"""
+    payload = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'params': job['params'],
+        'status': job['status'],
+        'submitted_at': job['submitted_at'],
+        'finished_at': job['finished_at'],
+        'status_url': f"{request.script_root}/api/enade/jobs/{job['id']}"
+    }
+    if job['status'] == 'done':
+        payload['result'] = job['result']
+    elif job['status'] == 'error':
+        payload['error'] = job['error']
+    return payload
+
+def submit_job(kind, params, func, *args):
+    """
+    Enfileira uma análise e responde 202 com o id do job, ou 503 com Retry-After
+    se a fila deste worker estiver cheia. O job usa o snapshot da requisição, o
+    mesmo a que func e args se referem.
+    """
+    analyzer = get_analyzer()
+    try:
+        job = job_queue.submit(kind, params, snapshot_result, analyzer, kind, params, func, *args,
+                               version=analyzer.results_hash())
+    except QueueFull as e:
+        response = json_response({'error': str(e)}, 503)
+        response.headers['Retry-After'] = '5'
+        return response
+    return json_response(job_payload(job), 202)
+
+def build_question_analysis(analyzer, question, area):
+    return {
+        'question_stats': analyzer.get_question_comparison(question, area),
+        'top_institutions': analyzer.get_top_institutions_by_question(question, area, 10)
+    }
+
+def build_comprehensive_analysis(analyzer, area):
+    # Análise das questões da UNIFOR
+    unifor_analysis = analyzer.analyze_unifor_questions(area)
+    
+    # Prioridades de melhoria
+    priorities = analyzer.identify_improvement_priorities(area)
+    
+    # Instituições similares
+    similar_institutions = analyzer.get_similar_institutions(area, 5)
+    
+    # Comparação institucional
+    institutional_comparison = analyzer.compare_with_specific_institutions(similar_institutions, area)
+    
+    return {
+        'unifor_analysis': unifor_analysis,
+        'improvement_priorities': priorities,
+        'similar_institutions': similar_institutions,
+        'institutional_comparison': institutional_comparison,
+        'metadata': {
+            'area': area,
+            'analysis_type': 'comprehensive'
+        }
+    }
 
 @enade_bp.route('/metadata')
 def get_metadata():
     """Retorna metadados da análise"""
     try:
-        data = load_web_data()
-        return jsonify(data['metadata'])
+        institution = get_requested_institution()
+        if institution is None:
+            return json_response({'error': 'Instituição não encontrada'}), 404
+        
+        metadata = web_data.metadata(institution)
+        metadata['payload_urls'] = payload_urls(institution['institution'])
+        return json_response(metadata)
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/institutions')
+def get_institutions():
+    """Retorna as instituições com dados pré-processados"""
+    try:
+        return json_response({
+            'default_institution': web_data.default_institution(),
+            'institutions': web_data.institutions()
+        })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/comparisons')
 def get_comparisons():
     """Retorna comparações por área"""
     try:
-        data = load_web_data()
+        institution = get_requested_institution()
+        if institution is None:
+            return json_response({'error': 'Instituição não encontrada'}), 404
+        
         area = request.args.get('area', 'geral')
         
-        if area in data['comparisons']:
-            return jsonify(data['comparisons'][area])
+        if area in institution['comparisons']:
+            return json_response(institution['comparisons'][area])
         else:
-            return jsonify({'error': 'Área não encontrada'}), 404
+            return json_response({'error': 'Área não encontrada'}), 404
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/unifor-courses')
 def get_unifor_courses():
-    """Retorna dados dos cursos da UNIFOR"""
+    """Retorna dados dos cursos da UNIFOR (ou da instituição em ?institution=)"""
     try:
-        data = load_web_data()
-        return jsonify(data['unifor_courses'])
+        version = web_data.version()
+        institution = get_requested_institution()
+        if institution is None:
+            return json_response({'error': 'Instituição não encontrada'}), 404
+        
+        return compressed_payloads.response(('unifor-courses', institution['institution'], version),
+                                            lambda: institution['courses'], version=version)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/extremes')
 def get_extremes():
     """Retorna análise de extremos por área"""
     try:
-        data = load_web_data()
         area = request.args.get('area')
         
         if not area:
-            return jsonify({'error': 'Parâmetro area é obrigatório'}), 400
+            return json_response({'error': 'Parâmetro area é obrigatório'}), 400
         
-        if area in data['detailed_analysis']:
-            return jsonify(data['detailed_analysis'][area]['extremes'])
+        extremes = web_data.extremes(area)
+        if extremes is not None:
+            return json_response(extremes)
         else:
-            return jsonify({'error': 'Área não encontrada'}), 404
+            return json_response({'error': 'Área não encontrada'}), 404
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/course-detail')
 def get_course_detail():
     """Retorna detalhes de um curso específico"""
     try:
-        data = load_web_data()
+        institution = get_requested_institution()
+        if institution is None:
+            return json_response({'error': 'Instituição não encontrada'}), 404
+        
         area = request.args.get('area')
         
         if not area:
-            return jsonify({'error': 'Parâmetro area é obrigatório'}), 400
+            return json_response({'error': 'Parâmetro area é obrigatório'}), 400
         
-        # Encontrar curso da UNIFOR na área especificada
-        unifor_course = None
-        for course in data['unifor_courses']:
-            if course['area'] == area:
-                unifor_course = course
+        # Encontrar curso da instituição na área especificada
+        course = None
+        for candidate in institution['courses']:
+            if candidate['area'] == area:
+                course = candidate
                 break
         
-        if not unifor_course:
-            return jsonify({'error': 'Curso da UNIFOR não encontrado nesta área'}), 404
+        if not course:
+            return json_response({'error': 'Curso da instituição não encontrado nesta área'}), 404
         
         # Adicionar dados de extremos
         result = {
-            'course': unifor_course,
-            'extremes': data['detailed_analysis'][area]['extremes'] if area in data['detailed_analysis'] else {},
-            'comparison': data['comparisons'][area] if area in data['comparisons'] else {}
+            'course': course,
+            'extremes': web_data.extremes(area) or {},
+            'comparison': institution['comparisons'].get(area, {})
         }
         
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/areas')
 def get_areas():
     """Retorna lista de áreas disponíveis"""
     try:
-        data = load_web_data()
-        return jsonify({
-            'all_areas': data['metadata']['course_areas'],
-            'unifor_areas': data['metadata']['unifor_areas']
+        institution = get_requested_institution()
+        if institution is None:
+            return json_response({'error': 'Instituição não encontrada'}), 404
+        
+        metadata = web_data.metadata(institution)
+        return json_response({
+            'all_areas': metadata['course_areas'],
+            'unifor_areas': metadata['unifor_areas']
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
+
+def build_dashboard_data(institution):
+    """Dados consolidados do dashboard a partir do shard de uma instituição"""
+    metadata = web_data.metadata(institution)
+    
+    # Preparar dados para gráficos
+    dashboard_data = {
+        'summary': {
+            'total_courses': metadata['total_courses'],
+            'unifor_courses': metadata['unifor_courses'],
+            'unifor_areas': len(metadata['unifor_areas'])
+        },
+        'comparison_chart': institution['comparisons']['geral'],
+        'unifor_performance': [],
+        'dimension_analysis': {
+            'NOC': {'name': 'Organização Didático-Pedagógica', 'courses': []},
+            'NFC': {'name': 'Infraestrutura e Instalações Físicas', 'courses': []},
+            'NAC': {'name': 'Oportunidades de Ampliação da Formação', 'courses': []}
+        }
+    }
+    
+    # Dados de performance da instituição por curso
+    for course in institution['courses']:
+        course_perf = {
+            'area': course['area'],
+            'media_geral': course['media_geral'],
+            'noc': course['scores']['NOC'],
+            'nfc': course['scores']['NFC'],
+            'nac': course['scores']['NAC']
+        }
+        dashboard_data['unifor_performance'].append(course_perf)
+        
+        # Adicionar aos dados de dimensão
+        dashboard_data['dimension_analysis']['NOC']['courses'].append({
+            'area': course['area'],
+            'score': course['scores']['NOC']
+        })
+        dashboard_data['dimension_analysis']['NFC']['courses'].append({
+            'area': course['area'],
+            'score': course['scores']['NFC']
+        })
+        dashboard_data['dimension_analysis']['NAC']['courses'].append({
+            'area': course['area'],
+            'score': course['scores']['NAC']
+        })
+    
+    return dashboard_data
 
 @enade_bp.route('/dashboard-data')
 def get_dashboard_data():
     """Retorna dados consolidados para o dashboard"""
     try:
-        data = load_web_data()
-        
-        # Preparar dados para gráficos
-        dashboard_data = {
-            'summary': {
-                'total_courses': data['metadata']['total_courses'],
-                'unifor_courses': data['metadata']['unifor_courses'],
-                'unifor_areas': len(data['metadata']['unifor_areas'])
-            },
-            'comparison_chart': data['comparisons']['geral'],
-            'unifor_performance': [],
-            'dimension_analysis': {
-                'NOC': {'name': 'Organização Didático-Pedagógica', 'courses': []},
-                'NFC': {'name': 'Infraestrutura e Instalações Físicas', 'courses': []},
-                'NAC': {'name': 'Oportunidades de Ampliação da Formação', 'courses': []}
-            }
-        }
+        version = web_data.version()
+        institution = get_requested_institution()
+        if institution is None:
+            return json_response({'error': 'Instituição não encontrada'}), 404
         
-        # Dados de performance da UNIFOR por curso
-        for course in data['unifor_courses']:
-            course_perf = {
-                'area': course['area'],
-                'media_geral': course['media_geral'],
-                'noc': course['scores']['NOC'],
-                'nfc': course['scores']['NFC'],
-                'nac': course['scores']['NAC']
-            }
-            dashboard_data['unifor_performance'].append(course_perf)
-            
-            # Adicionar aos dados de dimensão
-            dashboard_data['dimension_analysis']['NOC']['courses'].append({
-                'area': course['area'],
-                'score': course['scores']['NOC']
-            })
-            dashboard_data['dimension_analysis']['NFC']['courses'].append({
-                'area': course['area'],
-                'score': course['scores']['NFC']
-            })
-            dashboard_data['dimension_analysis']['NAC']['courses'].append({
-                'area': course['area'],
-                'score': course['scores']['NAC']
-            })
-        
-        return jsonify(dashboard_data)
+        return compressed_payloads.response(('dashboard-data', institution['institution'], version),
+                                            build_dashboard_data, institution, version=version)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
+
+def payload_urls(institution_name):
+    """
+    URLs versionadas dos payloads comprimidos: o parâmetro v muda quando os dados
+    pré-processados são regerados, então o cliente pode guardá-las como imutáveis
+    """
+    version = web_data.version()
+    return {
+        'unifor-courses': url_for('enade.get_unifor_courses', institution=institution_name, v=version),
+        'dashboard-data': url_for('enade.get_dashboard_data', institution=institution_name, v=version)
+    }
+
+def fast_request_resident(endpoint, args):
+    """
+    Se uma requisição às rotas de dados pré-processados pode ser respondida apenas
+    com o que já está em memória, sem ler shards do disco nem comprimir payloads.
+    O servidor ASGI atende as demais fora do event loop.
+    """
+    if endpoint in ('cache-stats', 'jobs'):
+        return True
+    
+    institution = args.get('institution')
+    if endpoint in ('extremes', 'course-detail') and args.get('area'):
+        return web_data.resident(institution, args['area'], with_institution=endpoint == 'course-detail')
+    if not web_data.resident(institution):
+        return False
+    if endpoint in ('unifor-courses', 'dashboard-data'):
+        name = institution or web_data.default_institution()
+        return name not in web_data.institutions() or (endpoint, name, web_data.version()) in compressed_payloads
+    return True
+
+def warm_web_data():
+    """
+    Carrega o manifesto, o shard da instituição padrão e os payloads comprimidos
+    dela, para que as primeiras requisições não leiam o disco nem comprimam
+    """
+    version = web_data.version()
+    institution = web_data.institution()
+    if institution is not None:
+        compressed_payloads.get_or_build(('unifor-courses', institution['institution'], version),
+                                         lambda: institution['courses'])
+        compressed_payloads.get_or_build(('dashboard-data', institution['institution'], version),
+                                         build_dashboard_data, institution)
 
 
 @enade_bp.route('/unifor-analysis')
@@ -167,10 +563,10 @@ def get_unifor_analysis():
         analyzer = get_analyzer()
         area = request.args.get('area')
         
-        analysis = analyzer.analyze_unifor_questions(area)
-        return jsonify(analysis)
+        analysis = cached_result('unifor-analysis', {'area': area}, analyzer.analyze_unifor_questions, area)
+        return json_response(analysis)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/improvement-priorities')
 def get_improvement_priorities():
@@ -179,10 +575,39 @@ def get_improvement_priorities():
         analyzer = get_analyzer()
         area = request.args.get('area')
         
-        priorities = analyzer.identify_improvement_priorities(area)
-        return jsonify(priorities)
+        if is_async_request():
+            return submit_job('improvement-priorities', {'area': area},
+                              analyzer.identify_improvement_priorities, area)
+        
+        priorities = cached_result('improvement-priorities', {'area': area},
+                                   analyzer.identify_improvement_priorities, area)
+        return json_response(priorities)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/improvement-priorities/all')
+def get_all_improvement_priorities():
+    """Retorna as prioridades de melhoria de todas as áreas da instituição, por área"""
+    try:
+        analyzer = get_analyzer()
+        institution = request.args.get('institution') or 'UNIVERSIDADE DE FORTALEZA'
+        
+        if institution != 'UNIVERSIDADE DE FORTALEZA' and not analyzer.has_institution(institution):
+            return json_response({'error': 'Instituição não encontrada'}), 404
+        
+        if is_async_request():
+            return submit_job('improvement-priorities-all', {'institution': institution},
+                              analyzer.identify_improvement_priorities_by_area, institution)
+        
+        priorities = cached_result('improvement-priorities-all', {'institution': institution},
+                                   analyzer.identify_improvement_priorities_by_area, institution)
+        return json_response({'institution': institution, 'areas': priorities})
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except NotImplementedError as e:
+        return json_response({'error': str(e)}), 501
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/similar-institutions')
 def get_similar_institutions():
@@ -192,10 +617,11 @@ def get_similar_institutions():
         area = request.args.get('area')
         limit = int(request.args.get('limit', 10))
         
-        institutions = analyzer.get_similar_institutions(area, limit)
-        return jsonify({'institutions': institutions})
+        institutions = cached_result('similar-institutions', {'area': area, 'limit': limit},
+                                     analyzer.get_similar_institutions, area, limit)
+        return json_response({'institutions': institutions})
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/institutional-comparison')
 def get_institutional_comparison():
@@ -209,12 +635,14 @@ def get_institutional_comparison():
             institutions = institutions_param.split(',')
         else:
             # Usar instituições similares por padrão
-            institutions = analyzer.get_similar_institutions(area, 5)
+            institutions = cached_result('similar-institutions', {'area': area, 'limit': 5},
+                                         analyzer.get_similar_institutions, area, 5)
         
-        comparison = analyzer.compare_with_specific_institutions(institutions, area)
-        return jsonify(comparison)
+        comparison = cached_result('institutional-comparison', {'area': area, 'institutions': institutions},
+                                   analyzer.compare_with_specific_institutions, institutions, area)
+        return json_response(comparison)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/question-analysis')
 def get_question_analysis():
@@ -225,17 +653,174 @@ def get_question_analysis():
         area = request.args.get('area')
         
         if not question:
-            return jsonify({'error': 'Parâmetro question é obrigatório'}), 400
+            return json_response({'error': 'Parâmetro question é obrigatório'}), 400
         
-        analysis = analyzer.get_question_comparison(question, area)
-        top_institutions = analyzer.get_top_institutions_by_question(question, area, 10)
+        if question not in analyzer.all_questions:
+            return json_response({'error': 'Questão não encontrada'}), 404
         
-        return jsonify({
-            'question_stats': analysis,
-            'top_institutions': top_institutions
-        })
+        return json_response(cached_result('question-analysis', {'question': question, 'area': area},
+                                           build_question_analysis, analyzer, question, area))
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/student-distribution')
+def get_student_distribution():
+    """Distribuição das respostas dos estudantes a uma questão (microdados)"""
+    try:
+        analyzer = get_analyzer()
+        question = request.args.get('question')
+        score = request.args.get('score')
+        
+        if not question:
+            return json_response({'error': 'Parâmetro question é obrigatório'}), 400
+        
+        if analyzer.sketches is None:
+            return json_response({'error': 'Distribuições por estudante não carregadas'}), 404
+        
+        distribution = analyzer.get_student_distribution(
+            question,
+            request.args.get('area'),
+            uf=request.args.get('uf'),
+            region=request.args.get('region'),
+            institution=request.args.get('institution'),
+            score=float(score) if score is not None else None
+        )
+        return json_response(distribution)
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/histograms')
+def get_histograms():
+    """
+    Histogramas dos scores por questão e dimensão em uma área, com a faixa da
+    instituição (ex.: metrics=Q27,NOC; edges=1,2,3,4,5,6 ou bins=10)
+    """
+    try:
+        analyzer = get_analyzer()
+        area = request.args.get('area')
+        institution = request.args.get('institution', 'UNIVERSIDADE DE FORTALEZA')
+        metrics = request.args.get('metrics')
+        metrics = [m.strip() for m in metrics.split(',') if m.strip()] if metrics else None
+        
+        edges = request.args.get('edges')
+        bins = request.args.get('bins')
+        if edges:
+            edges = [float(edge) for edge in edges.split(',')]
+        elif bins:
+            bins = int(bins)
+            if not 1 <= bins <= 200:
+                raise ValueError('bins deve estar entre 1 e 200')
+            edges = np.linspace(SCORE_RANGE[0], SCORE_RANGE[1], bins + 1).tolist()
+        else:
+            edges = None
+        
+        params = {'area': area, 'institution': institution, 'metrics': metrics, 'edges': edges}
+        return json_response(cached_result('histograms', params, analyzer.get_histograms,
+                                           area, institution, metrics, edges))
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    except NotImplementedError as e:
+        return json_response({'error': str(e)}), 501
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/outliers')
+def get_outliers():
+    """
+    Cursos anômalos pelos z-scores robustos (mediana/MAD) da sua área, filtráveis
+    por institution, area e uf (all=1 inclui os cursos sem anomalias)
+    """
+    try:
+        analyzer = get_analyzer()
+        params = {
+            'institution': request.args.get('institution'),
+            'area': request.args.get('area'),
+            'uf': request.args.get('uf'),
+            'threshold': float(request.args.get('threshold', 3.5)),
+            'only_outliers': request.args.get('all', '0').lower() not in ('1', 'true', 'sim'),
+            'limit': min(int(request.args.get('limit', 100)), 1000)
+        }
+        return json_response(cached_result('outliers', params, analyzer.get_outliers,
+                                           params['institution'], params['area'], params['uf'],
+                                           params['threshold'], params['only_outliers'], params['limit']))
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    except NotImplementedError as e:
+        return json_response({'error': str(e)}), 501
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/question-correlations')
+def get_question_correlations():
+    """
+    Questões mais correlacionadas com `question` entre os cursos de uma área (ou do
+    Brasil), a partir das matrizes pré-computadas na carga
+    """
+    try:
+        analyzer = get_analyzer()
+        question = request.args.get('question')
+        
+        if not question:
+            return json_response({'error': 'Parâmetro question é obrigatório'}), 400
+        
+        limit = min(int(request.args.get('limit', 5)), len(analyzer.all_questions) - 1)
+        return json_response(analyzer.get_correlated_questions(question, request.args.get('area'), limit))
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    except NotImplementedError as e:
+        return json_response({'error': str(e)}), 501
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+def parse_deltas(value):
+    """Converte 'Q58:0.3,Q27:-0.1' em {'Q58': 0.3, 'Q27': -0.1}"""
+    deltas = {}
+    for item in filter(None, (value or '').split(',')):
+        question, _, delta = item.partition(':')
+        deltas[question.strip()] = float(delta)
+    return deltas
+
+@enade_bp.route('/simulation', methods=['GET', 'POST'])
+def get_simulation():
+    """Simula alterações nas questões dos cursos de uma instituição (ex.: deltas=Q58:0.3)"""
+    try:
+        analyzer = get_analyzer()
+        if request.method == 'POST':
+            params = request.get_json(silent=True) or {}
+            deltas = {question: float(delta) for question, delta in (params.get('deltas') or {}).items()}
+        else:
+            params = request.args
+            deltas = parse_deltas(params.get('deltas'))
+        
+        if not deltas:
+            return json_response({'error': 'Parâmetro deltas é obrigatório'}), 400
+        
+        simulation = analyzer.simulate_improvements(
+            deltas,
+            params.get('area'),
+            params.get('institution') or 'UNIVERSIDADE DE FORTALEZA'
+        )
+        return json_response(simulation)
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except (TypeError, ValueError) as e:
+        return json_response({'error': str(e)}), 400
+    except NotImplementedError as e:
+        return json_response({'error': str(e)}), 501
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
 
 @enade_bp.route('/comprehensive-analysis')
 def get_comprehensive_analysis():
@@ -244,28 +829,217 @@ def get_comprehensive_analysis():
         analyzer = get_analyzer()
         area = request.args.get('area')
         
-        # Análise das questões da UNIFOR
-        unifor_analysis = analyzer.analyze_unifor_questions(area)
+        if is_async_request():
+            return submit_job('comprehensive-analysis', {'area': area},
+                              build_comprehensive_analysis, analyzer, area)
+        
+        return json_response(cached_result('comprehensive-analysis', {'area': area},
+                                           build_comprehensive_analysis, analyzer, area))
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+
+@enade_bp.route('/leaderboard')
+def get_leaderboard():
+    """Retorna uma página do ranking completo de uma questão, dimensão ou indicador"""
+    try:
+        analyzer = get_analyzer()
+        metric = request.args.get('metric')
+        area = request.args.get('area')
+        limit = int(request.args.get('limit', 20))
+        
+        if not metric:
+            return json_response({'error': 'Parâmetro metric é obrigatório'}), 400
+        
+        if metric not in analyzer.get_leaderboard_metrics():
+            return json_response({'error': 'Métrica não encontrada'}), 404
         
-        # Prioridades de melhoria
-        priorities = analyzer.identify_improvement_priorities(area)
+        page = analyzer.get_leaderboard_page(
+            metric,
+            area,
+            limit,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            institution=request.args.get('institution')
+        )
+        return json_response(page)
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    except NotImplementedError as e:
+        return json_response({'error': str(e)}), 501
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+def check_update_token():
+    """Resposta 403 se as rotas de atualização estiverem desabilitadas ou o token não conferir"""
+    token = os.environ.get('ENADE_UPDATE_TOKEN')
+    if not token:
+        return json_response({'error': 'Atualizações desabilitadas (ENADE_UPDATE_TOKEN não definido)'}), 403
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return json_response({'error': 'Token de atualização inválido'}), 403
+    return None
+
+@enade_bp.route('/dataset/updates', methods=['POST'])
+def post_dataset_updates():
+    """
+    Aplica inserções, alterações e exclusões de cursos sem recarregar a planilha.
+    Corpo: {"insert": [{...}], "update": [{"CO_CURSO": ..., ...}], "delete": [CO_CURSO, ...]}.
+    Requer ENADE_UPDATE_TOKEN (Authorization: Bearer <token>). O resultado é um
+    novo snapshot, publicado quando estiver pronto; em modo compartilhado ele é
+    reexportado e os demais workers passam a usá-lo.
+    """
+    try:
+        denied = check_update_token() or single_worker_required()
+        if denied is not None:
+            return denied
         
-        # Instituições similares
-        similar_institutions = analyzer.get_similar_institutions(area, 5)
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return json_response({'error': 'Corpo JSON inválido'}), 400
         
-        # Comparação institucional
-        institutional_comparison = analyzer.compare_with_specific_institutions(similar_institutions, area)
+        get_analyzer()
+        shared_path = os.environ.get('ENADE_SHARED_PATH')
+        with _analyzer_lock, shared_lock(shared_path):
+            if shared_path:
+                # Aplica sobre a última versão publicada, mesmo que por outro worker
+                resync_shared(shared_path)
+            previous_hash = _analyzer.results_hash()
+            analyzer, summary = _analyzer.updated(body.get('insert'), body.get('update'), body.get('delete'))
+            analyzer = publish_analyzer(analyzer, shared_path)
         
-        return jsonify({
-            'unifor_analysis': unifor_analysis,
-            'improvement_priorities': priorities,
-            'similar_institutions': similar_institutions,
-            'institutional_comparison': institutional_comparison,
-            'metadata': {
-                'area': area,
-                'analysis_type': 'comprehensive'
-            }
+        affected = set(summary['areas'])
+        result_cache.carry_over(
+            previous_hash,
+            analyzer.results_hash(),
+            lambda endpoint, params: (endpoint in AREA_SCOPED_ENDPOINTS
+                                      and bool(params.get('area')) and params['area'] not in affected)
+        )
+        return json_response(summary)
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    except NotImplementedError as e:
+        return json_response({'error': str(e)}), 501
+    except RuntimeError as e:
+        return json_response({'error': str(e)}), 409
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/dataset/reload', methods=['POST'])
+def post_dataset_reload():
+    """
+    Recarrega os dados da fonte configurada e troca o snapshot, sem interromper as
+    requisições em andamento (em modo compartilhado, em todos os workers).
+    Requer ENADE_UPDATE_TOKEN.
+    """
+    try:
+        denied = check_update_token() or single_worker_required()
+        if denied is not None:
+            return denied
+        
+        analyzer = reload_analyzer()
+        return json_response({
+            'dataset_hash': analyzer.dataset_hash(),
+            'version': analyzer.dataset_version
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/indicators')
+def get_indicators():
+    """Indicadores personalizados registrados (nome, descrição e pesos das questões)"""
+    try:
+        analyzer = get_analyzer()
+        return json_response({'indicators': analyzer.get_indicators(), 'results_hash': analyzer.results_hash()})
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
 
+@enade_bp.route('/indicators', methods=['POST'])
+def post_indicators():
+    """
+    Registra (ou substitui) indicadores ponderados, avaliados para todos os cursos
+    e incluídos nas comparações por dimensão. Corpo: {"name": ..., "weights":
+    {"Q27": 2, ...} ou vetor com um peso por questão, "description": ...}, ou
+    {"indicators": {nome: {"weights": ..., "description": ...}}} para vários de uma vez.
+    Requer ENADE_UPDATE_TOKEN; em modo compartilhado, vale para todos os workers.
+    """
+    try:
+        denied = check_update_token() or single_worker_required()
+        if denied is not None:
+            return denied
+        
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return json_response({'error': 'Corpo JSON inválido'}), 400
+        if 'indicators' in body:
+            definitions = body['indicators']
+        else:
+            definitions = {body.get('name'): {'weights': body.get('weights'), 'description': body.get('description')}}
+        if not isinstance(definitions, dict) or not definitions:
+            return json_response({'error': 'Nenhum indicador informado'}), 400
+        if not all(isinstance(name, str) and name.strip() for name in definitions):
+            return json_response({'error': 'Cada indicador precisa de um nome'}), 400
+        if not all(isinstance(definition, dict) and definition.get('weights') for definition in definitions.values()):
+            return json_response({'error': 'Cada indicador precisa de weights'}), 400
+        
+        get_analyzer()
+        shared_path = os.environ.get('ENADE_SHARED_PATH')
+        with _analyzer_lock, shared_lock(shared_path):
+            if shared_path:
+                resync_shared(shared_path)
+            analyzer = publish_analyzer(_analyzer.with_indicators({**_analyzer.indicators, **definitions}),
+                                        shared_path)
+        return json_response({'indicators': analyzer.get_indicators(), 'results_hash': analyzer.results_hash()})
+    except KeyError as e:
+        return json_response({'error': e.args[0]}), 404
+    except ValueError as e:
+        return json_response({'error': str(e)}), 400
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/indicators/<name>', methods=['DELETE'])
+def delete_indicator(name):
+    """
+    Remove um indicador personalizado (em modo compartilhado, de todos os
+    workers). Requer ENADE_UPDATE_TOKEN.
+    """
+    try:
+        denied = check_update_token() or single_worker_required()
+        if denied is not None:
+            return denied
+        
+        get_analyzer()
+        shared_path = os.environ.get('ENADE_SHARED_PATH')
+        with _analyzer_lock, shared_lock(shared_path):
+            if shared_path:
+                resync_shared(shared_path)
+            if name not in _analyzer.indicators:
+                return json_response({'error': 'Indicador não encontrado'}), 404
+            indicators = {key: value for key, value in _analyzer.indicators.items() if key != name}
+            analyzer = publish_analyzer(_analyzer.with_indicators(indicators), shared_path)
+        return json_response({'indicators': analyzer.get_indicators(), 'results_hash': analyzer.results_hash()})
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/cache-stats')
+def get_cache_stats():
+    """Estatísticas do cache de resultados e da fila de jobs deste worker"""
+    try:
+        return json_response({'results': result_cache.stats(), 'jobs': job_queue.stats()})
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+@enade_bp.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Retorna o estado (e, quando concluído, o resultado) de uma análise assíncrona"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return json_response({'error': 'Job não encontrado ou expirado'}), 404
+        
+        return json_response(job_payload(job))
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
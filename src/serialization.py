@@ -0,0 +1,150 @@
+import json
+from math import isfinite
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+
+def _convert_float(value: float):
+    """Converte NaN/inf em None (JSON não possui representação para eles)"""
+    return value if isfinite(value) else None
+
+
+def _convert_array(array: np.ndarray):
+    """Converte um array NumPy em listas Python numa única passada vetorizada"""
+    kind = array.dtype.kind
+    if kind in 'biu':
+        return array.tolist()
+    if kind == 'f':
+        finite = np.isfinite(array)
+        if finite.all():
+            return array.tolist()
+        converted = array.astype(object)
+        converted[~finite] = None
+        return converted.tolist()
+    if kind == 'M':
+        return [None if pd.isna(v) else pd.Timestamp(v).isoformat() for v in array.ravel()]
+    return [to_jsonable(v) for v in array.tolist()]
+
+
+def _convert_key(key):
+    """Normaliza chaves de dicionário para tipos aceitos pelo json"""
+    if isinstance(key, np.generic):
+        return key.item()
+    return key
+
+
+def _convert_dict(value: dict):
+    result = {}
+    for key, item in value.items():
+        if type(key) is not str:
+            key = _convert_key(key)
+        # Caminho rápido para os tipos mais frequentes, sem chamada recursiva
+        item_type = type(item)
+        if item_type is float or item_type is np.float64:
+            result[key] = item if isfinite(item) else None
+        elif item_type is str or item_type is int:
+            result[key] = item
+        else:
+            result[key] = to_jsonable(item)
+    return result
+
+
+def _convert_list(value):
+    result = []
+    append = result.append
+    for item in value:
+        item_type = type(item)
+        if item_type is float or item_type is np.float64:
+            append(item if isfinite(item) else None)
+        elif item_type is str or item_type is int:
+            append(item)
+        else:
+            append(to_jsonable(item))
+    return result
+
+
+def _identity(value):
+    return value
+
+
+# Despacho por tipo exato: cobre a grande maioria dos valores sem cadeias de isinstance
+_CONVERTERS = {
+    str: _identity,
+    int: _identity,
+    bool: _identity,
+    type(None): _identity,
+    float: _convert_float,
+    dict: _convert_dict,
+    list: _convert_list,
+    tuple: _convert_list,
+    np.float64: _convert_float,
+    np.float32: lambda v: _convert_float(float(v)),
+    np.int64: int,
+    np.int32: int,
+    np.bool_: bool,
+    np.ndarray: _convert_array,
+}
+
+
+def to_jsonable(value):
+    """
+    Converte recursivamente resultados do analisador (escalares e arrays NumPy,
+    estruturas do pandas, NaN/inf) em tipos nativos serializáveis em JSON
+    """
+    converter = _CONVERTERS.get(type(value))
+    if converter is not None:
+        return converter(value)
+
+    if isinstance(value, np.generic):
+        return to_jsonable(value.item())
+    if isinstance(value, float):
+        return _convert_float(value)
+    if isinstance(value, (str, int)):
+        return value
+    if isinstance(value, dict):
+        return _convert_dict(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return _convert_list(value)
+    if isinstance(value, np.ndarray):
+        return _convert_array(value)
+    if isinstance(value, pd.DataFrame):
+        return to_jsonable(value.to_dict('records'))
+    if isinstance(value, (pd.Series, pd.Index)):
+        return _convert_array(value.to_numpy())
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    raise TypeError(f'Objeto do tipo {type(value).__name__} não é serializável em JSON')
+
+
+def _default(value):
+    """Hook do json para tipos NumPy/pandas encontrados durante a codificação"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return to_jsonable(value)
+
+
+def dumps(value) -> str:
+    """
+    Serializa um resultado do analisador em JSON compacto e válido (NaN/inf viram null)
+    """
+    # Primeira tentativa inteiramente no codificador em C; apenas se houver
+    # NaN/inf ou chaves que ele não aceita (ex.: inteiros NumPy) o payload é
+    # normalizado antes de uma nova codificação
+    try:
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'),
+                          allow_nan=False, default=_default)
+    except (ValueError, TypeError):
+        return json.dumps(to_jsonable(value), ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+
+def json_response(value, status: int = 200):
+    """
+    Equivalente ao jsonify para as rotas do ENADE, ciente de NumPy e de NaN
+    """
+    return current_app.response_class(dumps(value), status=status, mimetype='application/json')
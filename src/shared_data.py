@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = 'manifest.json'
+QUESTION_MATRIX_FILE = 'questions.npy'
+
+
+def _file_safe(metric: str) -> str:
+    """Nome de arquivo seguro para uma métrica"""
+    return ''.join(c if c.isalnum() else '_' for c in metric)
+
+
+def _directory_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def export_shared_dataset(df: pd.DataFrame, questions: List[str],
+                          leaderboards: Dict[str, Dict[str, np.ndarray]], directory: str,
+                          derived: Dict[str, np.ndarray] = None, dataset_hash: str = None,
+                          dataset_version: int = 0, indicators: Dict[str, Dict] = None) -> Dict:
+    """
+    Grava o conjunto de dados em arquivos .npy para mapeamento em memória:
+    a matriz densa das questões, as demais colunas numéricas, as colunas
+    categóricas codificadas, os arrays dos rankings pré-computados e as demais
+    estruturas derivadas (`derived`: scores, histogramas, correlações, z-scores).
+    As definições dos indicadores personalizados vão no manifesto.
+    """
+    derived = derived or {}
+    tmp_directory = f'{directory}.tmp'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    # Matriz densa (cursos x questões), contígua em memória
+    matrix = np.ascontiguousarray(df[questions].to_numpy(dtype=np.float64))
+    np.save(os.path.join(tmp_directory, QUESTION_MATRIX_FILE), matrix)
+
+    columns = []
+    for position, column in enumerate(df.columns):
+        if column in questions:
+            columns.append({'name': column, 'kind': 'question', 'index': questions.index(column)})
+            continue
+
+        series = df[column]
+        file_name = f'col_{position}.npy'
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            np.save(os.path.join(tmp_directory, file_name), series.to_numpy())
+            columns.append({'name': column, 'kind': 'numeric', 'file': file_name})
+        else:
+            # Os códigos são gravados no mesmo dtype escolhido pelo pandas, para
+            # que Categorical.from_codes não precise copiá-los ao anexar
+            categorical = pd.Categorical(series)
+            np.save(os.path.join(tmp_directory, file_name), categorical.codes)
+            columns.append({
+                'name': column,
+                'kind': 'categorical',
+                'file': file_name,
+                'categories': categorical.categories.tolist()
+            })
+
+    for metric, arrays in leaderboards.items():
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_directory, f'leaderboard_{_file_safe(metric)}_{name}.npy'), array)
+
+    for name, array in derived.items():
+        np.save(os.path.join(tmp_directory, f'derived_{_file_safe(name)}.npy'), np.ascontiguousarray(array))
+
+    manifest = {
+        'rows': len(df),
+        'questions': questions,
+        'columns': columns,
+        'leaderboards': {metric: sorted(arrays) for metric, arrays in leaderboards.items()},
+        'derived': sorted(derived),
+        'dataset_hash': dataset_hash,
+        'dataset_version': dataset_version,
+        'indicators': indicators or {},
+        # Memória que cada worker gastaria com cópias privadas do DataFrame, dos
+        # rankings e das estruturas derivadas
+        'private_copy_bytes': int(df.memory_usage(deep=True).sum()) + sum(
+            int(array.nbytes) for arrays in leaderboards.values() for array in arrays.values()
+        ) + sum(int(np.asarray(array).nbytes) for array in derived.values()),
+        'shared_bytes': _directory_size(tmp_directory)
+    }
+    with open(os.path.join(tmp_directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    # O diretório anterior é renomeado antes de ser removido, para que os workers
+    # que reanexam os dados quase nunca o encontrem ausente (a leitura é repetida
+    # na próxima verificação); os arquivos já mapeados continuam válidos
+    old_directory = f'{directory}.old'
+    shutil.rmtree(old_directory, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(tmp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+    return manifest
+
+
+def shared_generation(directory: str) -> Optional[Tuple[int, int]]:
+    """
+    Identifica a exportação atual de `directory` pelo manifesto (recriado a cada
+    exportação), sem lê-lo; None se ainda não houver uma
+    """
+    try:
+        stat = os.stat(os.path.join(directory, MANIFEST_FILE))
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+@contextmanager
+def exclusive_lock(directory: str):
+    """
+    Lock entre processos (fcntl) para as reexportações de `directory`, de modo
+    que os workers apliquem as atualizações um de cada vez sobre a última versão
+    """
+    import fcntl
+
+    with open(f'{directory}.lock', 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def attach_shared_dataset(directory: str) -> Tuple[pd.DataFrame, np.ndarray, Dict[str, Dict[str, np.ndarray]],
+                                                   Dict[str, np.ndarray], Dict]:
+    """
+    Anexa (somente leitura) um conjunto de dados exportado por export_shared_dataset.
+    Os arrays são mapeados em memória e compartilhados entre os processos pelo
+    cache de páginas do sistema operacional.
+    """
+    with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    def load(file_name: str) -> np.ndarray:
+        return np.load(os.path.join(directory, file_name), mmap_mode='r')
+
+    matrix = load(QUESTION_MATRIX_FILE)
+
+    data = {}
+    for column in manifest['columns']:
+        if column['kind'] == 'question':
+            data[column['name']] = matrix[:, column['index']]
+        elif column['kind'] == 'numeric':
+            data[column['name']] = load(column['file'])
+        else:
+            dtype = pd.CategoricalDtype(column['categories'])
+            data[column['name']] = pd.Categorical.from_codes(load(column['file']), dtype=dtype, validate=False)
+
+    df = pd.DataFrame(data, copy=False)
+
+    leaderboards = {}
+    for metric, names in manifest['leaderboards'].items():
+        leaderboards[metric] = {
+            name: load(f'leaderboard_{_file_safe(metric)}_{name}.npy') for name in names
+        }
+
+    derived = {name: load(f'derived_{_file_safe(name)}.npy') for name in manifest.get('derived', [])}
+
+    return df, matrix, leaderboards, derived, manifest
+
+
+def process_memory() -> Dict[str, int]:
+    """
+    Memória efetivamente usada por este processo (Linux, /proc/self/smaps_rollup):
+    USS (páginas privadas) e páginas residentes compartilhadas com outros processos.
+    Vazio se a plataforma não expuser essas informações.
+    """
+    try:
+        with open('/proc/self/smaps_rollup', 'r', encoding='ascii') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+    except OSError:
+        return {}
+
+    def kib(*names) -> int:
+        return sum(int(fields[name].split()[0]) * 1024 for name in names if name in fields)
+
+    return {
+        'uss_bytes': kib('Private_Clean', 'Private_Dirty'),
+        'shared_resident_bytes': kib('Shared_Clean', 'Shared_Dirty')
+    }
+
+
+def memory_report(manifest: Dict, df: pd.DataFrame) -> Dict[str, int]:
+    """
+    Memória de um worker anexado: a privada medida (USS, quando disponível), as
+    categorias do pandas que cada worker mantém em cópia própria e a economia
+    em relação a cópias privadas dos arrays que de fato são mapeados
+    """
+    categories_bytes = 0
+    for column in manifest['columns']:
+        if column['kind'] == 'categorical':
+            categories_bytes += int(df[column['name']].cat.categories.memory_usage(deep=True))
+
+    return {
+        'shared_bytes': manifest['shared_bytes'],
+        'private_bytes': categories_bytes,
+        'saved_bytes': max(manifest['private_copy_bytes'] - categories_bytes, 0),
+        **process_memory()
+    }
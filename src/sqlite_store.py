@@ -0,0 +1,235 @@
+import os
+import sqlite3
+import sys
+import threading
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Colunas da planilha -> colunas da tabela `cursos`
+# (as questões Q27..Q68 mantêm o nome original)
+COLUMN_MAP = {
+    'CO_CURSO': 'co_curso',
+    'Nome da IES': 'nome_ies',
+    'Área de Avaliação': 'area',
+    'Organização Acadêmica': 'organizacao_academica',
+    'Categoria Administrativa': 'categoria',
+    'Modalidade de Ensino': 'modalidade',
+    'Município do Curso': 'municipio',
+    'Sigla da UF': 'uf',
+    'Nº de Concluintes Inscritos': 'inscritos',
+    'Nº  de Concluintes Participantes': 'participantes',
+    'Percentual Participantes': 'percentual_participantes',
+    'Média': 'media'
+}
+REVERSE_COLUMN_MAP = {v: k for k, v in COLUMN_MAP.items()}
+
+# Score de cada dimensão por curso, materializado no momento da carga
+DIMENSION_COLUMNS = {'NOC': 'noc', 'NFC': 'nfc', 'NAC': 'nac'}
+
+INDEXES = {
+    'idx_cursos_area': ['area'],
+    'idx_cursos_uf': ['uf'],
+    'idx_cursos_nome_ies': ['nome_ies'],
+    'idx_cursos_categoria': ['categoria'],
+    'idx_cursos_area_uf': ['area', 'uf'],
+    'idx_cursos_nome_ies_area': ['nome_ies', 'area']
+}
+
+
+def _quote(column: str) -> str:
+    return f'"{column}"'
+
+
+def _aggregate_select(questions: List[str]) -> str:
+    """Expressões de agregação (contagem e soma) usadas nas tabelas materializadas"""
+    columns = list(DIMENSION_COLUMNS.values()) + ['media'] + questions
+    parts = ['COUNT(*) AS n_cursos']
+    for column in columns:
+        parts.append(f'COUNT("{column}") AS "n_{column}"')
+        parts.append(f'SUM("{column}") AS "s_{column}"')
+    for column in questions:
+        parts.append(f'MIN("{column}") AS "min_{column}"')
+        parts.append(f'MAX("{column}") AS "max_{column}"')
+    return ', '.join(parts)
+
+
+def build_sqlite_store(df: pd.DataFrame, db_path: str, dimension_scores: Dict[str, np.ndarray],
+                       questions: List[str]):
+    """
+    Grava os dados do ENADE em um banco SQLite indexado, com as tabelas de
+    agregados por área (e por área/UF) já materializadas
+    """
+    table = df.rename(columns=COLUMN_MAP)
+    for dimension, column in DIMENSION_COLUMNS.items():
+        table[column] = dimension_scores[dimension]
+
+    # Grava em um arquivo temporário e substitui o destino ao final
+    tmp_path = f'{db_path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        table.to_sql('cursos', conn, index=False)
+
+        for name, columns in INDEXES.items():
+            column_list = ', '.join(_quote(c) for c in columns)
+            conn.execute(f'CREATE INDEX {name} ON cursos ({column_list})')
+
+        aggregates = _aggregate_select(questions)
+        conn.execute(f'CREATE TABLE agregados_area AS SELECT area, {aggregates} FROM cursos GROUP BY area')
+        conn.execute('CREATE UNIQUE INDEX idx_agregados_area ON agregados_area (area)')
+        conn.execute(f'CREATE TABLE agregados_area_uf AS SELECT area, uf, {aggregates} FROM cursos GROUP BY area, uf')
+        conn.execute('CREATE UNIQUE INDEX idx_agregados_area_uf ON agregados_area_uf (area, uf)')
+
+        conn.execute('CREATE TABLE metadados (chave TEXT PRIMARY KEY, valor TEXT)')
+        conn.executemany('INSERT INTO metadados VALUES (?, ?)', [
+            ('total_cursos', str(len(df))),
+            ('questoes', ','.join(questions))
+        ])
+        conn.commit()
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+
+
+class SQLiteStore:
+    """
+    Acesso somente leitura ao banco gerado por build_sqlite_store. Cada thread
+    mantém sua própria conexão.
+    """
+
+    def __init__(self, db_path: str):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        self.db_path = db_path
+        self._local = threading.local()
+        self.columns = [row[1] for row in self._connection().execute('PRAGMA table_info(cursos)')]
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            uri = f'file:{os.path.abspath(self.db_path)}?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _column(self, column: str) -> str:
+        """
+        Identificador (entre aspas) de uma coluna existente da tabela `cursos`;
+        nomes fora do esquema são recusados antes de qualquer SQL ser montado
+        """
+        column = COLUMN_MAP.get(column, column)
+        if column not in self.columns:
+            raise KeyError(f'Coluna não encontrada: {column}')
+        return _quote(column)
+
+    def _where(self, area: str = None, uf: str = None, ufs: List[str] = None,
+               institution: str = None, institution_contains: str = None,
+               category_contains: str = None, not_null: str = None):
+        """Monta a cláusula WHERE (parametrizada) a partir dos filtros"""
+        clauses = []
+        params = []
+        if area:
+            clauses.append('area = ?')
+            params.append(area)
+        if uf:
+            clauses.append('uf = ?')
+            params.append(uf)
+        if ufs is not None:
+            clauses.append(f'uf IN ({", ".join("?" for _ in ufs)})')
+            params.extend(ufs)
+        if institution:
+            clauses.append('nome_ies = ?')
+            params.append(institution)
+        if institution_contains:
+            clauses.append('nome_ies LIKE ?')
+            params.append(f'%{institution_contains}%')
+        if category_contains:
+            clauses.append('categoria LIKE ?')
+            params.append(f'%{category_contains}%')
+        if not_null:
+            clauses.append(f'{self._column(not_null)} IS NOT NULL')
+        where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+        return where, params
+
+    def fetch_courses(self, columns: List[str] = None, order_by: str = None, limit: int = None,
+                      **filters) -> pd.DataFrame:
+        """
+        Retorna os cursos que atendem aos filtros, com os nomes de coluna da planilha
+        """
+        if columns is None:
+            selected = [_quote(c) for c in self.columns if c not in DIMENSION_COLUMNS.values()]
+        else:
+            selected = [self._column(c) for c in columns]
+
+        where, params = self._where(**filters)
+        sql = f'SELECT {", ".join(selected)} FROM cursos{where}'
+        if order_by:
+            sql += f' ORDER BY {self._column(order_by)} DESC, co_curso'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+
+        frame = pd.read_sql_query(sql, self._connection(), params=params)
+        return frame.rename(columns=REVERSE_COLUMN_MAP)
+
+    def column_values(self, column: str, **filters) -> np.ndarray:
+        """
+        Retorna apenas os valores de uma coluna para os cursos filtrados
+        """
+        column = self._column(column)
+        where, params = self._where(**filters)
+        rows = self._connection().execute(f'SELECT {column} FROM cursos{where}', params).fetchall()
+        return np.array([r[0] for r in rows], dtype=float)
+
+    def distinct_areas(self, **filters) -> List[str]:
+        """
+        Lista as áreas de avaliação (ordenadas) dos cursos filtrados
+        """
+        where, params = self._where(**filters)
+        rows = self._connection().execute(f'SELECT DISTINCT area FROM cursos{where} ORDER BY area', params)
+        return [r[0] for r in rows]
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        return self._connection().execute(f'SELECT COUNT(*) FROM cursos{where}', params).fetchone()[0]
+
+    def dimension_scores(self, area: str = None, ufs: List[str] = None, **filters) -> Dict[str, float]:
+        """
+        Calcula as médias por dimensão. Filtros apenas por área/UF são respondidos
+        pelas tabelas de agregados; os demais consultam a tabela de cursos.
+        """
+        metrics = list(DIMENSION_COLUMNS.items()) + [('GERAL', 'media')]
+
+        if filters:
+            where, params = self._where(area=area, ufs=ufs, **filters)
+            select = ', '.join(f'AVG("{column}")' for _, column in metrics)
+            row = self._connection().execute(f'SELECT {select} FROM cursos{where}', params).fetchone()
+        else:
+            table = 'agregados_area_uf' if ufs is not None else 'agregados_area'
+            where, params = self._where(area=area, ufs=ufs)
+            select = ', '.join(f'CAST(SUM("s_{column}") AS REAL) / SUM("n_{column}")' for _, column in metrics)
+            row = self._connection().execute(f'SELECT {select} FROM {table}{where}', params).fetchone()
+
+        return {name: (np.nan if value is None else value) for (name, _), value in zip(metrics, row)}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+if __name__ == '__main__':
+    # Uso: python -m src.sqlite_store ResumoQuestionário.xlsx enade.db
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from src.enade_analyzer import ENADEAnalyzer
+
+    analyzer = ENADEAnalyzer(sys.argv[1])
+    analyzer.export_sqlite(sys.argv[2])
+    print(f'Banco SQLite gerado em {sys.argv[2]} ({len(analyzer.df)} cursos)')
@@ -0,0 +1,239 @@
+"""
+Respostas pré-comprimidas (gzip e, com o pacote brotli instalado, br) servidas da
+memória com ETag pelo conteúdo e negociação de Accept-Encoding: os arquivos
+estáticos da interface e os payloads JSON grandes do blueprint do ENADE.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from src.serialization import dumps
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Corpos menores não compensam a compressão
+MIN_COMPRESS_SIZE = 512
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# Preferência do servidor quando o cliente aceita várias codificações com o mesmo peso
+ENCODING_PREFERENCE = ('br', 'gzip', 'identity')
+
+
+class CompressedBody:
+    """
+    Um corpo de resposta com as suas versões comprimidas e o hash do conteúdo
+    """
+
+    def __init__(self, body: bytes, content_type: str):
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.etag = self.digest[:16]
+        self.encodings = {'identity': body}
+
+        if len(body) >= MIN_COMPRESS_SIZE and content_type.startswith(COMPRESSIBLE_TYPES):
+            # mtime=0: a mesma entrada sempre gera os mesmos bytes
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.encodings['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.encodings['br'] = compressed
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(body) for body in self.encodings.values())
+
+
+def negotiate(accept_encoding: str, available) -> str:
+    """
+    Escolhe a codificação pelo Accept-Encoding (pesos q, '*' e identity;q=0),
+    desempatando pela preferência do servidor (br, gzip, identity)
+    """
+    weights = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                weight = float(match.group(1))
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in available:
+            continue
+        # Sem menção explícita, identity é aceitável (RFC 9110), mas só como último recurso
+        default = 0.001 if encoding == 'identity' else 0.0
+        weight = weights.get(encoding, weights.get('*', default))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best or 'identity'
+
+
+def compressed_response(body: CompressedBody, cache_control: str = REVALIDATE):
+    """
+    Resposta com a codificação negociada; If-None-Match com o ETag atual resulta em 304.
+    Cada codificação tem o seu ETag (o conteúdo sem compressão usa o do corpo e as
+    comprimidas recebem o sufixo -gzip/-br), pois são representações diferentes.
+    """
+    encoding = negotiate(request.headers.get('Accept-Encoding'), body.encodings)
+    etag = body.etag if encoding == 'identity' else f'{body.etag}-{encoding}'
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding'
+    }
+    if etag in request.if_none_match:
+        return current_app.response_class(status=304, headers=headers)
+
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return current_app.response_class(body.encodings[encoding], headers=headers, content_type=body.content_type)
+
+
+class StaticAssets:
+    """
+    Carrega e comprime os arquivos estáticos uma única vez. Cada arquivo também é
+    servido com o hash do conteúdo no nome (app.js -> app.3f2a9c1d.js), com cache
+    imutável; o index.html passa a referenciar os nomes com hash e é revalidado
+    pelo ETag a cada acesso.
+    """
+
+    def __init__(self, folder: str, index: str = 'index.html'):
+        self.folder = folder
+        self.index = index
+        self.assets = {}
+        self.fingerprinted = {}
+        self.fingerprints = {}
+        if folder and os.path.isdir(folder):
+            self.load()
+
+    @staticmethod
+    def _content_type(name: str) -> str:
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        return content_type
+
+    @staticmethod
+    def fingerprint(name: str, digest: str) -> str:
+        stem, extension = os.path.splitext(name)
+        return f'{stem}.{digest[:8]}{extension}'
+
+    def load(self):
+        files = {}
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, self.folder).replace(os.sep, '/')] = f.read()
+
+        for name, content in files.items():
+            if name == self.index:
+                continue
+            asset = CompressedBody(content, self._content_type(name))
+            fingerprinted = self.fingerprint(name, asset.digest)
+            self.assets[name] = asset
+            self.fingerprinted[fingerprinted] = asset
+            self.fingerprints[name] = fingerprinted
+
+        if self.index in files:
+            self.assets[self.index] = CompressedBody(
+                self._rewrite_references(files[self.index].decode('utf-8')).encode('utf-8'),
+                self._content_type(self.index)
+            )
+
+    def _rewrite_references(self, html: str) -> str:
+        """Troca as referências locais (src/href) pelos nomes com hash"""
+        def replace(match):
+            reference = match.group(2).lstrip('/')
+            if reference in self.fingerprints:
+                return f'{match.group(1)}="{self.fingerprints[reference]}"'
+            return match.group(0)
+
+        return re.sub(r'\b(src|href)="([^":?#]+)"', replace, html)
+
+    def url_for(self, name: str) -> str:
+        """Nome com hash de um arquivo estático (o próprio nome se ele não existir)"""
+        return self.fingerprints.get(name, name)
+
+    def serve(self, path: str):
+        if path in self.fingerprinted:
+            return compressed_response(self.fingerprinted[path], IMMUTABLE)
+        if path in self.assets:
+            return compressed_response(self.assets[path])
+        # Demais caminhos recebem a interface (navegação do lado do cliente)
+        if self.index in self.assets:
+            return compressed_response(self.assets[self.index])
+        return None
+
+
+class CompressedPayloads:
+    """
+    LRU de payloads JSON já serializados e comprimidos, para respostas grandes que
+    só mudam quando os dados pré-processados são regerados. As chaves devem incluir
+    a versão dos dados (WebDataStore.version), para que payloads antigos deixem de
+    ser servidos assim que os dados mudam.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get_or_build(self, key: tuple, build: Callable, *args) -> CompressedBody:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        body = CompressedBody(dumps(build(*args)).encode('utf-8'), 'application/json')
+
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def response(self, key: tuple, build: Callable, *args, version: str = None):
+        """
+        Resposta pré-comprimida; com ?v= igual ao ETag atual ou à versão dos dados
+        usada na chave, o cliente pode guardá-la como imutável (a URL muda junto
+        com o conteúdo)
+        """
+        body = self.get_or_build(key, build, *args)
+        requested = request.args.get('v')
+        cache_control = IMMUTABLE if requested and requested in (body.etag, version) else REVALIDATE
+        return compressed_response(body, cache_control)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': sum(body.nbytes for body in self._entries.values())
+            }
@@ -0,0 +1,136 @@
+"""
+Distribuições das respostas dos estudantes por (curso, questão), construídas a
+partir dos microdados do questionário do estudante sem mantê-los em memória.
+
+As respostas das questões QE_I27 a QE_I68 estão na escala de 1 a 6 (7 e 8
+correspondem a "não sei responder" e "não se aplica" e são descartadas). Por ser
+uma escala discreta, o sketch de cada (curso, questão) é um histograma exato de
+6 contagens: combinar cursos em área, UF, região ou Brasil é apenas somá-los.
+"""
+import sys
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+SCALE = np.arange(1, 7)
+N_BINS = len(SCALE)
+
+
+def microdata_column(question: str) -> str:
+    """Coluna dos microdados correspondente a uma questão da planilha (Q27 -> QE_I27)"""
+    return f'QE_I{question[1:]}'
+
+
+class StudentSketches:
+    """
+    Histogramas das respostas dos estudantes, com forma (cursos, questões, 6)
+    """
+
+    def __init__(self, courses: np.ndarray, questions: List[str], counts: np.ndarray):
+        self.courses = np.asarray(courses, dtype=np.int64)
+        self.questions = list(questions)
+        self.counts = counts
+        self._course_index = pd.Index(self.courses)
+        self._question_index = {q: i for i, q in enumerate(self.questions)}
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.counts.nbytes + self.courses.nbytes)
+
+    def question_position(self, question: str) -> int:
+        if question not in self._question_index:
+            raise KeyError(f'Questão sem distribuição por estudante: {question}')
+        return self._question_index[question]
+
+    def rows_for(self, course_codes: Sequence[int]) -> np.ndarray:
+        """Linha do sketch de cada curso (-1 para cursos sem microdados)"""
+        return self._course_index.get_indexer(np.asarray(course_codes, dtype=np.int64))
+
+    def merge(self, rows: np.ndarray) -> np.ndarray:
+        """Soma os histogramas das linhas dadas, resultando em (questões, 6)"""
+        rows = rows[rows >= 0]
+        return self.counts[rows].sum(axis=0, dtype=np.int64)
+
+    def save(self, path: str):
+        np.savez(path, courses=self.courses, questions=np.array(self.questions), counts=self.counts)
+
+    @classmethod
+    def load(cls, path: str) -> 'StudentSketches':
+        with np.load(path) as data:
+            return cls(data['courses'], data['questions'].tolist(), data['counts'])
+
+
+def build_student_sketches(paths: Iterable[str], questions: List[str], course_column: str = 'CO_CURSO',
+                           sep: str = ';', encoding: str = 'latin-1', chunksize: int = 500_000) -> StudentSketches:
+    """
+    Lê os microdados em blocos de `chunksize` estudantes e acumula os histogramas
+    por (curso, questão). Apenas as contagens ficam em memória.
+    """
+    columns = [microdata_column(q) for q in questions]
+    n_questions = len(questions)
+    codes = pd.Index([], dtype=np.int64)
+    counts = np.zeros((0, n_questions, N_BINS), dtype=np.uint32)
+
+    for path in paths:
+        reader = pd.read_csv(path, sep=sep, encoding=encoding, chunksize=chunksize,
+                             usecols=[course_column] + columns)
+        for chunk in reader:
+            chunk = chunk[chunk[course_column].notna()]
+            chunk_codes = chunk[course_column].to_numpy(dtype=np.int64)
+
+            # Cursos novos ganham linhas zeradas no final
+            new_codes = pd.Index(pd.unique(chunk_codes)).difference(codes)
+            if len(new_codes):
+                codes = codes.append(new_codes)
+                counts = np.concatenate([counts, np.zeros((len(new_codes), n_questions, N_BINS), dtype=np.uint32)])
+
+            rows = codes.get_indexer(chunk_codes)
+            answers = chunk[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+            student, question = np.nonzero((answers >= SCALE[0]) & (answers <= SCALE[-1]))
+            bins = answers[student, question].astype(np.int64) - SCALE[0]
+
+            # Uma única contagem para todas as questões do bloco
+            flat = (rows[student] * n_questions + question) * N_BINS + bins
+            counts += np.bincount(flat, minlength=counts.size).reshape(counts.shape).astype(np.uint32)
+
+    return StudentSketches(codes.to_numpy(), questions, counts)
+
+
+def histogram_quantiles(histogram: np.ndarray, probabilities: Sequence[float]) -> List[float]:
+    """
+    Quantis (valores da escala) de um histograma; None se não houver respostas
+    """
+    total = int(histogram.sum())
+    if total == 0:
+        return [None] * len(probabilities)
+    cumulative = np.cumsum(histogram)
+    positions = np.searchsorted(cumulative, np.asarray(probabilities) * total, side='left')
+    return [float(SCALE[min(p, N_BINS - 1)]) for p in positions]
+
+
+def histogram_mean(histogram: np.ndarray) -> float:
+    total = int(histogram.sum())
+    return float(histogram @ SCALE / total) if total else None
+
+
+def histogram_percentile(histogram: np.ndarray, score: float) -> float:
+    """
+    Percentual de estudantes com resposta abaixo de `score`
+    """
+    total = int(histogram.sum())
+    if total == 0:
+        return None
+    return float(histogram[SCALE < score].sum() / total * 100)
+
+
+if __name__ == '__main__':
+    # Uso: python -m src.student_sketches destino.npz microdados1.txt [microdados2.txt ...]
+    from src.enade_analyzer import ENADEAnalyzer
+
+    analyzer = ENADEAnalyzer.__new__(ENADEAnalyzer)
+    analyzer.setup_dimensions()
+    sketches = build_student_sketches(sys.argv[2:], analyzer.all_questions)
+    sketches.save(sys.argv[1])
+    print(f'{len(sketches.courses)} cursos, {len(sketches.questions)} questões, '
+          f'{sketches.nbytes / 2**20:.1f} MiB em {sys.argv[1]}')
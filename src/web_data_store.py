@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+DEFAULT_INSTITUTION = 'UNIVERSIDADE DE FORTALEZA'
+
+
+class WebDataStore:
+    """
+    Acesso aos dados pré-processados da aplicação web. Com os shards gerados por
+    generate_web_data.save_sharded_web_data, apenas o manifesto fica sempre em
+    memória e cada requisição lê somente o shard (instituição ou área) de que
+    precisa, mantendo um cache LRU limitado. Sem shards, usa o web_data.json legado.
+    Os dados em memória são descartados quando o manifesto (gravado por último
+    ao regerar os shards) ou o web_data.json mudam no disco, verificado no
+    máximo a cada `check_interval` segundos.
+    """
+
+    def __init__(self, shards_dir: str, legacy_path: str, cache_size: int = 64, check_interval: float = 1.0):
+        self.shards_dir = shards_dir
+        self.legacy_path = legacy_path
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._manifest = None  # (versão, manifesto)
+        self._legacy = None  # (versão, web_data.json)
+        self._source = None  # (arquivo, mtime, tamanho) dos dados em memória
+        self._version = ''
+        self._checked_at = None
+
+    def _read_json(self, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @property
+    def sharded(self) -> bool:
+        return os.path.exists(os.path.join(self.shards_dir, 'manifest.json'))
+
+    def _stat_source(self):
+        path = os.path.join(self.shards_dir, 'manifest.json')
+        if not os.path.exists(path):
+            path = self.legacy_path
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def refresh(self, force: bool = False):
+        """Descarta os dados em memória se o manifesto ou o web_data.json mudaram"""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        source = self._stat_source()
+        if source != self._source:
+            with self._lock:
+                self._cache.clear()
+                self._manifest = None
+                self._legacy = None
+                self._source = source
+                self._version = hashlib.sha256(repr(source).encode('utf-8')).hexdigest()[:12] if source else ''
+
+    def version(self) -> str:
+        """Identifica a versão dos dados no disco (muda quando eles são regerados)"""
+        self.refresh()
+        return self._version
+
+    def manifest(self) -> Dict:
+        version = self.version()
+        cached = self._manifest
+        if cached is None or cached[0] != version:
+            cached = self._manifest = (version, self._read_json(os.path.join(self.shards_dir, 'manifest.json')))
+        return cached[1]
+
+    def legacy(self) -> Dict:
+        version = self.version()
+        cached = self._legacy
+        if cached is None or cached[0] != version:
+            cached = self._legacy = (version, self._read_json(self.legacy_path))
+        return cached[1]
+
+    def _shard(self, file_name: str) -> Dict:
+        """Lê um shard, mantendo apenas os `cache_size` mais recentes em memória"""
+        key = (self.version(), file_name)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        shard = self._read_json(os.path.join(self.shards_dir, file_name))
+
+        with self._lock:
+            self._cache[key] = shard
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return shard
+
+    def resident(self, institution: str = None, area: str = None, with_institution: bool = True) -> bool:
+        """
+        Se o manifesto (ou o web_data.json legado), o shard da instituição (com
+        with_institution) e o da área já estão em memória, isto é, se a consulta
+        não precisa ler o disco. Nomes inexistentes não exigem leitura.
+        """
+        version = self.version()
+        cached = self._manifest
+        if cached is None or cached[0] != version:
+            return self._legacy is not None and self._legacy[0] == version and not self.sharded
+        manifest = cached[1]
+
+        needed = []
+        if with_institution:
+            needed.append(manifest['institutions'].get(institution or manifest['default_institution']))
+        if area is not None:
+            needed.append(manifest['areas'].get(area))
+        with self._lock:
+            return all(file_name is None or (version, file_name) in self._cache for file_name in needed)
+
+    def default_institution(self) -> str:
+        if self.sharded:
+            return self.manifest()['default_institution']
+        return DEFAULT_INSTITUTION
+
+    def institutions(self) -> List[str]:
+        if self.sharded:
+            return list(self.manifest()['institutions'])
+        return [DEFAULT_INSTITUTION]
+
+    def institution(self, name: str = None) -> Optional[Dict]:
+        """
+        Retorna o shard de uma instituição (ou None se ela não existir), no formato
+        {'institution', 'label', 'uf', 'region', 'areas', 'total_courses',
+         'comparisons', 'courses', 'records'}
+        """
+        name = name or self.default_institution()
+
+        if not self.sharded:
+            if name != DEFAULT_INSTITUTION:
+                return None
+            data = self.legacy()
+            return {
+                'institution': DEFAULT_INSTITUTION,
+                'label': 'UNIFOR',
+                'uf': 'CE',
+                'region': 'NORDESTE',
+                'areas': data['metadata']['unifor_areas'],
+                'total_courses': data['metadata']['unifor_courses'],
+                'comparisons': data['comparisons'],
+                'courses': data['unifor_courses'],
+                'records': {area: detail['unifor_data'] for area, detail in data['detailed_analysis'].items()}
+            }
+
+        file_name = self.manifest()['institutions'].get(name)
+        return self._shard(file_name) if file_name else None
+
+    def extremes(self, area: str) -> Optional[Dict]:
+        """
+        Retorna os extremos de uma área (ou None se a área não existir)
+        """
+        if not self.sharded:
+            detail = self.legacy()['detailed_analysis'].get(area)
+            return detail['extremes'] if detail else None
+
+        file_name = self.manifest()['areas'].get(area)
+        return self._shard(file_name)['extremes'] if file_name else None
+
+    def metadata(self, institution: Dict) -> Dict:
+        """
+        Metadados no formato histórico (unifor_courses/unifor_areas referem-se à instituição)
+        """
+        if not self.sharded:
+            base = self.legacy()['metadata']
+        else:
+            base = self.manifest()['metadata']
+
+        return {
+            'total_courses': base['total_courses'],
+            'unifor_courses': institution['total_courses'],
+            'course_areas': base['course_areas'],
+            'unifor_areas': institution['areas'],
+            'dimensions': base['dimensions'],
+            'institution': institution['institution']
+        }